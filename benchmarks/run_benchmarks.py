@@ -0,0 +1,401 @@
+# run_benchmarks.py
+
+# End-to-end benchmarks for the index: per-file processing and full build
+# throughput, incremental append, cold and warm query latency, and peak
+# memory. Runs against the bundled monthly files or a seeded synthetic
+# dataset, always in a scratch workspace, and writes one JSON file per run so
+# results can be compared across commits. Reports go to benchmarks/results/
+# (ignored by git), named by dataset and commit:
+#
+#   python benchmarks/run_benchmarks.py --dataset bundled
+#   python benchmarks/run_benchmarks.py --dataset synthetic --scale season --compare benchmarks/results/old.json
+#
+# Month files are used as pybaseball returned them unless --curated is given,
+# which curates them first the way the downloader now writes them.
+#
+# Every scenario runs in its own interpreter, so "cold" really is a fresh
+# process with no Arrow cache on disk and peak RSS belongs to that scenario.
+# The newest monthly file is held back from the build and appended afterwards.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from synthetic_statcast import SCALES, write_synthetic_months
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+BUNDLED_DIR = os.path.join(REPO_ROOT, "pitch_prospector", "data", "statcast_monthly")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Relative to the workspace, which mirrors the repo layout the indexing code expects
+MONTHLY_DIR = "pitch_prospector/data/statcast_monthly"
+HOLDOUT_DIR = "holdout"
+
+SCENARIOS = ["process_file", "build", "query", "append"]
+DEFAULT_REPEAT = 5
+BATCH_SIZE = 500
+
+# "LHP vs RHB, two outs, seventh inning or later, batting team behind"
+SITUATION = {"p_throws": "L", "stand": "R", "outs_when_up": 2, "inning": range(7, 100), "score_diff": range(-100, 0)}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "peak_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _monthly_files(data_dir=MONTHLY_DIR):
+    return [os.path.join(data_dir, f) for f in sorted(os.listdir(data_dir)) if f.endswith(".parquet")]
+
+
+def _index_totals():
+    # What a reader sees: every segment's rows, less the replaced ones
+    import pyarrow.parquet as pq
+    from indexing.season_files import pitch_path_for, season_paths
+    from indexing.season_segments import season_segments
+    atbats = pitches = 0
+    for season_path in season_paths().values():
+        for segment in season_segments(season_path):
+            atbats += pq.ParquetFile(segment.path).metadata.num_rows
+            pitches += pq.ParquetFile(pitch_path_for(segment.path)).metadata.num_rows
+            if segment.retraction is not None:
+                atbats -= pq.ParquetFile(segment.retraction).metadata.num_rows
+                pitches -= pq.ParquetFile(pitch_path_for(segment.retraction)).metadata.num_rows
+    return atbats, pitches
+
+
+# --- scenarios (run inside the workspace, one per interpreter) ---
+
+def bench_process_file(args):
+    from indexing.pitch_index import process_file
+    from indexing.statcast_curate import bytes_to_read
+    files = _monthly_files()
+    seconds = atbats = pitches = 0
+    read_bytes = sum(bytes_to_read(fpath) for fpath in files)
+    for fpath in files:
+        elapsed, (atbat_df, pitch_df) = _timed(process_file, fpath)
+        seconds += elapsed
+        atbats += len(atbat_df)
+        pitches += len(pitch_df)
+    return {
+        "files": len(files),
+        "atbats": atbats,
+        "pitches": pitches,
+        "read_mb": round(read_bytes / 1e6, 1),
+        "seconds": round(seconds, 3),
+        "pitches_per_second": round(pitches / seconds) if seconds else None,
+    }
+
+
+def bench_build(args):
+    from indexing.build_index import build_index
+    seconds, _ = _timed(build_index, workers=args.workers)
+    atbats, pitches = _index_totals()
+    index_bytes = sum(
+        os.path.getsize(os.path.join("pitch_prospector/data", f))
+        for f in os.listdir("pitch_prospector/data") if f.endswith((".parquet", ".npz"))
+    )
+    return {
+        "files": len(_monthly_files()),
+        "workers": args.workers or os.cpu_count(),
+        "atbats": atbats,
+        "pitches": pitches,
+        "seconds": round(seconds, 3),
+        "pitches_per_second": round(pitches / seconds) if seconds else None,
+        "index_mb": round(index_bytes / 1e6, 1),
+    }
+
+
+def _query_set():
+    # Realistic lookups drawn from the index itself: the latest season's most
+    # common sequences, one of their prefixes as a pattern, and an at-bat
+    # to find neighbours for
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    from query import batch_search, search
+    from indexing.season_files import season_paths
+    from indexing.sequence_codec import get_vocab
+    from indexing.sequence_cube import sequence_frequency, sequence_outcomes
+    from indexing.similarity_index import atbat_features, similar_atbats
+    from indexing.transition_index import next_pitch_distribution
+
+    year, season_path = max(season_paths().items())
+    season = pq.read_table(season_path, columns=["game_pk", "at_bat_number", "pitch_sequence_key"])
+    counts = pc.value_counts(season.column("pitch_sequence_key")).to_pylist()
+    counts.sort(key=lambda c: c["counts"], reverse=True)
+    common = [c["values"] for c in counts[:BATCH_SIZE]]
+    vocab = get_vocab()
+    sequences = [vocab.decode(key) for key in common]
+    top = sequences[0]
+    # A multi-pitch sequence makes a better prefix than the most common one-pitch at-bat
+    longer = next((s for s in sequences if len(s) >= 3), top)
+    pattern = " ".join(f"{p}/*" for p, _ in longer[:2])
+    sample = season.slice(season.num_rows // 2, 1).to_pylist()[0]
+    features = atbat_features(sample["game_pk"], sample["at_bat_number"], year)
+
+    return {
+        "exact_search": lambda: search(top).num_rows,
+        "prefix_search": lambda: search(longer[:2], prefix=True).num_rows,
+        "pattern_search": lambda: search(pattern, prefix=True).num_rows,
+        "filtered_search": lambda: search(top, start_date=f"{year}-01-01", innings=[1, 2, 3]).num_rows,
+        "situational_search": lambda: search(top, situation=SITUATION).num_rows,
+        "batch_search": lambda: sum(t.num_rows for t in batch_search(sequences)),
+        "sequence_frequency": lambda: len(sequence_frequency(common[0])),
+        "sequence_outcomes": lambda: len(sequence_outcomes(common[0])),
+        "next_pitch": lambda: len(next_pitch_distribution(vocab.encode(longer[:2], add=False))),
+        "similar_atbats": lambda: len(similar_atbats(features, k=10)),
+    }
+
+
+def bench_query(args):
+    # First call of each query in a fresh process with no Arrow cache is
+    # "cold"; the median of the following calls is "warm"
+    from indexing.arrow_cache import CACHE_DIR
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    queries = _query_set()
+    results = {}
+    for name, run in queries.items():
+        cold, rows = _timed(run)
+        warm = [_timed(run)[0] for _ in range(args.repeat)]
+        results[name] = {
+            "rows": rows,
+            "cold_ms": round(cold * 1000, 2),
+            "warm_ms": round(statistics.median(warm) * 1000, 2),
+            "warm_min_ms": round(min(warm) * 1000, 2),
+        }
+    results["batch_search"]["sequences"] = BATCH_SIZE
+    return results
+
+
+def bench_append(args):
+    from indexing.pitch_index import append_changed_files
+    # prepare_workspace only holds a month back when there's more than one
+    held = _monthly_files(HOLDOUT_DIR) if os.path.isdir(HOLDOUT_DIR) else []
+    if not held:
+        return {"skipped": "only one monthly file; nothing to append"}
+    import pyarrow.parquet as pq
+    pitches = sum(pq.ParquetFile(f).metadata.num_rows for f in held)
+    for fpath in held:
+        shutil.move(fpath, os.path.join(MONTHLY_DIR, os.path.basename(fpath)))
+    seconds, (_, appended) = _timed(append_changed_files, MONTHLY_DIR)
+    return {
+        "files": len(held),
+        "pitches": pitches,
+        "atbats": sum(appended.values()),
+        "seasons": sorted(appended),
+        "seconds": round(seconds, 3),
+        "pitches_per_second": round(pitches / seconds) if seconds else None,
+    }
+
+
+BENCHMARKS = {
+    "process_file": bench_process_file,
+    "build": bench_build,
+    "query": bench_query,
+    "append": bench_append,
+}
+
+
+def run_scenario(args):
+    result = BENCHMARKS[args.scenario](args)
+    result.update(_peak_rss_mb())
+    with open(args.result_file, "w") as f:
+        json.dump(result, f)
+
+
+# --- driver ---
+
+def _scenario_env():
+    return dict(os.environ, PYTHONPATH=os.path.join(REPO_ROOT, "pitch_prospector"), TQDM_DISABLE="1")
+
+
+def prepare_workspace(args):
+    workspace = tempfile.mkdtemp(prefix="pitch_prospector_bench_")
+    monthly_dir = os.path.join(workspace, MONTHLY_DIR)
+    os.makedirs(monthly_dir)
+    if args.dataset == "bundled":
+        for fpath in _monthly_files(BUNDLED_DIR):
+            shutil.copy2(fpath, monthly_dir)
+    else:
+        write_synthetic_months(monthly_dir, SCALES[args.scale], args.seed)
+    if args.curated:
+        subprocess.run(
+            [sys.executable, "-m", "indexing.statcast_curate"],
+            cwd=workspace, env=_scenario_env(), capture_output=True, check=True,
+        )
+
+    files = _monthly_files(monthly_dir)
+    dataset = describe_dataset(args, files)
+    if len(files) > 1:
+        os.makedirs(os.path.join(workspace, HOLDOUT_DIR))
+        shutil.move(files[-1], os.path.join(workspace, HOLDOUT_DIR))
+    return workspace, dataset
+
+
+def describe_dataset(args, files):
+    import pyarrow.parquet as pq
+    return {
+        "source": args.dataset,
+        "scale": args.scale if args.dataset == "synthetic" else None,
+        "seed": args.seed if args.dataset == "synthetic" else None,
+        "curated": args.curated,
+        "months": len(files),
+        "first_month": os.path.basename(files[0]).removesuffix(".parquet") if files else None,
+        "last_month": os.path.basename(files[-1]).removesuffix(".parquet") if files else None,
+        "raw_pitches": sum(pq.ParquetFile(f).metadata.num_rows for f in files),
+        "raw_mb": round(sum(os.path.getsize(f) for f in files) / 1e6, 1),
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip() != ""
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+    }
+
+
+def spawn_scenario(name, workspace, args):
+    result_file = os.path.join(workspace, f"{name}.json")
+    command = [
+        sys.executable, os.path.abspath(__file__), "--scenario", name,
+        "--result-file", result_file, "--repeat", str(args.repeat),
+    ]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    proc = subprocess.run(command, cwd=workspace, env=_scenario_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:])
+        print(proc.stderr[-4000:], file=sys.stderr)
+        raise RuntimeError(f"Benchmark {name!r} failed with exit code {proc.returncode}")
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def _flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(baseline, current):
+    # Side by side for every timing and memory figure; ratio > 1 means slower or bigger
+    base = dict(_flatten(baseline["results"]))
+    print(f"\n📊 {baseline.get('commit', '?')[:10]} → {current.get('commit', '?')[:10]}")
+    if baseline.get("dataset") != current.get("dataset"):
+        print("⚠️ The two runs used different datasets; ratios are not like for like.")
+    for name, value in _flatten(current["results"]):
+        if not name.endswith(("seconds", "_ms", "_mb")) or name not in base:
+            continue
+        if not base[name]:
+            ratio = 1.0 if not value else float("inf")
+        else:
+            ratio = value / base[name]
+        flag = " ⚠️" if ratio > 1.2 else ""
+        print(f"  {name:<45} {base[name]:>10} → {value:>10}  ×{ratio:.2f}{flag}")
+
+
+def main(args):
+    # Queries and appends need an index, and scenarios always run in pipeline order
+    wanted = set(args.scenarios)
+    if wanted & {"query", "append"}:
+        wanted.add("build")
+    scenarios = [name for name in SCENARIOS if name in wanted]
+
+    commit, dirty = git_revision()
+    workspace, dataset = prepare_workspace(args)
+    print(f"🔄 Benchmarking {args.dataset} data ({dataset['months']} months) in {workspace}")
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": dataset,
+        "environment": environment(),
+        "results": {},
+    }
+    try:
+        for name in scenarios:
+            report["results"][name] = spawn_scenario(name, workspace, args)
+            print(f"✅ {name}: {json.dumps(report['results'][name])}")
+    finally:
+        if args.keep_workspace:
+            print(f"📁 Workspace kept at {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        label = args.dataset if args.dataset == "bundled" else f"{args.dataset}-{args.scale}"
+        if args.curated:
+            label += "-curated"
+        output = os.path.join(RESULTS_DIR, f"{label}-{(commit or 'nogit')[:10]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark index builds, appends and queries")
+    parser.add_argument("--dataset", choices=["bundled", "synthetic"], default="bundled")
+    parser.add_argument("--scale", choices=list(SCALES), default="month", help="synthetic dataset size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--curated", action="store_true", help="curate the month files before benchmarking")
+    parser.add_argument("--workers", type=int, default=None, help="build worker processes (default: one per CPU)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="warm query repetitions")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", default=None, help="results JSON (default: benchmarks/results/<dataset>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--keep-workspace", action="store_true")
+    # Internal: run one scenario in the current directory and write its result
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.scenario:
+        run_scenario(args)
+    else:
+        main(args)
@@ -0,0 +1,226 @@
+# synthetic_statcast.py
+
+# Seeded generator for Statcast-shaped monthly files, so the benchmarks can
+# run at any scale without network access. Games are simulated half-inning by
+# half-inning with a real ball/strike/out state machine, so at-bat lengths,
+# pitch counts per game and the spread of sequences look like the real feed;
+# pitch physics is drawn per pitch type. The same seed always produces the
+# same files.
+
+import os
+import argparse
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+TEAMS = [
+    "ARI", "ATL", "BAL", "BOS", "CHC", "CWS", "CIN", "CLE", "COL", "DET",
+    "HOU", "KC", "LAA", "LAD", "MIA", "MIL", "MIN", "NYM", "NYY", "OAK",
+    "PHI", "PIT", "SD", "SEA", "SF", "STL", "TB", "TEX", "TOR", "WSH",
+]
+
+# pitch_type: (pitch_name, mean speed, mean spin)
+PITCH_TYPES = {
+    "FF": ("4-Seam Fastball", 94.0, 2300),
+    "SI": ("Sinker", 93.0, 2150),
+    "FC": ("Cutter", 89.0, 2400),
+    "SL": ("Slider", 85.0, 2450),
+    "ST": ("Sweeper", 82.0, 2600),
+    "CU": ("Curveball", 79.0, 2550),
+    "KC": ("Knuckle Curve", 81.0, 2500),
+    "CH": ("Changeup", 85.0, 1750),
+    "FS": ("Split-Finger", 86.0, 1300),
+}
+
+# (description, probability) before the at-bat's state is taken into account
+PITCH_RESULTS = [
+    ("ball", 0.35), ("called_strike", 0.16), ("swinging_strike", 0.10),
+    ("foul", 0.18), ("hit_into_play", 0.17), ("blocked_ball", 0.02),
+    ("foul_tip", 0.01), ("swinging_strike_blocked", 0.01),
+]
+
+IN_PLAY_EVENTS = [
+    ("field_out", 0.64), ("single", 0.20), ("double", 0.06), ("home_run", 0.045),
+    ("force_out", 0.02), ("grounded_into_double_play", 0.02), ("sac_fly", 0.01), ("triple", 0.005),
+]
+
+MONTHS_IN_SEASON = [3, 4, 5, 6, 7, 8, 9, 10]
+GAMES_PER_DAY = 15
+PITCHERS_PER_TEAM = 13
+BATTERS_PER_TEAM = 13
+
+
+def _choice_table(pairs):
+    names = [name for name, _ in pairs]
+    probs = np.array([p for _, p in pairs])
+    return names, probs / probs.sum()
+
+
+class Roster:
+    # Stable player ids, handedness and pitch mixes for every team, derived
+    # from the seed so every month of a run agrees on who's who
+    def __init__(self, rng):
+        self.pitchers, self.batters = {}, {}
+        self.arsenal, self.p_throws, self.stand = {}, {}, {}
+        next_id = 400000
+        pitch_types = list(PITCH_TYPES)
+        for team in TEAMS:
+            self.pitchers[team] = list(range(next_id, next_id + PITCHERS_PER_TEAM))
+            next_id += PITCHERS_PER_TEAM
+            self.batters[team] = list(range(next_id, next_id + BATTERS_PER_TEAM))
+            next_id += BATTERS_PER_TEAM
+            for pitcher in self.pitchers[team]:
+                mix = rng.choice(pitch_types[1:], size=rng.integers(2, 5), replace=False).tolist()
+                weights = rng.dirichlet(np.ones(len(mix) + 1))
+                self.arsenal[pitcher] = (["FF"] + mix, np.sort(weights)[::-1])
+                self.p_throws[pitcher] = "R" if rng.random() < 0.72 else "L"
+            for batter in self.batters[team]:
+                self.stand[batter] = "R" if rng.random() < 0.6 else "L"
+
+
+def simulate_game(rng, roster, game_pk, game_date, home, away):
+    results, result_probs = _choice_table(PITCH_RESULTS)
+    events, event_probs = _choice_table(IN_PLAY_EVENTS)
+    rows = []
+    score = {home: 0, away: 0}
+    lineup_pos = {home: 0, away: 0}
+    at_bat_number = 0
+    for inning in range(1, 10):
+        for topbot in ("Top", "Bot"):
+            bat_team, fld_team = (away, home) if topbot == "Top" else (home, away)
+            if inning == 9 and topbot == "Bot" and score[home] > score[away]:
+                break
+            staff = roster.pitchers[fld_team]
+            pitcher = staff[min(len(staff) - 1, (inning - 1) // 2 + rng.integers(0, 2))]
+            pitch_types, pitch_probs = roster.arsenal[pitcher]
+            outs = 0
+            while outs < 3:
+                at_bat_number += 1
+                batter = roster.batters[bat_team][lineup_pos[bat_team] % 9]
+                lineup_pos[bat_team] += 1
+                balls = strikes = 0
+                pitch_number = 0
+                while True:
+                    pitch_number += 1
+                    description = results[rng.choice(len(results), p=result_probs)]
+                    event = None
+                    if description in ("ball", "blocked_ball"):
+                        if balls == 3:
+                            event = "walk"
+                    elif description in ("called_strike", "swinging_strike", "swinging_strike_blocked", "foul_tip"):
+                        if strikes == 2:
+                            event = "strikeout"
+                    elif description == "hit_into_play":
+                        event = events[rng.choice(len(events), p=event_probs)]
+                    rows.append((
+                        game_date, game_pk, at_bat_number, pitch_number, batter, pitcher,
+                        pitch_types[rng.choice(len(pitch_types), p=pitch_probs)], description, event,
+                        balls, strikes, inning, topbot, home, away,
+                        roster.stand[batter], roster.p_throws[pitcher], outs,
+                        score[home], score[away], score[bat_team], score[fld_team],
+                    ))
+                    if event is not None:
+                        break
+                    if description in ("ball", "blocked_ball"):
+                        balls += 1
+                    elif description != "foul" or strikes < 2:
+                        strikes += 1
+                if event in ("walk", "single", "double", "triple"):
+                    pass
+                elif event == "home_run":
+                    score[bat_team] += 1
+                elif event == "grounded_into_double_play":
+                    outs += 2
+                else:
+                    outs += 1
+                if event in ("walk", "single") and rng.random() < 0.25:
+                    score[bat_team] += 1
+    return rows
+
+
+ROW_COLUMNS = [
+    "game_date", "game_pk", "at_bat_number", "pitch_number", "batter", "pitcher",
+    "pitch_type", "description", "events",
+    "balls", "strikes", "inning", "inning_topbot", "home_team", "away_team",
+    "stand", "p_throws", "outs_when_up",
+    "home_score", "away_score", "bat_score", "fld_score",
+]
+
+
+def _zone(plate_x, plate_z):
+    # 1-9 inside the strike zone (3x3 grid), 11-14 for the four outside quadrants
+    col = np.clip(((plate_x + 0.83) / (1.66 / 3)).astype(int), 0, 2)
+    row = np.clip(((3.5 - plate_z) / (2.0 / 3)).astype(int), 0, 2)
+    inside = (np.abs(plate_x) <= 0.83) & (plate_z >= 1.5) & (plate_z <= 3.5)
+    outside = np.where(plate_z > 2.5, np.where(plate_x < 0, 11, 12), np.where(plate_x < 0, 13, 14))
+    return np.where(inside, row * 3 + col + 1, outside)
+
+
+def generate_month(year, month, seed=0, games_per_day=GAMES_PER_DAY):
+    # One month of games as a Statcast-shaped DataFrame, newest game first like the real feed
+    roster = Roster(np.random.default_rng(seed))
+    rng = np.random.default_rng([seed, year, month])
+    day = date(year, month, 1)
+    next_month = (day + timedelta(days=32)).replace(day=1)
+    rows = []
+    game_pk = year * 100000 + month * 5000
+    while day < next_month:
+        teams = rng.permutation(TEAMS)
+        for g in range(min(games_per_day, len(TEAMS) // 2)):
+            game_pk += 1
+            rows.extend(simulate_game(rng, roster, game_pk, pd.Timestamp(day), teams[2 * g], teams[2 * g + 1]))
+        day += timedelta(days=1)
+
+    df = pd.DataFrame(rows, columns=ROW_COLUMNS)
+    n = len(df)
+    speed = np.array([PITCH_TYPES[p][1] for p in PITCH_TYPES])
+    spin = np.array([PITCH_TYPES[p][2] for p in PITCH_TYPES])
+    type_idx = pd.Categorical(df["pitch_type"], categories=list(PITCH_TYPES)).codes
+    df["game_year"] = year
+    df["pitch_name"] = [PITCH_TYPES[p][0] for p in df["pitch_type"]]
+    df["des"] = None
+    df["release_speed"] = np.round(speed[type_idx] + rng.normal(0, 1.8, n), 1)
+    df["plate_x"] = np.round(rng.normal(0, 0.85, n), 2)
+    df["plate_z"] = np.round(rng.normal(2.3, 0.9, n), 2)
+    df["zone"] = _zone(df["plate_x"].to_numpy(), df["plate_z"].to_numpy())
+    df["release_spin_rate"] = np.round(spin[type_idx] + rng.normal(0, 120, n)).astype("int64")
+    df["release_extension"] = np.round(rng.normal(6.3, 0.4, n), 1)
+
+    in_play = df["description"].eq("hit_into_play").to_numpy()
+    df["launch_speed"] = np.where(in_play, np.round(rng.normal(89, 14, n), 1), np.nan)
+    df["launch_angle"] = pd.array(np.where(in_play, np.round(rng.normal(12, 25, n)), np.nan), dtype="Int64")
+    df["hit_distance_sc"] = pd.array(np.where(in_play, np.round(rng.normal(180, 110, n).clip(0)), np.nan), dtype="Int64")
+    return df.sort_values(["game_date", "game_pk", "at_bat_number", "pitch_number"], ascending=False, ignore_index=True)
+
+
+def season_months(start_year, end_year):
+    return [(year, month) for year in range(start_year, end_year + 1) for month in MONTHS_IN_SEASON]
+
+
+def write_synthetic_months(out_dir, months, seed=0, games_per_day=GAMES_PER_DAY):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for year, month in months:
+        fpath = os.path.join(out_dir, f"{year}-{month:02d}.parquet")
+        generate_month(year, month, seed, games_per_day).to_parquet(fpath, index=False)
+        paths.append(fpath)
+    return paths
+
+
+# Named sizes for --scale; months are (year, month) pairs
+SCALES = {
+    "month": [(2024, 6)],
+    "season": season_months(2024, 2024),
+    "ten-seasons": season_months(2015, 2024),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write seeded synthetic Statcast monthly files")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", choices=list(SCALES), default="month")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--games-per-day", type=int, default=GAMES_PER_DAY)
+    args = parser.parse_args()
+    paths = write_synthetic_months(args.out_dir, SCALES[args.scale], args.seed, args.games_per_day)
+    print(f"✅ Wrote {len(paths)} synthetic months to {args.out_dir}")
@@ -1,31 +1,51 @@
 import streamlit as st
 import pandas as pd
-import os
-import hashlib
 from datetime import datetime
-import pyarrow.parquet as pq
-from pybaseball import playerid_reverse_lookup
-import numpy as np
 
-# Refresh the data
-from indexing.auto_refresh_pitch_index import auto_refresh_pitch_index
-
-# Trigger auto-refresh when app starts (can limit to once per session)
+from indexing.background_refresh import RefreshScheduler
+from indexing.index_query import SEARCH_COLUMNS, fetch_pitch_details
+from indexing.season_files import season_paths
+from indexing.sequence_cube import sequence_frequency, sequence_outcomes
+from indexing.transition_index import next_pitch_distribution
+from indexing.similarity_index import atbat_features, similar_atbats
+from indexing.pattern_index import OUTCOME_FAMILIES, PITCH_FAMILIES, WILDCARD
+from indexing.situation_index import SCORE_STATES
+from indexing import metrics
+from query import parse_sequence, search, with_display_columns
+from query import sequence_key as sequence_key_for
+
+# One background refresher per server process. Pages never wait for it:
+# they serve the last published season files, and new games appear once a
+# refresh swaps the new files in.
 @st.cache_resource
-def refresh_data():
-    auto_refresh_pitch_index()
-
-refresh_data()  # runs once per app session
+def refresh_scheduler():
+    return RefreshScheduler().start()
 
-INDEX_PATH = "pitch_prospector/data/atbat_pitch_sequence_index.parquet"
-SEASON_INDEX_PATTERN = "pitch_prospector/data/atbat_pitch_sequence_index_{year}.parquet"
+scheduler = refresh_scheduler()
 
 st.title("At-Bat Sequence Finder")
+
+if scheduler.running:
+    st.sidebar.caption("🔄 Checking for new games in the background; results update when it finishes.")
+elif scheduler.last_error:
+    st.sidebar.warning(f"Last data refresh failed: {scheduler.last_error}")
+elif scheduler.last_finished:
+    st.sidebar.caption(f"Data last refreshed {scheduler.last_finished:%b %d, %H:%M}")
+
+# Only shown when metrics are on (PITCH_PROSPECTOR_METRICS); spans are this
+# server process's, newest first, so concurrent sessions interleave
+if metrics.enabled():
+    with st.sidebar.expander("🛠️ Debug: recent timings"):
+        st.caption(f"Logging to {metrics.log_path()}")
+        recent = pd.DataFrame(metrics.recent_spans(limit=50))
+        if recent.empty:
+            st.write("No spans recorded yet.")
+        else:
+            recent["counters"] = recent["counters"].map(lambda c: ", ".join(f"{k}={v:,}" for k, v in c.items()))
+            st.dataframe(recent[["span", "parent", "ms", "counters"]], hide_index=True)
 st.markdown("Pick a date range to filter historical at-bats.")
 
 # Date range selector
-from datetime import datetime, timedelta
-
 today = datetime.today()
 two_years_ago = today.replace(year=today.year - 2)
 
@@ -45,34 +65,13 @@ with col2:
         max_value=today
     )
 
-start_date = pd.to_datetime(start_date)
-end_date = pd.to_datetime(end_date)
-
-
 # Make sure they're both converted to datetime64 for filtering
 start_date = pd.to_datetime(start_date)
 end_date = pd.to_datetime(end_date)
 
 
-filters = [("game_date", ">=", start_date), ("game_date", "<=", end_date)]
-
-# Determine which years are needed
-start_year = start_date.year
-end_year = end_date.year
-season_dfs = []
-season_files_found = False
-for year in range(start_year, end_year + 1):
-    season_path = SEASON_INDEX_PATTERN.format(year=year)
-    if os.path.exists(season_path):
-        df = pq.read_table(season_path).to_pandas()
-        season_dfs.append(df)
-        season_files_found = True
-
-if season_files_found and season_dfs:
-    atbat_df = pd.concat(season_dfs, ignore_index=True)
-    # Filter by exact date range
-    atbat_df = atbat_df[(pd.to_datetime(atbat_df["game_date"]) >= start_date) & (pd.to_datetime(atbat_df["game_date"]) <= end_date)]
-else:
+# Determine which season files cover the range; rows are only read on search
+if not season_paths(start_date.year, end_date.year):
     st.error("No per-season index files found for the selected date range.")
     st.stop()
 
@@ -108,8 +107,21 @@ ALL_OUTCOMES = [
     "bunt_miss", "hit_into_play", "hit_into_play_score", "hit_into_play_no_out"
 ]
 
-all_pitches = sorted(PITCH_TYPE_MAP.keys())
-all_outcomes = sorted(ALL_OUTCOMES)
+# Wildcards and families route the search through the pattern index
+PATTERN_LABELS = {
+    WILDCARD: "Any",
+    "fastball": "Any fastball",
+    "breaking": "Any breaking ball",
+    "offspeed": "Any offspeed",
+    "any_ball": "Any ball",
+    "any_called_strike": "Any called strike",
+    "whiff": "Any swinging strike",
+    "any_foul": "Any foul",
+    "in_play": "Any ball in play",
+}
+
+all_pitches = [WILDCARD] + list(PITCH_FAMILIES) + sorted(PITCH_TYPE_MAP.keys())
+all_outcomes = [WILDCARD] + list(OUTCOME_FAMILIES) + sorted(ALL_OUTCOMES)
 
 with st.form("pitch_sequence_form"):
     num_pitches = st.number_input("Number of pitches in sequence", min_value=1, max_value=10, value=3)
@@ -124,99 +136,163 @@ with st.form("pitch_sequence_form"):
                 all_pitches,
                 key=f"pitch_{i}",
                 index=all_pitches.index("FF") if "FF" in all_pitches else 0,
-                format_func=lambda x: str(PITCH_TYPE_MAP.get(x, x))
+                format_func=lambda x: PATTERN_LABELS.get(x, str(PITCH_TYPE_MAP.get(x, x)))
             )
         with cols[1]:
-            default_strikes = [o for o in all_outcomes if "strike" in o.lower()]
+            default_strikes = [o for o in ALL_OUTCOMES if "strike" in o.lower()]
             default_index = all_outcomes.index(default_strikes[0]) if default_strikes else 0
             outcome = st.selectbox(
                 f"Pitch {i+1} result",
                 all_outcomes,
                 key=f"outcome_{i}",
                 index=default_index,
-                format_func=lambda x: str(x).title().replace('_', ' ')
+                format_func=lambda x: PATTERN_LABELS.get(x, str(x).title().replace('_', ' '))
             )
         pitch_inputs.append(pitch)
         outcome_inputs.append(outcome)
 
+    # Answered from the situation postings, intersected with the sequence match
+    with st.expander("Game situation (optional)"):
+        situation_cols = st.columns(2)
+        with situation_cols[0]:
+            p_throws = st.selectbox("Pitcher throws", ["Any", "L", "R"])
+            outs = st.multiselect("Outs when the at-bat began", [0, 1, 2])
+        with situation_cols[1]:
+            stand = st.selectbox("Batter stands", ["Any", "L", "R"])
+            score_state = st.selectbox("Batting team is", ["Any"] + list(SCORE_STATES), format_func=str.title)
+        innings = st.slider("Innings (10 = extra innings)", min_value=1, max_value=10, value=(1, 10))
+
+    match_prefix = st.checkbox("Also match at-bats that continue past the last pitch", value=False)
     submitted = st.form_submit_button("Search")
 
+situation = {
+    "p_throws": None if p_throws == "Any" else p_throws,
+    "stand": None if stand == "Any" else stand,
+    "outs_when_up": outs or None,
+    "score_diff": SCORE_STATES.get(score_state),
+    "inning": None if innings == (1, 10) else range(innings[0], innings[1] + 1 if innings[1] < 10 else 100),
+}
+
+PAGE_SIZE = 25
+
+# Sorting happens on the full match set before a page is cut
+SORT_OPTIONS = {
+    "Newest first": False,
+    "Oldest first": True,
+}
+
 if submitted:
     with st.spinner("Searching for matching at-bats..."):
-        # Ensure sequence is a tuple of tuples to match the index
-        sequence = tuple((p, o) for p, o in zip(pitch_inputs, outcome_inputs))
-        hash_input = str(sequence).encode("utf-8")
-        sequence_hash = hashlib.sha1(hash_input).hexdigest()
-
-
-        matches = atbat_df[atbat_df["pitch_sequence_hash"] == sequence_hash]
-
-        # Ensure matches is a DataFrame
-        if isinstance(matches, pd.DataFrame) and not matches.empty:
-            # Create explicit copy to avoid SettingWithCopyWarning
-            matches = matches.copy()
-            
-            # 1. Gather all unique IDs as strings
-            all_ids = pd.unique(matches[["pitcher", "batter"]].values.ravel())
-            # all_ids = [int(x) for x in all_ids if x is not None]
-        
-            # 2. Lookup all IDs at once
-            lookup_df = playerid_reverse_lookup(all_ids)
-            lookup_df["full_name"] = lookup_df["name_first"] + " " + lookup_df["name_last"]
-            lookup_df["key_mlbam"] = lookup_df["key_mlbam"].astype(str)  # Ensure string type
-
-            # 3. Build lookup Series for fast mapping
-            name_lookup = lookup_df.set_index("key_mlbam")["full_name"]
-
-
-            # 4. Map names and images to matches DataFrame
-            matches["pitcher_name"] = matches["pitcher"].astype(str).map(name_lookup)
-            matches["batter_name"] = matches["batter"].astype(str).map(name_lookup)
-            matches["pitcher_img"] = matches["pitcher"].astype(str).map(lambda x: f"https://securea.mlb.com/mlb/images/players/head_shot/{x}.jpg")
-            matches["batter_img"] = matches["batter"].astype(str).map(lambda x: f"https://securea.mlb.com/mlb/images/players/head_shot/{x}.jpg")
-
-            def build_statcast_url(row):
-                game_date_str = pd.to_datetime(row['game_date']).date()
-                return (
-                    f"https://baseballsavant.mlb.com/statcast_search?"
-                    f"player_type=pitcher&"
-                    f"game_date_gt={game_date_str}&"
-                    f"game_date_lt={game_date_str}&"
-                    f"pitchers_lookup%5B%5D={row['pitcher']}&"
-                    f"batters_lookup%5B%5D={row['batter']}&"
-                    f"hfInn={row['inning']}%7C&"
-                    f"hfSea={pd.to_datetime(row['game_date']).year}%7C"
-                )
-
-            matches["statcast_url"] = matches.apply(build_statcast_url, axis=1)
-
-
-            for _, row in matches.iterrows():
-                st.markdown(
-                    f"<div style='text-align: center;'>"
-                    f"<h3>{row['pitcher_name'].title()} vs {row['batter_name'].title()} — {row['game_date']:%B %d, %Y}</h3>"
-                    f"</div>",
-                    unsafe_allow_html=True
-)
-                cols = st.columns([1, 6, 1])
-                with cols[0]:
-                    st.image(row["pitcher_img"], width=75)
-                with cols[1]:
-                    pitch_cols = st.columns(len(row["pitch_sequence"]))
-                    for i, pitch in enumerate(row["pitch_sequence"]):
-                        with pitch_cols[i]:
-                            pitch_level_data = row["pitch_level_data"][i]
-
-
-                            st.markdown(f"<div style='text-align:center;'>"
-                                        f"<strong>{pitch_level_data['pitch_type']}</strong><br>"
-                                        f"{pitch_level_data['release_speed']} mph<br>"
-                                        f"Zone {int(pitch_level_data.get('zone', '–'))}"
-                                        f"</div>", unsafe_allow_html=True)
-                with cols[2]:
-                    st.image(row["batter_img"], width=75)
-
-                st.markdown(f"<div style='text-align: center;'><a href='{row['statcast_url']}' target='_blank'>🔗 Watch on Statcast</a></div>", unsafe_allow_html=True)
-                st.markdown("---")
-        else:
-            st.subheader("No matching at-bats found.")
+        # Same search the batch API and CLI run; exact sequences go by key,
+        # wildcards, families and prefix matches through the pattern index
+        tokens = parse_sequence(zip(pitch_inputs, outcome_inputs))
+        with metrics.span("app.search", start=f"{start_date:%Y-%m-%d}", end=f"{end_date:%Y-%m-%d}") as s:
+            matches = search(tokens, start_date, end_date, prefix=match_prefix, columns=SEARCH_COLUMNS, situation=situation).to_pandas()
+            s.count("atbats", len(matches))
+        prefix_key = sequence_key_for(tokens)
+        sequence_key = None if match_prefix else prefix_key
+
+    # Kept across reruns so paging and sorting don't repeat the search
+    st.session_state["matches"] = matches if isinstance(matches, pd.DataFrame) and not matches.empty else None
+    st.session_state["sequence_key"] = sequence_key
+    st.session_state["prefix_key"] = prefix_key
+    st.session_state["results_page"] = 1
+
+if "matches" in st.session_state:
+    matches = st.session_state["matches"]
+    if matches is None:
+        st.subheader("No matching at-bats found.")
+        st.stop()
+
+    total = len(matches)
+    num_pages = -(-total // PAGE_SIZE)
+    st.subheader(f"{total:,} matching at-bats")
+
+    # Exact sequences have precomputed season aggregates; no at-bat rows are read
+    sequence_key = st.session_state.get("sequence_key")
+    if sequence_key is not None:
+        with st.expander("How often this sequence happens, and how it ends (full seasons)"):
+            freq = sequence_frequency(sequence_key, start_date.year, end_date.year)
+            freq["share"] = (freq["share"] * 100).round(2)
+            st.dataframe(
+                freq.rename(columns={"num_atbats": "At-bats", "share": "% of at-bats", "season_rank": "Rank in season"}),
+                hide_index=True,
+            )
+            outcomes = sequence_outcomes(sequence_key, start_date.year, end_date.year)
+            outcomes = outcomes.groupby("events", dropna=False)["num_atbats"].sum().sort_values(ascending=False)
+            st.bar_chart(outcomes.rename(index=lambda e: "(no event)" if pd.isna(e) else e.replace("_", " ").title()))
+
+    # Transition tables answer "what comes next" with one keyed read
+    prefix_key = st.session_state.get("prefix_key")
+    if prefix_key is not None:
+        with st.expander("What comes next? (full seasons)"):
+            next_pitches = next_pitch_distribution(prefix_key, start_date.year, end_date.year).head(10)
+            next_pitches["share"] = (next_pitches["share"] * 100).round(1)
+            st.dataframe(
+                next_pitches.rename(columns={
+                    "pitch_type": "Pitch", "description": "Result", "num_pitches": "Pitches", "share": "% of next pitches",
+                }),
+                hide_index=True,
+            )
+
+    controls = st.columns([2, 1])
+    with controls[0]:
+        sort_label = st.selectbox("Sort by", list(SORT_OPTIONS), key="results_sort")
+    with controls[1]:
+        page_number = st.number_input(f"Page (of {num_pages:,})", min_value=1, max_value=num_pages, key="results_page")
+
+    first = (page_number - 1) * PAGE_SIZE
+    with metrics.span("app.page", page=int(page_number)) as s:
+        ordered = matches.sort_values(["game_date", "game_pk", "at_bat_number"], ascending=SORT_OPTIONS[sort_label], kind="stable")
+        page = with_display_columns(ordered.iloc[first:first + PAGE_SIZE])
+        # Pitch detail lives in its own table; only fetch it for the visible at-bats
+        pitch_df = fetch_pitch_details(page).to_pandas()
+        s.count("pitches", len(pitch_df))
+    st.caption(f"Showing {first + 1:,}–{first + len(page):,} of {total:,}")
+
+    pitches_by_atbat = {
+        key: group.to_dict(orient="records")
+        for key, group in pitch_df.groupby(["game_pk", "at_bat_number"], sort=False)
+    }
+
+    for _, row in page.iterrows():
+        st.markdown(
+            f"<div style='text-align: center;'>"
+            f"<h3>{row['pitcher_name'].title()} vs {row['batter_name'].title()} — {row['game_date']:%B %d, %Y}</h3>"
+            f"</div>",
+            unsafe_allow_html=True
+        )
+        cols = st.columns([1, 6, 1])
+        with cols[0]:
+            st.image(row["pitcher_img"], width=75)
+        with cols[1]:
+            pitches = pitches_by_atbat.get((row["game_pk"], row["at_bat_number"]), [])
+            pitch_cols = st.columns(max(len(pitches), 1))
+            for i in range(len(pitches)):
+                with pitch_cols[i]:
+                    pitch_level_data = pitches[i]
+
+
+                    st.markdown(f"<div style='text-align:center;'>"
+                                f"<strong>{pitch_level_data['pitch_type']}</strong><br>"
+                                f"{pitch_level_data['release_speed']} mph<br>"
+                                f"Zone {int(pitch_level_data.get('zone', '–'))}"
+                                f"</div>", unsafe_allow_html=True)
+        with cols[2]:
+            st.image(row["batter_img"], width=75)
+
+        st.markdown(f"<div style='text-align: center;'><a href='{row['statcast_url']}' target='_blank'>🔗 Watch on Statcast</a></div>", unsafe_allow_html=True)
+
+        # Nearest neighbours by pitch physics among at-bats of the same length
+        if st.button("Find similar at-bats", key=f"similar_{row['game_pk']}_{row['at_bat_number']}"):
+            with metrics.span("app.similar"):
+                query = atbat_features(row["game_pk"], row["at_bat_number"], row["game_date"].year)
+                similar = similar_atbats(query, k=6, start_year=start_date.year, end_year=end_date.year, columns=SEARCH_COLUMNS)
+            is_self = (similar["game_pk"] == row["game_pk"]) & (similar["at_bat_number"] == row["at_bat_number"])
+            similar = with_display_columns(similar[~is_self].head(5))
+            st.dataframe(
+                similar[["game_date", "pitcher_name", "batter_name", "distance", "statcast_url"]],
+                column_config={"statcast_url": st.column_config.LinkColumn("Statcast")},
+                hide_index=True,
+            )
+        st.markdown("---")
@@ -1,71 +1,44 @@
 # append_index.py
 
-import os
-import pandas as pd
-from pathlib import Path
-from indexing.pitch_index import process_file
-from datetime import datetime
-from tqdm import tqdm
+from indexing.pitch_index import append_changed_files, bootstrap_manifest, migrate_season_indexes
+from indexing.index_manifest import load_manifest, latest_indexed_date
+from indexing.season_files import SEASON_INDEX_PATTERN
+from indexing.player_registry import prewarm_player_registry
+from indexing.index_lock import index_lock
+from indexing.sequence_codec import reload_vocab
 
 DATA_DIR = "pitch_prospector/data/statcast_monthly"
-INDEX_PATH = "pitch_prospector/data/atbat_pitch_sequence_index.parquet"
 
-def get_latest_index_month(index_path):
-    if not os.path.exists(index_path):
+def get_latest_index_month(manifest):
+    last_date = latest_indexed_date(manifest)
+    if last_date is None:
         return None
-    df = pd.read_parquet(index_path, columns=["game_date"])
-    last_date = pd.to_datetime(df["game_date"]).max()
     return last_date.strftime("%Y-%m")
 
 def append_index_by_month():
-    last_indexed_month = get_latest_index_month(INDEX_PATH)
-    if not last_indexed_month:
-        print("📂 No existing index found. Please run the full build instead.")
-        return
-    print(f"📅 Most recent indexed month: {last_indexed_month}")
-
-    files = sorted([f for f in os.listdir(DATA_DIR) if f.endswith(".parquet")], reverse=True)
-    new_rows = []
-
-    for fname in tqdm(files):
-        file_month = fname.replace(".parquet", "")
-        if file_month <= last_indexed_month:
-            break  # stop as soon as we hit an older or equal month
-
-        fpath = os.path.join(DATA_DIR, fname)
-        try:
-            df = pd.read_parquet(fpath)
-            df["game_date"] = pd.to_datetime(df["game_date"])
-            recent_df = df[df["game_date"] > pd.to_datetime(last_indexed_month)]
-
-            if not recent_df.empty:
-                # Save to temp file and reuse existing logic
-                temp_path = fpath.replace(".parquet", "_temp_filtered.parquet")
-                recent_df.to_parquet(temp_path, index=False)
-                new_rows.extend(process_file(temp_path))
-                os.remove(temp_path)
-
-        except Exception as e:
-            print(f"❌ Failed to process {fname}: {e}")
-
-    if new_rows:
-        new_df = pd.DataFrame(new_rows)
-        # Only write/append to per-season index files
-        if "game_year" not in new_df.columns:
-            new_df["game_year"] = pd.to_datetime(new_df["game_date"]).dt.year
-        for year, group in new_df.groupby("game_year"):
-            season_path = f"pitch_prospector/data/atbat_pitch_sequence_index_{year}.parquet"
-            if os.path.exists(season_path):
-                season_df = pd.read_parquet(season_path)
-                season_combined = pd.concat([season_df, group], ignore_index=True)
-                # Deduplicate
-                season_combined.drop_duplicates(subset=["game_pk", "at_bat_number"], keep="last", inplace=True)
-            else:
-                season_combined = group
-            season_combined.to_parquet(season_path, index=False)
-            print(f"✅ Appended {len(group):,} at-bats to {season_path}")
-    else:
-        print("✅ No new games found to index.")
+    # Same lock as the app's background refresh, so the two never write at once
+    with index_lock():
+        # Codes another process saved since this one loaded the vocab stay put
+        reload_vocab()
+        migrate_season_indexes()
+        manifest = load_manifest()
+        if not manifest["files"]:
+            manifest = bootstrap_manifest(DATA_DIR, manifest)
+
+        last_indexed_month = get_latest_index_month(manifest)
+        if not last_indexed_month:
+            print("📂 No existing index found. Please run the full build instead.")
+            return
+        print(f"📅 Most recent indexed month: {last_indexed_month}")
+
+        # Only months the manifest has no record of, or whose file changed, are reprocessed
+        manifest, appended = append_changed_files(DATA_DIR, manifest)
+        if appended:
+            for year, count in appended.items():
+                print(f"✅ Appended {count:,} at-bats to {SEASON_INDEX_PATTERN.format(year=year)}")
+            prewarm_player_registry()
+        else:
+            print("✅ No new games found to index.")
 
 if __name__ == "__main__":
     append_index_by_month()
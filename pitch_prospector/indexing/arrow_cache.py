@@ -0,0 +1,126 @@
+# arrow_cache.py
+
+# Process-wide cache of the season files as memory-mapped Arrow IPC. Each
+# parquet file is converted once to an uncompressed .arrow copy under
+# CACHE_DIR; readers then map that copy instead of decoding parquet, so a
+# lookup is a zero-copy take. Mapped pages live in the OS page cache, which
+# makes them shared between Streamlit sessions (one table object per
+# process) and between app processes (one copy in RAM per machine).
+#
+# Each copy is stamped with its parquet file's mtime and size and is rebuilt
+# whenever they no longer match, so a refresh that publishes a new season
+# file is picked up on the next read (even one staged before an older copy
+# was made). The stamp is that of the exact file the copy was read from,
+# and a copy is only served under its own stamp, so a slower process that
+# swaps in a copy of an older file is never mistaken for a current one.
+# Sidecar readers use the same stamps to make sure the row ids they hold
+# belong to the table they take them from.
+# Replacing the .arrow file never disturbs a reader still mapping the old one.
+
+import os
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from indexing.metrics import count, span
+
+CACHE_DIR = "pitch_prospector/data/arrow_cache"
+SOURCE_STAMP_KEY = b"pitch_prospector.source_stamp"
+
+# Conversions raced by other processes before falling back to reading parquet
+CONVERT_ATTEMPTS = 3
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def cache_path_for(parquet_path, cache_dir=CACHE_DIR):
+    name = os.path.splitext(os.path.basename(parquet_path))[0]
+    return os.path.join(cache_dir, f"{name}.arrow")
+
+
+def source_stamp(parquet_path):
+    st = os.stat(parquet_path)
+    return f"{st.st_mtime_ns}:{st.st_size}".encode()
+
+
+def open_stamped(parquet_path):
+    # The file memory-mapped, with its stamp. Files are only ever replaced by
+    # rename, so if the path's stamp is the same before and after the open,
+    # the mapped file is the one that stamp belongs to.
+    while True:
+        stamp = source_stamp(parquet_path)
+        source = pa.memory_map(parquet_path, "r")
+        if source_stamp(parquet_path) == stamp:
+            return source, stamp
+        source.close()
+
+
+def convert_to_ipc(parquet_path, cache_path):
+    # Returns the stamp of the parquet file the copy was made from, which is
+    # newer than the caller's if the file was replaced in between
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # pid-suffixed temp file so app processes converting at once don't collide
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    source, stamp = open_stamped(parquet_path)
+    with span("arrow_cache.convert", source=parquet_path) as s, source:
+        pf = pq.ParquetFile(source)
+        schema = pf.schema_arrow
+        schema = schema.with_metadata({**(schema.metadata or {}), SOURCE_STAMP_KEY: stamp})
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for rg in range(pf.num_row_groups):
+                    writer.write_table(pf.read_row_group(rg).replace_schema_metadata(schema.metadata))
+        os.replace(tmp_path, cache_path)
+        s.count("bytes_read", source.size())
+        s.count("rows_read", pf.metadata.num_rows)
+    return stamp
+
+
+def _open_copy(cache_path, stamp):
+    # The mapped table if the copy was made from this exact parquet file
+    if not os.path.exists(cache_path):
+        return None
+    reader = pa.ipc.open_file(pa.memory_map(cache_path, "r"))
+    metadata = dict(reader.schema.metadata or {})
+    if metadata.pop(SOURCE_STAMP_KEY, None) != stamp:
+        return None
+    return reader.read_all().replace_schema_metadata(metadata)
+
+
+def cached_table(parquet_path, cache_dir=CACHE_DIR):
+    # The whole file as a memory-mapped Arrow table; nothing is read into
+    # process memory until a column is actually touched
+    return stamped_table(parquet_path, cache_dir)[0]
+
+
+def stamped_table(parquet_path, cache_dir=CACHE_DIR):
+    # (table, stamp): cached_table along with the stamp of the file it holds
+    stamp = source_stamp(parquet_path)
+    with _lock:
+        hit = _tables.get(parquet_path)
+        if hit is not None and hit[0] == stamp:
+            count("cache_hits")
+            return hit[1], stamp
+        count("cache_misses")
+
+        cache_path = cache_path_for(parquet_path, cache_dir)
+        table = _open_copy(cache_path, stamp)
+        for _ in range(CONVERT_ATTEMPTS):
+            if table is not None:
+                break
+            # Another process may swap in its own copy, of an older or newer
+            # file, between the convert and the open; only a copy carrying the
+            # stamp of the file it was read from is served
+            stamp = convert_to_ipc(parquet_path, cache_path)
+            table = _open_copy(cache_path, stamp)
+        if table is None:
+            count("cache_convert_races")
+            source, stamp = open_stamped(parquet_path)
+            table = pq.read_table(source)
+        _tables[parquet_path] = (stamp, table)
+        return table, stamp
+
+
+def clear_cache():
+    with _lock:
+        _tables.clear()
@@ -1,18 +1,18 @@
 # auto_refresh_pitch_index.py
 
-import os
 from datetime import datetime, timedelta
-import pandas as pd
-from pybaseball import statcast
-from tqdm import tqdm
 import warnings
 from pathlib import Path
-import pyarrow.parquet as pq
-from indexing.pitch_index import process_file
+from indexing.pitch_index import append_changed_files, bootstrap_manifest, migrate_season_indexes
+from indexing.index_manifest import load_manifest, latest_indexed_date
+from indexing.season_files import SEASON_INDEX_PATTERN
+from indexing.statcast_download import StatcastDownloader
+from indexing.player_registry import prewarm_player_registry
+from indexing.metrics import timed
+from indexing.sequence_codec import reload_vocab
 
 # -------- CONFIG -------- #
 DATA_DIR = "pitch_prospector/data/statcast_monthly"
-INDEX_PATH = "pitch_prospector/data/atbat_pitch_sequence_index.parquet"
 
 # -------- WARNINGS -------- #
 warnings.filterwarnings(
@@ -23,11 +23,8 @@ warnings.filterwarnings(
 )
 
 # -------- HELPERS -------- #
-def get_latest_index_date(index_path):
-    if not os.path.exists(index_path):
-        return None
-    df = pd.read_parquet(index_path, columns=["game_date"])
-    return pd.to_datetime(df["game_date"]).max()
+def get_latest_index_date(manifest):
+    return latest_indexed_date(manifest)
 
 def get_month_start_dates(start_date, end_date):
     months = []
@@ -37,76 +34,40 @@ def get_month_start_dates(start_date, end_date):
         date = (date + timedelta(days=32)).replace(day=1)
     return months
 
-def download_statcast_month(start):
-    end = (start + timedelta(days=32)).replace(day=1)
-    fname = f"{start.year}-{start.month:02d}.parquet"
-    fpath = os.path.join(DATA_DIR, fname)
+def download_statcast_months(months):
+    # Day-chunked, retried and resumable; the month still in progress is
+    # rewritten with whatever days have been played so far
+    return StatcastDownloader(DATA_DIR).download_months(months)
 
-    if os.path.exists(fpath):
-        return fpath
-
-    try:
-        df = statcast(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
-        if df.empty:
-            return None
-        df.to_parquet(fpath, index=False)
-        return fpath
-    except Exception as e:
-        print(f"❌ Failed to download {fname}: {e}")
-        return None
-
-def append_new_data(last_indexed_date):
-    files = sorted([f for f in os.listdir(DATA_DIR) if f.endswith(".parquet")], reverse=True)
-    new_rows = []
-
-    for fname in files:
-        file_month = fname.replace(".parquet", "")
-        file_date = pd.to_datetime(file_month + "-01")
-        if file_date < last_indexed_date.replace(day=1):
-            break
-
-        fpath = os.path.join(DATA_DIR, fname)
-        try:
-            df = pd.read_parquet(fpath)
-            df["game_date"] = pd.to_datetime(df["game_date"])
-            recent_df = df[df["game_date"] >= last_indexed_date]
-
-            if not recent_df.empty:
-                temp_path = fpath.replace(".parquet", "_temp_filtered.parquet")
-                recent_df.to_parquet(temp_path, index=False)
-                new_rows.extend(process_file(temp_path))
-                os.remove(temp_path)
-
-        except Exception as e:
-            print(f"❌ Failed to process {fname}: {e}")
-
-    if not new_rows:
+def append_new_data(manifest):
+    # Reprocesses new or changed monthly files straight from memory
+    manifest, appended = append_changed_files(DATA_DIR, manifest)
+    if not appended:
         print("✅ No new at-bats found to index.")
-        return
-
-    new_df = pd.DataFrame(new_rows)
-    # Only write/append to per-season index files
-    if "game_year" not in new_df.columns:
-        new_df["game_year"] = pd.to_datetime(new_df["game_date"]).dt.year
-    for year, group in new_df.groupby("game_year"):
-        season_path = f"pitch_prospector/data/atbat_pitch_sequence_index_{year}.parquet"
-        if os.path.exists(season_path):
-            season_df = pd.read_parquet(season_path)
-            season_combined = pd.concat([season_df, group], ignore_index=True)
-            season_combined.drop_duplicates(subset=["game_pk", "at_bat_number"], keep="last", inplace=True)
-        else:
-            season_combined = group
-        season_combined.to_parquet(season_path, index=False)
-        print(f"✅ Appended {len(group):,} at-bats to {season_path}")
+        return manifest
+    for year, count in appended.items():
+        print(f"✅ Appended {count:,} at-bats to {SEASON_INDEX_PATTERN.format(year=year)}")
+    # Players debuting in the new games get their names cached too
+    prewarm_player_registry()
+    return manifest
 
 # -------- MAIN REFRESH ENTRYPOINT -------- #
+@timed("refresh")
 def auto_refresh_pitch_index():
     print("🔄 Starting automated pitch index refresh...")
+    # Callers hold the index lock; another app process may have appended,
+    # and saved new codes, since this one loaded the vocab
+    reload_vocab()
 
     Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
+    migrate_season_indexes()
+
+    manifest = load_manifest()
+    if not manifest["files"]:
+        manifest = bootstrap_manifest(DATA_DIR, manifest)
 
-    last_indexed_date = get_latest_index_date(INDEX_PATH)
-    if not last_indexed_date:
+    last_indexed_date = get_latest_index_date(manifest)
+    if last_indexed_date is None:
         print("❌ No existing pitch index found. Run full build instead.")
         return
 
@@ -116,8 +77,7 @@ def auto_refresh_pitch_index():
     # STEP 1: Download all missing months
     months_to_check = get_month_start_dates(last_indexed_date, today)
     print(f"📦 Checking {len(months_to_check)} months of new data...")
-    for start in tqdm(months_to_check):
-        download_statcast_month(start)
+    download_statcast_months(months_to_check)
 
     # STEP 2: Append new data
-    append_new_data(last_indexed_date)
+    append_new_data(manifest)
@@ -2,12 +2,10 @@
 
 # this pulls all the raw data from statcast to populate the data dir
 
-import os
-from datetime import datetime, timedelta
-import pandas as pd
-from pybaseball import statcast
-from tqdm import tqdm
+from datetime import datetime
 import warnings
+from indexing.index_lock import index_lock
+from indexing.statcast_download import DATA_DIR, StatcastDownloader
 
 # Ignore statcast pull error messages on pybaseball infra end
 warnings.filterwarnings(
@@ -18,13 +16,10 @@ warnings.filterwarnings(
 )
 
 
-DATA_DIR = "pitch_prospector/data/statcast_monthly"
 START_YEAR = 2015
 NOW = datetime.now()
 
 
-os.makedirs(DATA_DIR, exist_ok=True)
-
 all_months = []
 for year in range(START_YEAR, NOW.year + 1):
     for month in range(1, 13):
@@ -33,21 +28,10 @@ for year in range(START_YEAR, NOW.year + 1):
             continue
         all_months.append(start)
 
+# Finished months and already-fetched days are skipped via the download
+# ledger, so re-running after an interruption resumes where it stopped. The
+# app's background refresh downloads into the same files, hence the lock.
 print(f"📦 Beginning historical backfill: {len(all_months)} months to check")
-for start in tqdm(all_months):
-    end = (start + timedelta(days=32)).replace(day=1)
-    fname = f"{start.year}-{start.month:02d}.parquet"
-    fpath = os.path.join(DATA_DIR, fname)
-
-    if os.path.exists(fpath):
-        continue
-
-    try:
-        df = statcast(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
-        if df.empty:
-            continue
-        cols_in_df = [col for col in df.columns]
-        df = df[cols_in_df]
-        df.to_parquet(fpath, index=False)
-    except Exception as e:
-        print(f"❌ Failed to download {fname}: {e}")
+with index_lock():
+    written = StatcastDownloader(DATA_DIR).download_months(all_months, today=NOW)
+print(f"✅ Wrote {len(written)} monthly files to {DATA_DIR}")
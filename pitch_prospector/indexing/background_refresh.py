@@ -0,0 +1,74 @@
+# background_refresh.py
+
+# Runs the index refresh off the request path. The app starts one
+# RefreshScheduler per server process; it refreshes straight away and then
+# every REFRESH_INTERVAL on a daemon thread, while pages keep serving the
+# season files that were last published. Only one process refreshes at a
+# time: the others find the index lock taken and skip that round.
+#
+# Season files are published by rename (see SeasonWriter), and every reader
+# keys its caches on file mtimes, so new games show up on the first read
+# after the swap without restarting anything.
+
+import threading
+from datetime import datetime
+from indexing.index_lock import index_lock
+
+REFRESH_INTERVAL = 6 * 60 * 60
+
+
+class RefreshScheduler:
+    def __init__(self, interval=REFRESH_INTERVAL, refresh=None):
+        self.interval = interval
+        self.refresh = refresh
+        self.running = False
+        self.last_started = None
+        self.last_finished = None
+        self.last_error = None
+        self.rounds_skipped = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _refresh(self):
+        if self.refresh is not None:
+            return self.refresh()
+        # pybaseball, tqdm and the write path load here, on the refresh
+        # thread, rather than when the app starts
+        from indexing.auto_refresh_pitch_index import auto_refresh_pitch_index
+        return auto_refresh_pitch_index()
+
+    def run_once(self):
+        # Returns False if another process was already refreshing
+        with index_lock(blocking=False) as acquired:
+            if not acquired:
+                self.rounds_skipped += 1
+                return False
+            self.running = True
+            self.last_started = datetime.now()
+            try:
+                self._refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Background refresh failed: {e}")
+            finally:
+                self.running = False
+                self.last_finished = datetime.now()
+            return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="index-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
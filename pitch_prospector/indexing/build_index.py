@@ -1,50 +1,77 @@
 # build_index.py
 
 import os
+import sys
+import shutil
+import argparse
 import pandas as pd
-from pathlib import Path
-from pitch_index import process_file
-from concurrent.futures import ThreadPoolExecutor, as_completed
+# Run as a script (python pitch_prospector/indexing/build_index.py) only this
+# directory is on sys.path; its parent makes the indexing package importable
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indexing.pitch_index import SHARD_DIR, SeasonWriter, process_all_files
+from indexing.index_manifest import MANIFEST_VERSION, record_file, save_manifest
+from indexing.player_registry import prewarm_player_registry
+from indexing.metrics import timed
+from indexing.index_lock import index_lock
+from indexing.sequence_codec import reload_vocab
 from tqdm import tqdm
 
 
 DATA_DIR = "pitch_prospector/data/statcast_monthly"
-INDEX_PATH = "pitch_prospector/data/atbat_pitch_sequence_index.parquet"
 
-def build_index():
-    print(f"🔄 Rebuilding pitch index from all files in: {DATA_DIR}")
-    files = sorted([f for f in os.listdir(DATA_DIR) if f.endswith(".parquet")])
-    file_paths = [os.path.join(DATA_DIR, f) for f in files]
+@timed("build")
+def build_index(workers=None):
+    # Waits for any refresh in progress (the app's included) and holds it off until done
+    with index_lock():
+        # Codes another process saved since this one loaded the vocab stay put
+        reload_vocab()
+        print(f"🔄 Rebuilding pitch index from all files in: {DATA_DIR}")
+        files = sorted([f for f in os.listdir(DATA_DIR) if f.endswith(".parquet")])
+        print(f"📦 Found {len(files)} files to process with {workers or os.cpu_count()} worker processes.")
 
-    all_rows = []
+        # Workers write one shard per monthly file; the parent only sees shard metadata
+        shutil.rmtree(SHARD_DIR, ignore_errors=True)
+        shards = process_all_files(DATA_DIR, max_workers=workers, shard_dir=SHARD_DIR)
 
-    print(f"📦 Found {len(file_paths)} files to process.")
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_file, fpath): fpath for fpath in file_paths}
-        with tqdm(total=len(futures), desc="🔧 Processing files") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-                all_rows.extend(result)
-                pbar.update(1)
+        if not any(shard["num_atbats"] for shard in shards):
+            print("⚠️ No data found. Index not created.")
+            return
 
-    if not all_rows:
-        print("⚠️ No data found. Index not created.")
-        return
+        # Stream shards in month order into per-season writers; only one month
+        # of at-bats is ever held in memory, however many seasons are indexed
+        writers = {}
+        for shard in tqdm(shards, desc="🔧 Writing seasons"):
+            atbats = pd.read_parquet(shard["atbats_path"])
+            pitches = pd.read_parquet(shard["pitches_path"])
+            atbat_years = pd.to_datetime(atbats["game_date"]).dt.year
+            pitch_years = pd.to_datetime(pitches["game_date"]).dt.year
+            for year in shard["seasons"]:
+                if year not in writers:
+                    writers[year] = SeasonWriter(year)
+                writers[year].write(atbats[atbat_years == year], pitches[pitch_years == year])
 
-    df = pd.DataFrame(all_rows)
+        total = 0
+        for year, writer in sorted(writers.items()):
+            season_path = writer.close()
+            total += writer.num_atbats
+            print(f"✅ Season {year}: {writer.num_atbats:,} at-bats saved to {season_path}")
 
-    # Deduplicate in case of duplicate data files or overlapping at-bats
-    df.drop_duplicates(subset=["game_pk", "at_bat_number"], keep="last", inplace=True)
+        # A full build replaces the manifest: every source file is now indexed
+        manifest = {"version": MANIFEST_VERSION, "files": {}}
+        for shard in shards:
+            record_file(manifest, shard["source"], shard)
+        save_manifest(manifest)
 
-    # Only write per-season index files
-    if "game_year" not in df.columns:
-        df["game_year"] = pd.to_datetime(df["game_date"]).dt.year
-    for year, group in df.groupby("game_year"):
-        season_path = f"pitch_prospector/data/atbat_pitch_sequence_index_{year}.parquet"
-        group.to_parquet(season_path, index=False)
-        print(f"✅ Season {year}: {len(group):,} at-bats saved to {season_path}")
+        shutil.rmtree(SHARD_DIR, ignore_errors=True)
 
-    print(f"✅ Index built successfully: {len(df):,} unique at-bats saved to per-season files.")
+        # Resolve every indexed player's name now so searches never go to the network
+        added = prewarm_player_registry()
+        print(f"👤 Player registry: {added:,} new names cached.")
+        print(f"✅ Index built successfully: {total:,} unique at-bats saved to per-season files.")
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Rebuild the per-season pitch sequence index")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    build_index(workers=args.workers)
@@ -0,0 +1,28 @@
+# compact_index.py
+
+# Folds every season's delta segments back into its base. Appends already
+# compact a season once its deltas pass the thresholds in season_segments.py;
+# this is for doing it by hand, e.g. after a long run of small refreshes.
+
+import argparse
+from indexing.pitch_index import compact_season
+from indexing.season_files import season_paths
+from indexing.season_segments import load_segments, needs_compaction
+from indexing.index_lock import index_lock
+
+
+def compact_index(force=False):
+    # Same lock as appends and the app's background refresh
+    with index_lock():
+        for year, season_path in season_paths().items():
+            deltas = load_segments(season_path)["deltas"]
+            if not deltas or not (force or needs_compaction(season_path)):
+                continue
+            compact_season(year)
+            print(f"✅ Season {year}: folded {len(deltas)} delta segments into {season_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold delta segments into their season's base")
+    parser.add_argument("--force", action="store_true", help="compact every season with deltas, not just those past the thresholds")
+    args = parser.parse_args()
+    compact_index(force=args.force)
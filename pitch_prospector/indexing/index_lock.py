@@ -0,0 +1,52 @@
+# index_lock.py
+
+# Cross-process lock around everything that rewrites the index or the
+# Statcast files it's built from: the app's background refresh, append_index,
+# build_index and the monthly backfill. It's an advisory lock on
+# LOCK_PATH taken through the OS (flock, or msvcrt on Windows), so it goes
+# away with its holder even if that process is killed.
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCK_PATH = "pitch_prospector/data/index.lock"
+
+
+def _acquire(f, blocking):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+
+
+def _release(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def index_lock(blocking=True, path=LOCK_PATH):
+    # Yields True once the lock is held; with blocking=False it yields False
+    # straight away if another process has it
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+") as f:
+        try:
+            _acquire(f, blocking)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _release(f)
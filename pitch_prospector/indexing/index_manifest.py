@@ -0,0 +1,82 @@
+# index_manifest.py
+
+# Persisted record of which monthly Statcast files the season indexes were
+# built from. Each entry keeps the file's size, mtime and checksum plus what
+# indexing it produced, so a refresh can tell exactly which months are new or
+# changed and the "last indexed" date never has to be re-derived from the
+# index files themselves.
+
+import hashlib
+import json
+import os
+import pandas as pd
+
+MANIFEST_PATH = "pitch_prospector/data/index_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_checksum(fpath, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(fpath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_file_changed(manifest, fpath):
+    entry = manifest["files"].get(os.path.basename(fpath))
+    if entry is None:
+        return True
+    stat = os.stat(fpath)
+    if stat.st_size != entry["size"]:
+        return True
+    if stat.st_mtime == entry["mtime"]:
+        return False
+    # Touched but maybe not rewritten; only the checksum can tell
+    return file_checksum(fpath) != entry["sha1"]
+
+
+def changed_files(manifest, data_dir):
+    files = sorted(f for f in os.listdir(data_dir) if f.endswith(".parquet"))
+    return [os.path.join(data_dir, f) for f in files if is_file_changed(manifest, os.path.join(data_dir, f))]
+
+
+def summarize_output(atbats, pitches):
+    game_dates = pd.to_datetime(atbats["game_date"])
+    return {
+        "num_pitches": int(len(pitches)),
+        "num_atbats": int(len(atbats)),
+        "max_game_date": game_dates.max().strftime("%Y-%m-%d") if len(atbats) else None,
+        "seasons": sorted(int(y) for y in game_dates.dt.year.unique()),
+    }
+
+
+def record_file(manifest, fpath, summary):
+    stat = os.stat(fpath)
+    manifest["files"][os.path.basename(fpath)] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha1": file_checksum(fpath),
+        **{k: summary[k] for k in ("num_pitches", "num_atbats", "max_game_date", "seasons")},
+    }
+
+
+def latest_indexed_date(manifest):
+    dates = [entry["max_game_date"] for entry in manifest["files"].values() if entry.get("max_game_date")]
+    if not dates:
+        return None
+    return pd.to_datetime(max(dates))
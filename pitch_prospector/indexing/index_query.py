@@ -0,0 +1,107 @@
+# index_query.py
+
+# Query layer over the per-season at-bat index files. Rows are read from the
+# memory-mapped Arrow copies in arrow_cache: a sequence key becomes a take of
+# the positions its lookup sidecar lists, a date range an expression filter,
+# a game situation the intersection of its posting lists (situation_index),
+# and callers get back an Arrow table holding just the matching at-bats.
+# Each season is read segment by segment (base, then deltas; see
+# season_segments.py), skipping rows a newer segment has replaced, and the
+# sidecars a segment's row ids come from are checked against the very table
+# they're taken from (season_files.py).
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from indexing.season_files import FIRST_SEASON, as_datetime, pitch_path_for, read_consistent, season_paths
+from indexing.season_segments import season_segments, visible, visible_row_ids
+from indexing.sequence_lookup import find_sequence_row_ids
+from indexing.situation_index import active_situation, match_situation_rows
+from indexing.arrow_cache import cached_table, stamped_table
+
+# Columns the search view needs; everything else stays on disk
+SEARCH_COLUMNS = [
+    "game_date", "game_pk", "at_bat_number",
+    "batter", "pitcher", "inning",
+    "pitch_sequence_key",
+]
+
+# Per-pitch detail shown for each rendered at-bat
+PITCH_DETAIL_COLUMNS = [
+    "game_pk", "at_bat_number", "pitch_number",
+    "pitch_type", "description", "release_speed", "zone",
+]
+
+
+def date_filter(start_date=None, end_date=None):
+    expr = None
+    if start_date is not None:
+        expr = pc.field("game_date") >= pa.scalar(as_datetime(start_date), type=pa.timestamp("ns"))
+    if end_date is not None:
+        upper = pc.field("game_date") <= pa.scalar(as_datetime(end_date), type=pa.timestamp("ns"))
+        expr = upper if expr is None else expr & upper
+    return expr
+
+
+def query_atbats(start_date=None, end_date=None, sequence_key=None, columns=None, situation=None):
+    # situation: {dimension: values} over SITUATION_DIMENSIONS, e.g.
+    # {"p_throws": "L", "outs_when_up": 2}
+    start_year = as_datetime(start_date).year if start_date is not None else FIRST_SEASON
+    end_year = as_datetime(end_date).year if end_date is not None else None
+    paths = list(season_paths(start_year, end_year).values())
+    if not paths:
+        return None
+
+    expr = date_filter(start_date, end_date)
+    situation = active_situation(situation)
+
+    def read_segment(segment):
+        table, stamp = stamped_table(segment.path)
+        row_ids = None
+        if sequence_key is not None:
+            row_ids = find_sequence_row_ids(segment.path, sequence_key, stamp)
+        if situation:
+            situation_rows = match_situation_rows(segment.path, situation, stamp)
+            row_ids = situation_rows if row_ids is None else np.intersect1d(row_ids, situation_rows, assume_unique=True)
+        if row_ids is None:
+            return visible(table, segment)
+        # Only the positions the lookup / situation sidecars list are taken
+        return table.take(pa.array(visible_row_ids(segment, row_ids, table)))
+
+    tables = []
+    for season_path in paths:
+        for segment in season_segments(season_path):
+            table = read_consistent(read_segment, segment)
+            if expr is not None:
+                table = table.filter(expr)
+            tables.append(table.select(columns) if columns else table)
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def fetch_pitch_details(atbats, columns=None):
+    # atbats: Arrow table (or DataFrame) with game_pk, at_bat_number, game_date.
+    # game_pk narrows each season's mapped pitch table to whole games before
+    # the join keeps only the requested at-bats.
+    if not isinstance(atbats, pa.Table):
+        atbats = pa.Table.from_pandas(atbats, preserve_index=False)
+    columns = columns or PITCH_DETAIL_COLUMNS
+    if atbats.num_rows == 0:
+        return None
+
+    years = sorted(set(pc.year(atbats.column("game_date")).to_pylist()))
+    paths = [season_paths(year, year).get(year) for year in years]
+    segments = [segment for path in paths if path for segment in season_segments(path)]
+    if not segments:
+        return None
+
+    wanted = atbats.select(["game_pk", "at_bat_number"]).group_by(["game_pk", "at_bat_number"]).aggregate([])
+    game_pks = pc.cast(wanted.column("game_pk").unique(), pa.int64())
+    read_columns = list(dict.fromkeys(["game_pk", "at_bat_number", "pitch_number"] + columns))
+    pieces = []
+    for segment in segments:
+        pitches = cached_table(pitch_path_for(segment.path)).select(read_columns)
+        pitches = pitches.filter(pc.is_in(pitches.column("game_pk"), value_set=game_pks))
+        pieces.append(visible(pitches, segment))
+    pitches = pa.concat_tables(pieces, promote_options="permissive")
+    pitches = pitches.join(wanted, keys=["game_pk", "at_bat_number"], join_type="inner")
+    return pitches.sort_by([("game_pk", "ascending"), ("at_bat_number", "ascending"), ("pitch_number", "ascending")]).select(columns)
@@ -0,0 +1,187 @@
+# metrics.py
+
+# Named spans and counters for the refresh, build and query paths. Nothing is
+# recorded unless PITCH_PROSPECTOR_METRICS is set ("1" for the default log,
+# or a path to log to); disabled, span() hands back one shared no-op object
+# and count() returns straight away, so instrumented code pays a single flag
+# check.
+#
+# A span times one stage and collects counters (rows read, bytes read,
+# at-bats produced, files skipped, cache hits, ...) from whatever runs inside
+# it; a finished span adds its counters to its parent's, so the outermost
+# span holds the totals. Spans nest per thread. Each finished span is one
+# JSON line in the metrics log and is also kept in a small in-process ring
+# for the app's debug panel. Worker processes inherit the environment and
+# append their own lines, tagged with their pid.
+
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+from datetime import datetime, timezone
+
+METRICS_ENV = "PITCH_PROSPECTOR_METRICS"
+METRICS_PATH = "pitch_prospector/data/metrics.jsonl"
+RECENT_SPANS = 500
+
+_local = threading.local()
+_write_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_SPANS)
+
+
+def _path_from_env():
+    value = os.environ.get(METRICS_ENV, "").strip()
+    if value.lower() in ("", "0", "false", "no", "off"):
+        return None
+    return METRICS_PATH if value.lower() in ("1", "true", "yes", "on") else value
+
+
+_path = _path_from_env()
+
+
+def enabled():
+    return _path is not None
+
+
+def log_path():
+    return _path
+
+
+def enable(path=METRICS_PATH):
+    global _path
+    _path = path
+
+
+def disable():
+    global _path
+    _path = None
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _json_default(value):
+    # numpy scalars and anything else that sneaks into attributes
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _emit(record):
+    _recent.append(record)
+    path = _path
+    if path is None:
+        return
+    line = json.dumps(record, default=_json_default) + "\n"
+    with _write_lock:
+        with open(path, "a") as f:
+            f.write(line)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "counters", "parent", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.counters = {}
+        self.parent = None
+        self.start = None
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        _stack().pop()
+        if self.parent is not None:
+            for name, value in self.counters.items():
+                self.parent.count(name, value)
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "span": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "ms": round(elapsed_ms, 3),
+            "pid": os.getpid(),
+            **self.attrs,
+            "counters": self.counters,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        _emit(record)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def count(self, name, value=1):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    # with span("process_file", source=fpath) as s: ... s.count("rows_read", n)
+    if _path is None:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def count(name, value=1):
+    # Adds to the innermost open span on this thread, if any
+    if _path is None:
+        return
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].count(name, value)
+
+
+def timed(name):
+    # Decorator form of span() for whole functions
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _path is None:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def recent_spans(limit=None):
+    # Newest first, from this process only
+    spans = list(_recent)[::-1]
+    return spans[:limit] if limit else spans
+
+
+def read_metrics(path=METRICS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
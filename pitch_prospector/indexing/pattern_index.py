@@ -0,0 +1,198 @@
+# pattern_index.py
+
+# Token-level inverted index over the pitch sequences of a season file, used
+# for prefix / wildcard / pitch-family / length-range searches. For every
+# (position, token code) seen in the season we keep the sorted row ids of the
+# at-bats that have that token at that position, plus one posting list per
+# at-bat length. A pattern is answered by unioning the
+# postings a position accepts and intersecting across positions, so nothing
+# walks the pitch_sequence_key column at query time. Row ids are only taken
+# from the season table the postings were checked against (season_files.py).
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from indexing.arrow_cache import source_stamp, stamped_table
+from indexing.season_files import (
+    FIRST_SEASON, as_datetime, sidecar_path_for, is_sidecar_stale, read_consistent, read_season_file, read_rows,
+    read_sidecar, season_paths, write_sidecar,
+)
+from indexing.season_segments import season_segments, visible_row_ids
+from indexing.situation_index import active_situation, match_situation_rows
+from indexing.index_query import date_filter
+from indexing.sequence_codec import get_vocab, unpack_keys
+
+POSTINGS_ROW_GROUP_SIZE = 512
+WILDCARD = "*"
+# Statcast leaves some pitch types and descriptions empty; the vocab keeps
+# those as tokens of their own, so they get a literal name rather than "*"
+NULL_TOKEN = "null"
+
+PITCH_FAMILIES = {
+    "fastball": {"FF", "FA", "SI", "FC"},
+    "breaking": {"SL", "ST", "SV", "CU", "KC", "CS"},
+    "offspeed": {"CH", "FS", "FO", "SC", "KN", "EP"},
+}
+
+# Family names are kept distinct from the raw descriptions so "ball" still
+# means exactly ball
+OUTCOME_FAMILIES = {
+    "any_ball": {"ball", "blocked_ball", "pitchout", "intent_ball", "automatic_ball"},
+    "any_called_strike": {"called_strike", "automatic_strike"},
+    "whiff": {"swinging_strike", "swinging_strike_blocked", "missed_bunt", "bunt_miss"},
+    "any_foul": {"foul", "foul_tip", "foul_bunt", "bunt_foul", "bunt_foul_tip", "foul_pitchout"},
+    "in_play": {"hit_into_play", "hit_into_play_score", "hit_into_play_no_out"},
+}
+
+
+def postings_path_for(season_path):
+    return sidecar_path_for(season_path, "postings")
+
+
+def lengths_path_for(season_path):
+    return sidecar_path_for(season_path, "lengths")
+
+
+def _group_row_ids(table, keys):
+    # row ids are appended in file order, so every posting list comes out sorted
+    grouped = table.group_by(keys, use_threads=False).aggregate([("row_id", "list")])
+    grouped = grouped.rename_columns(keys + ["row_ids"])
+    return grouped.sort_by([(k, "ascending") for k in keys])
+
+
+def build_pattern_postings(season_path):
+    season, stamp = read_season_file(season_path, columns=["pitch_sequence_key"])
+    keys = season.column(0).combine_chunks()
+    codes, lengths = unpack_keys(keys)
+    row_ids = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    positions = np.arange(len(codes)) - starts
+
+    pitches = pa.table({
+        "position": pa.array(positions, type=pa.int16()),
+        "token": pa.array(codes, type=pa.uint16()),
+        "row_id": pa.array(row_ids, type=pa.int32()),
+    })
+    postings = _group_row_ids(pitches, ["position", "token"])
+    write_sidecar(postings, postings_path_for(season_path), stamp, row_group_size=POSTINGS_ROW_GROUP_SIZE)
+
+    by_length = pa.table({
+        "length": pa.array(lengths, type=pa.int16()),
+        "row_id": pa.array(np.arange(len(lengths)), type=pa.int32()),
+    })
+    write_sidecar(_group_row_ids(by_length, ["length"]), lengths_path_for(season_path), stamp)
+
+
+def ensure_pattern_postings(season_path, stamp=None):
+    if is_sidecar_stale(season_path, postings_path_for(season_path), stamp) or is_sidecar_stale(season_path, lengths_path_for(season_path), stamp):
+        build_pattern_postings(season_path)
+
+
+def parse_token(spec):
+    # "FF/called_strike", "breaking/in_play", "*/foul", "null/hit_into_play",
+    # "SL" or "*"
+    spec = spec.strip()
+    if spec in ("", WILDCARD):
+        return None
+    pitch, _, outcome = spec.partition("/")
+    pitch, outcome = pitch.strip(), outcome.strip()
+
+    if pitch in ("", WILDCARD):
+        pitch_types = None
+    elif pitch.lower() == NULL_TOKEN:
+        pitch_types = {None}
+    else:
+        pitch_types = PITCH_FAMILIES.get(pitch.lower(), {pitch.upper()})
+
+    if outcome in ("", WILDCARD):
+        descriptions = None
+    elif outcome.lower() == NULL_TOKEN:
+        descriptions = {None}
+    else:
+        descriptions = OUTCOME_FAMILIES.get(outcome.lower(), {outcome.lower()})
+
+    if pitch_types is None and descriptions is None:
+        return None
+    return pitch_types, descriptions
+
+
+def parse_pattern(text):
+    return [parse_token(spec) for spec in text.replace(",", " ").split()]
+
+
+def _union(row_id_lists):
+    # Different tokens at the same position never share a row, so no dedupe needed
+    return np.sort(pc.list_flatten(row_id_lists).to_numpy())
+
+
+def match_pattern_rows(season_path, pattern, prefix=True, min_length=None, max_length=None, vocab=None, stamp=None):
+    stamp = stamp or source_stamp(season_path)
+    ensure_pattern_postings(season_path, stamp)
+    if vocab is None:
+        vocab = get_vocab()
+
+    lo = len(pattern)
+    hi = None if prefix else len(pattern)
+    if min_length is not None:
+        lo = max(lo, min_length)
+    if max_length is not None:
+        hi = max_length if hi is None else min(hi, max_length)
+    if hi is not None and hi < lo:
+        return np.empty(0, dtype=np.int32)
+
+    length_filter = [("length", ">=", lo)]
+    if hi is not None:
+        length_filter.append(("length", "<=", hi))
+    by_length = read_sidecar(lengths_path_for(season_path), stamp, filters=length_filter)
+    candidate_sets = [_union(by_length.column("row_ids"))]
+
+    constrained = [(pos, token) for pos, token in enumerate(pattern) if token is not None]
+    if constrained:
+        postings = read_sidecar(
+            postings_path_for(season_path), stamp,
+            filters=[("position", "in", [pos for pos, _ in constrained])],
+        )
+        for pos, (pitch_types, descriptions) in constrained:
+            accepted = pa.array(vocab.codes_matching(pitch_types, descriptions), type=pa.uint16())
+            mask = pc.and_(pc.equal(postings.column("position"), pos), pc.is_in(postings.column("token"), accepted))
+            candidate_sets.append(_union(postings.filter(mask).column("row_ids")))
+
+    # Intersect smallest-first so each step shrinks the working set fastest
+    candidate_sets.sort(key=len)
+    rows = candidate_sets[0]
+    for other in candidate_sets[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
+
+
+def query_pattern(pattern, start_date=None, end_date=None, prefix=True, min_length=None, max_length=None, columns=None, situation=None):
+    if isinstance(pattern, str):
+        pattern = parse_pattern(pattern)
+    situation = active_situation(situation)
+
+    start_year = as_datetime(start_date).year if start_date is not None else FIRST_SEASON
+    end_year = as_datetime(end_date).year if end_date is not None else None
+    read_columns = None if columns is None else list(dict.fromkeys(columns + ["game_date"]))
+
+    def read_segment(segment):
+        table, stamp = stamped_table(segment.path)
+        rows = match_pattern_rows(segment.path, pattern, prefix, min_length, max_length, stamp=stamp)
+        if situation:
+            rows = np.intersect1d(rows, match_situation_rows(segment.path, situation, stamp), assume_unique=True)
+        return read_rows(table, visible_row_ids(segment, rows, table), read_columns)
+
+    tables = []
+    expr = date_filter(start_date, end_date)
+    for season_path in season_paths(start_year, end_year).values():
+        # Every segment has its own postings; rows a newer segment replaced are dropped
+        for segment in season_segments(season_path):
+            table = read_consistent(read_segment, segment)
+            if expr is not None:
+                table = table.filter(expr)
+            tables.append(table.select(columns) if columns else table)
+
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="default")
@@ -3,69 +3,487 @@
 # Holds all the helpers and reused logic for build_index.py and append_index.py
 
 import os
+import numpy as np
 import pandas as pd
-import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-COLUMNS_TO_KEEP = [
-    "game_date", "game_year", "game_pk",
-    "at_bat_number", "pitch_number",
-    "batter", "pitcher",
-    "pitch_type", "pitch_name", "description", "des", "events",
-    "balls", "strikes", "inning", "inning_topbot",
-    "release_speed", "plate_x", "plate_z", "zone",
-    "home_team", "away_team", "stand", "p_throws", "outs_when_up",
-    "release_spin_rate", "release_extension",
-    "hit_distance_sc", "launch_speed", "launch_angle",
-    "home_score", "away_score", "bat_score", "fld_score"
-]
-
-def process_file(fpath, existing_keys=None):
-    try:
-        df = pd.read_parquet(fpath)
-        cols_available = [col for col in COLUMNS_TO_KEEP if col in df.columns]
-        df = df[cols_available]
-        df = df.sort_values(by=["game_pk", "at_bat_number", "pitch_number"])
-        grouped = df.groupby(["game_pk", "at_bat_number"], sort=False)
-
-        rows = []
-        for (game_pk, ab_num), group in grouped:
-            if existing_keys and (game_pk, ab_num) in existing_keys:
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from indexing.season_files import SEASON_INDEX_PATTERN, SEASON_ROW_GROUP_SIZE, PITCH_INDEX_PATTERN, PITCH_ROW_GROUP_SIZE, pitch_path_for, season_paths, staging_path_for
+from indexing.sequence_codec import VOCAB_PATH, SequenceVocab, get_vocab, pack_keys
+from indexing.sequence_lookup import build_sequence_lookup, lookup_path_for
+from indexing.pattern_index import build_pattern_postings, lengths_path_for, postings_path_for
+from indexing.sequence_cube import build_sequence_cube, cube_path_for
+from indexing.transition_index import build_transitions, transitions_path_for
+from indexing.similarity_index import build_similarity_index, similarity_path_for
+from indexing.situation_index import build_situation_index, situations_path_for
+from indexing.season_segments import (
+    add_delta, atbat_ids, delta_path_for, needs_compaction, next_delta_id, retire_deltas,
+    retraction_path_for, season_segments, table_ids, visible,
+)
+from indexing.index_manifest import load_manifest, save_manifest, changed_files, record_file, summarize_output
+from indexing.metrics import count, span
+from indexing.statcast_curate import COLUMNS_TO_KEEP, PITCH_KEY, bytes_to_read, is_curated, read_statcast, to_frame
+
+SHARD_DIR = "pitch_prospector/data/shards"
+
+ATBAT_KEY = ["game_pk", "at_bat_number"]
+
+# Where the at-bat stood when it began, taken from its first pitch
+SITUATION_COLUMNS = ["inning_topbot", "outs_when_up", "stand", "p_throws", "home_team", "away_team", "bat_score", "fld_score"]
+# The count the at-bat's last pitch was thrown in
+FINAL_COUNT_COLUMNS = ["balls", "strikes"]
+
+ATBAT_COLUMNS = ["game_date", "game_pk", "at_bat_number", "batter", "pitcher", "inning"] + SITUATION_COLUMNS + FINAL_COUNT_COLUMNS
+
+def atbat_bounds(df):
+    # First row and pitch count of every at-bat in a frame sorted by PITCH_KEY
+    game_pks = df["game_pk"].to_numpy(dtype=np.int64)
+    ab_nums = df["at_bat_number"].to_numpy(dtype=np.int64)
+    is_start = np.ones(len(df), dtype=bool)
+    is_start[1:] = (game_pks[1:] != game_pks[:-1]) | (ab_nums[1:] != ab_nums[:-1])
+    starts = np.flatnonzero(is_start)
+    return starts, np.diff(np.append(starts, len(df)))
+
+def atbat_rows(df, starts, lengths):
+    # One row per at-bat; columns a month's file lacks come back empty
+    atbats = df.reindex(columns=ATBAT_COLUMNS).iloc[starts].reset_index(drop=True)
+    final = df.reindex(columns=FINAL_COUNT_COLUMNS).iloc[starts + lengths - 1].reset_index(drop=True)
+    atbats[FINAL_COUNT_COLUMNS] = final
+    return atbats
+
+def process_file(fpath, existing_keys=None, vocab=None):
+    # fpath may be a parquet path or an in-memory DataFrame / Arrow table.
+    # Returns (at-bat DataFrame, pitch-level DataFrame); the pitch table only
+    # holds pitches of the at-bats that were returned. Grouping is done on
+    # the sorted arrays: at-bat boundaries are where the key changes, so no
+    # per-at-bat Python work is needed.
+    if vocab is None:
+        vocab = get_vocab()
+    source = fpath if isinstance(fpath, str) else "in-memory table"
+    with span("process_file", source=source) as s:
+        try:
+            if isinstance(fpath, str):
+                s.count("bytes_read", bytes_to_read(fpath))
+                fpath = read_statcast(fpath)
+            # Curated files are already sorted by PITCH_KEY
+            presorted = isinstance(fpath, pa.Table) and is_curated(fpath)
+            df = to_frame(fpath) if isinstance(fpath, pa.Table) else fpath
+            s.count("rows_read", len(df))
+            cols_available = [col for col in COLUMNS_TO_KEEP if col in df.columns]
+            df = df[cols_available]
+            if not presorted:
+                df = df.sort_values(by=PITCH_KEY, kind="stable")
+            if existing_keys:
+                seen = pd.MultiIndex.from_frame(df[ATBAT_KEY]).isin(list(existing_keys))
+                s.count("rows_skipped", int(seen.sum()))
+                df = df[~seen]
+            df = df.reset_index(drop=True)
+
+            starts, lengths = atbat_bounds(df)
+            codes = vocab.encode_columns(df["pitch_type"], df["description"])
+            atbats = atbat_rows(df, starts, lengths)
+            atbats["pitch_sequence_key"] = pack_keys(codes, lengths).to_pandas()
+            s.count("atbats", len(atbats))
+            s.count("pitches", len(df))
+            return atbats, df
+        except Exception as e:
+            s.set(error=str(e))
+            print(f"❌ Failed to load {source}: {e}")
+            return pd.DataFrame(columns=ATBAT_COLUMNS + ["pitch_sequence_key"]), pd.DataFrame(columns=COLUMNS_TO_KEEP)
+
+PITCH_SCHEMA = pa.schema([
+    ("game_date", pa.timestamp("ns")), ("game_year", pa.int64()), ("game_pk", pa.int64()),
+    ("at_bat_number", pa.int64()), ("pitch_number", pa.int64()),
+    ("batter", pa.int64()), ("pitcher", pa.int64()),
+    ("pitch_type", pa.string()), ("pitch_name", pa.string()), ("description", pa.string()),
+    ("des", pa.string()), ("events", pa.string()),
+    ("balls", pa.int64()), ("strikes", pa.int64()), ("inning", pa.int64()), ("inning_topbot", pa.string()),
+    ("release_speed", pa.float64()), ("plate_x", pa.float64()), ("plate_z", pa.float64()), ("zone", pa.int64()),
+    ("home_team", pa.string()), ("away_team", pa.string()), ("stand", pa.string()), ("p_throws", pa.string()),
+    ("outs_when_up", pa.int64()),
+    ("release_spin_rate", pa.int64()), ("release_extension", pa.float64()),
+    ("hit_distance_sc", pa.int64()), ("launch_speed", pa.float64()), ("launch_angle", pa.int64()),
+    ("home_score", pa.int64()), ("away_score", pa.int64()), ("bat_score", pa.int64()), ("fld_score", pa.int64()),
+])
+
+ATBAT_SCHEMA = pa.schema([
+    ("game_date", pa.timestamp("ns")), ("game_pk", pa.int64()), ("at_bat_number", pa.int64()),
+    ("batter", pa.int64()), ("pitcher", pa.int64()), ("inning", pa.int64()),
+    ("inning_topbot", pa.string()), ("outs_when_up", pa.int8()),
+    ("stand", pa.string()), ("p_throws", pa.string()),
+    ("home_team", pa.string()), ("away_team", pa.string()),
+    ("bat_score", pa.int16()), ("fld_score", pa.int16()),
+    ("balls", pa.int8()), ("strikes", pa.int8()),
+    ("pitch_sequence_key", pa.binary()),
+])
+
+def to_arrow(df, schema):
+    # Fixed schemas keep every batch appendable to the same ParquetWriter,
+    # whatever columns or null-only dtypes a given month happened to have
+    df = df.reindex(columns=schema.names)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+SIDECAR_BUILDERS = {
+    "lookup": build_sequence_lookup,
+    "postings": build_pattern_postings,
+    "cube": build_sequence_cube,
+    "transitions": build_transitions,
+    "similar": build_similarity_index,
+    "situations": build_situation_index,
+}
+
+# Retractions only ever feed the additive aggregates
+RETRACTION_SIDECARS = ["cube", "transitions"]
+
+SIDECAR_PATHS = {
+    "lookup": [lookup_path_for],
+    "postings": [postings_path_for, lengths_path_for],
+    "cube": [cube_path_for],
+    "transitions": [transitions_path_for],
+    "similar": [similarity_path_for],
+    "situations": [situations_path_for],
+}
+
+def season_files(season_path, sidecars=SIDECAR_BUILDERS):
+    # Every file that makes up a published season, pitch file first
+    return [pitch_path_for(season_path), season_path] + [
+        path_for(season_path) for kind in sidecars for path_for in SIDECAR_PATHS[kind]
+    ]
+
+def publish_season(season_path, sidecars=SIDECAR_BUILDERS):
+    # Renames the staged season over the live one. Sidecars carry the stamp
+    # of the staged season file, which the rename keeps, so readers never
+    # pair them with another version's rows. The pitch file goes ahead of
+    # the season file: a sidecar built from it is stamped with the season
+    # file as it was beforehand, so it is never filed under the new season
+    # with the old pitches.
+    for final_path in season_files(season_path, sidecars):
+        os.replace(staging_path_for(final_path), final_path)
+
+def discard_staging(season_path, sidecars=SIDECAR_BUILDERS):
+    for final_path in season_files(season_path, sidecars):
+        staged = staging_path_for(final_path)
+        if os.path.exists(staged):
+            os.remove(staged)
+
+class SeasonWriter:
+    # Streams at-bat and pitch batches for one season into its two parquet
+    # files. Overlapping monthly files repeat boundary-day games, so a game
+    # is only taken from the first batch that contains it. Everything is
+    # written under staging names and published in close(), so readers only
+    # ever see complete seasons.
+    #
+    # By default this writes the season's base; season_path points it at a
+    # delta or retraction segment instead (see season_segments.py), with
+    # only the given sidecars built.
+    def __init__(self, year, season_path=None, sidecars=SIDECAR_BUILDERS):
+        self.year = year
+        self.is_base = season_path is None
+        self.season_path = season_path or SEASON_INDEX_PATTERN.format(year=year)
+        self.pitch_path = pitch_path_for(self.season_path)
+        self.sidecars = list(sidecars)
+        self.staging_path = staging_path_for(self.season_path)
+        self.atbat_writer = pq.ParquetWriter(self.staging_path, ATBAT_SCHEMA)
+        self.pitch_writer = pq.ParquetWriter(pitch_path_for(self.staging_path), PITCH_SCHEMA)
+        self.game_pks = set()
+        self.num_atbats = 0
+
+    def write(self, atbat_df, pitch_df):
+        seen = atbat_df["game_pk"].isin(self.game_pks)
+        atbat_df = atbat_df[~seen]
+        pitch_df = pitch_df[~pitch_df["game_pk"].isin(self.game_pks)]
+        atbat_df = atbat_df.drop_duplicates(subset=ATBAT_KEY, keep="last")
+        pitch_df = pitch_df.drop_duplicates(subset=PITCH_KEY, keep="last")
+        if atbat_df.empty:
+            return
+
+        # Each batch is sorted, so per-row-group game_pk ranges stay tight
+        # enough for pitch fetches to skip most of the file
+        self.atbat_writer.write_table(to_arrow(atbat_df, ATBAT_SCHEMA), row_group_size=SEASON_ROW_GROUP_SIZE)
+        self.pitch_writer.write_table(to_arrow(pitch_df.sort_values(by=PITCH_KEY), PITCH_SCHEMA), row_group_size=PITCH_ROW_GROUP_SIZE)
+        self.game_pks.update(atbat_df["game_pk"].unique().tolist())
+        self.num_atbats += len(atbat_df)
+        count("atbats_written", len(atbat_df))
+        count("pitches_written", len(pitch_df))
+
+    def close(self):
+        with span("season.write", year=self.year) as s:
+            self.atbat_writer.close()
+            self.pitch_writer.close()
+            s.count("bytes_written", os.path.getsize(self.staging_path) + os.path.getsize(pitch_path_for(self.staging_path)))
+            try:
+                # Sidecars are derived from the file just written so their row ids line up
+                for kind in self.sidecars:
+                    with span("season.sidecar", year=self.year, kind=kind):
+                        SIDECAR_BUILDERS[kind](self.staging_path)
+                publish_season(self.season_path, self.sidecars)
+            except BaseException:
+                discard_staging(self.season_path, self.sidecars)
+                raise
+            if self.is_base:
+                # A freshly written base holds everything its deltas did
+                retire_deltas(self.season_path)
+        return self.season_path
+
+def write_season_index(df, year, pitch_df):
+    writer = SeasonWriter(year)
+    writer.write(df, pitch_df)
+    return writer.close()
+
+def superseded_rows(season_path, atbat_df):
+    # The currently visible version of every at-bat in atbat_df that's
+    # already indexed, with its pitches. Only the games being appended are
+    # read, so row group statistics skip nearly all of each segment.
+    ids = atbat_ids(atbat_df["game_pk"], atbat_df["at_bat_number"])
+    in_games = pc.field("game_pk").isin(pa.array(atbat_df["game_pk"].unique(), pa.int64()))
+    atbats, pitches = [], []
+    for segment in season_segments(season_path):
+        for path, tables in ((segment.path, atbats), (pitch_path_for(segment.path), pitches)):
+            table = visible(pq.read_table(path, filters=in_games), segment)
+            tables.append(table.filter(pa.array(np.isin(table_ids(table), ids))))
+    return pa.concat_tables(atbats), pa.concat_tables(pitches)
+
+def atbat_fingerprints(atbat_df, pitch_df):
+    # One hash per at-bat over its row and all of its pitches, indexed by
+    # ATBAT_KEY. Both go through the stored schemas, minus the pandas
+    # metadata that would bring nullable dtypes back for only one side, so a
+    # freshly processed batch and rows read back from the season hash alike.
+    atbats = to_arrow(atbat_df, ATBAT_SCHEMA).replace_schema_metadata().to_pandas()
+    pitches = to_arrow(pitch_df, PITCH_SCHEMA).replace_schema_metadata().to_pandas()
+    pitch_hashes = pd.Series(pd.util.hash_pandas_object(pitches, index=False).to_numpy())
+    pitch_hashes = pitch_hashes.groupby([pitches["game_pk"], pitches["at_bat_number"]]).sum()
+    hashes = pd.Series(pd.util.hash_pandas_object(atbats, index=False).to_numpy(), index=pd.MultiIndex.from_frame(atbats[ATBAT_KEY]))
+    return hashes ^ pitch_hashes.reindex(hashes.index, fill_value=0).to_numpy()
+
+def unchanged_atbats(atbat_df, pitch_df, indexed_atbats, indexed_pitches):
+    # Mask over atbat_df of the at-bats already indexed exactly as they are;
+    # re-reading a month touches every at-bat in it, but only the new or
+    # corrected ones need a delta
+    if indexed_atbats.empty:
+        return np.zeros(len(atbat_df), dtype=bool)
+    incoming = atbat_fingerprints(atbat_df, pitch_df)
+    indexed = atbat_fingerprints(indexed_atbats, indexed_pitches)
+    return (incoming.to_numpy() == indexed.reindex(incoming.index).to_numpy()) & incoming.index.isin(indexed.index)
+
+def append_to_season(year, atbat_df, pitch_df):
+    # Newest wins on (game_pk, at_bat_number) for both tables. The batch
+    # becomes a new delta segment beside the untouched base, so the cost
+    # follows the batch rather than the season; the at-bats it replaces are
+    # written once more as its retraction. Deltas are folded back into the
+    # base once they're big enough to slow reads down. Returns how many
+    # at-bats were new or changed.
+    season_path = SEASON_INDEX_PATTERN.format(year=year)
+    if not os.path.exists(season_path):
+        writer = SeasonWriter(year)
+        writer.write(atbat_df, pitch_df)
+        writer.close()
+        return writer.num_atbats
+    atbat_df = atbat_df.drop_duplicates(subset=ATBAT_KEY, keep="last")
+    pitch_df = pitch_df.drop_duplicates(subset=PITCH_KEY, keep="last")
+    if atbat_df.empty:
+        return 0
+
+    with span("season.append", year=year) as s:
+        indexed_atbats, indexed_pitches = superseded_rows(season_path, atbat_df)
+        s.count("rows_read", indexed_atbats.num_rows + indexed_pitches.num_rows)
+        indexed_atbats, indexed_pitches = indexed_atbats.to_pandas(), indexed_pitches.to_pandas()
+
+        # Only new or changed at-bats go into the delta, and only the
+        # versions they replace into its retraction
+        unchanged = unchanged_atbats(atbat_df, pitch_df, indexed_atbats, indexed_pitches)
+        s.count("atbats_unchanged", int(unchanged.sum()))
+        atbat_df = atbat_df[~unchanged]
+        if atbat_df.empty:
+            return 0
+        ids = atbat_ids(atbat_df["game_pk"], atbat_df["at_bat_number"])
+        pitch_df = pitch_df[np.isin(atbat_ids(pitch_df["game_pk"], pitch_df["at_bat_number"]), ids)]
+        retracted_atbats = indexed_atbats[np.isin(atbat_ids(indexed_atbats["game_pk"], indexed_atbats["at_bat_number"]), ids)]
+        retracted_pitches = indexed_pitches[np.isin(atbat_ids(indexed_pitches["game_pk"], indexed_pitches["at_bat_number"]), ids)]
+        s.count("atbats_retracted", len(retracted_atbats))
+
+        delta_id = next_delta_id(season_path)
+        delta_path = delta_path_for(season_path, delta_id)
+        writer = SeasonWriter(year, delta_path)
+        writer.write(atbat_df, pitch_df)
+        writer.close()
+        if len(retracted_atbats):
+            retraction = SeasonWriter(year, retraction_path_for(delta_path), RETRACTION_SIDECARS)
+            retraction.write(retracted_atbats, retracted_pitches)
+            retraction.close()
+        add_delta(season_path, delta_id, writer.num_atbats, len(retracted_atbats))
+
+    if needs_compaction(season_path):
+        compact_season(year)
+    return writer.num_atbats
+
+def read_season(season_path):
+    # The season's current at-bats and pitches as DataFrames, its segments
+    # merged newest-wins
+    atbats, pitches = [], []
+    for segment in season_segments(season_path):
+        atbats.append(visible(pq.read_table(segment.path), segment))
+        pitches.append(visible(pq.read_table(pitch_path_for(segment.path)), segment))
+    atbat_df = pa.concat_tables(atbats, promote_options="permissive").to_pandas()
+    pitch_df = pa.concat_tables(pitches, promote_options="permissive").to_pandas()
+    return atbat_df.sort_values(by=ATBAT_KEY, kind="stable", ignore_index=True), pitch_df
+
+def compact_season(year):
+    # Merges the base and its deltas into a new base, which retires the
+    # deltas when it's published
+    season_path = SEASON_INDEX_PATTERN.format(year=year)
+    segments = season_segments(season_path)
+    if len(segments) == 1:
+        return season_path
+    with span("season.compact", year=year, deltas=len(segments) - 1) as s:
+        atbat_df, pitch_df = read_season(season_path)
+        s.count("rows_read", len(atbat_df) + len(pitch_df))
+        return write_season_index(atbat_df, year, pitch_df)
+
+def with_situation(atbat_df, pitch_df):
+    # Fills the situation and final count columns from the pitch table, for
+    # at-bats indexed before they were carried on the at-bat rows
+    pitch_df = pitch_df.sort_values(by=PITCH_KEY, kind="stable", ignore_index=True)
+    starts, lengths = atbat_bounds(pitch_df)
+    situation = atbat_rows(pitch_df, starts, lengths)[ATBAT_KEY + SITUATION_COLUMNS + FINAL_COUNT_COLUMNS]
+    atbat_df = atbat_df.drop(columns=SITUATION_COLUMNS + FINAL_COUNT_COLUMNS, errors="ignore")
+    return atbat_df.merge(situation, on=ATBAT_KEY, how="left")
+
+def migrate_season_indexes(vocab=None):
+    # Older season files carry pitch_sequence tuples with a SHA1 hex hash and
+    # the nested pitch_level_data column; re-key and split them in place so
+    # old and new rows line up. Seasons indexed before the at-bat rows held
+    # their situation get it filled in from the pitch table.
+    if vocab is None:
+        vocab = get_vocab()
+    for year, season_path in season_paths().items():
+        names = pq.read_schema(season_path).names
+        if "pitch_sequence_key" in names and "pitch_level_data" not in names:
+            segment_names = [set(pq.read_schema(segment.path).names) for segment in season_segments(season_path)]
+            if all(set(SITUATION_COLUMNS) <= segment for segment in segment_names):
                 continue
+            df, pitch_df = read_season(season_path)
+            write_season_index(with_situation(df, pitch_df), year, pitch_df)
+            print(f"🔁 Migrated {season_path} to at-bat rows with their game situation")
+            continue
+
+        df = pd.read_parquet(season_path)
+        if "pitch_sequence_key" not in names:
+            df["pitch_sequence_key"] = [
+                vocab.encode((pitch_type, description) for pitch_type, description in seq)
+                for seq in df["pitch_sequence"]
+            ]
+            df = df.drop(columns=["pitch_sequence", "pitch_sequence_hash"], errors="ignore")
+            vocab.save()
 
-            pitch_data = group.to_dict(orient="records")
-            # Ensure pitch_sequence is always a tuple of tuples
-            pitch_sequence = tuple((p.get("pitch_type"), p.get("description")) for p in pitch_data)
-            hash_input = str(pitch_sequence).encode("utf-8")
-            pitch_sequence_hash = hashlib.sha1(hash_input).hexdigest()
-
-            rows.append({
-                "game_date": group.iloc[0]["game_date"],
-                "game_pk": game_pk,
-                "at_bat_number": ab_num,
-                "batter": group.iloc[0]["batter"],
-                "pitcher": group.iloc[0]["pitcher"],
-                "inning": group.iloc[0]["inning"],
-                "pitch_sequence": pitch_sequence,
-                "pitch_sequence_hash": pitch_sequence_hash,
-                "pitch_level_data": pitch_data
-            })
-        return rows
-    except Exception as e:
-        print(f"❌ Failed to load {fpath}: {e}")
-        return []
-
-def process_all_files(data_dir, existing_keys=None, max_workers=4):
+        pitch_path = PITCH_INDEX_PATTERN.format(year=year)
+        if "pitch_level_data" in names:
+            pitch_df = pd.DataFrame([pitch for pitches in df["pitch_level_data"] for pitch in pitches])
+            df = df.drop(columns=["pitch_level_data"])
+        else:
+            pitch_df = pd.read_parquet(pitch_path)
+        write_season_index(with_situation(df, pitch_df), year, pitch_df)
+        print(f"🔁 Migrated {season_path} to integer keys with a separate pitch-level table")
+
+def prime_vocab(file_paths, vocab=None):
+    # Hand out codes for every token up front (reading just the two token
+    # columns) so worker processes can all encode against one frozen vocabulary
+    if vocab is None:
+        vocab = get_vocab()
+    for fpath in file_paths:
+        table = read_statcast(fpath, columns=PITCH_KEY + ["pitch_type", "description"])
+        tokens = table.to_pandas()
+        if not is_curated(table):
+            tokens = tokens.sort_values(by=PITCH_KEY, kind="stable")
+        vocab.encode_columns(tokens["pitch_type"], tokens["description"])
+    vocab.save()
+    return vocab
+
+def process_file_to_shard(fpath, shard_dir=SHARD_DIR, existing_keys=None, vocab_path=VOCAB_PATH):
+    # Worker entry point: writes this file's at-bats and pitches as parquet
+    # shards and only sends the small shard description back to the parent
+    vocab = SequenceVocab.load(vocab_path, frozen=True)
+    atbats, pitches = process_file(fpath, existing_keys, vocab)
+
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    atbat_path = os.path.join(shard_dir, f"{name}.atbats.parquet")
+    pitch_path = os.path.join(shard_dir, f"{name}.pitches.parquet")
+    atbats.to_parquet(atbat_path, index=False)
+    pitches.to_parquet(pitch_path, index=False)
+    return {
+        "source": fpath,
+        "atbats_path": atbat_path,
+        "pitches_path": pitch_path,
+        **summarize_output(atbats, pitches),
+    }
+
+def process_all_files(data_dir, existing_keys=None, max_workers=None, shard_dir=SHARD_DIR):
     files = [os.path.join(data_dir, f) for f in sorted(os.listdir(data_dir)) if f.endswith(".parquet")]
-    all_rows = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_file, fpath, existing_keys) for fpath in files]
+    os.makedirs(shard_dir, exist_ok=True)
+    vocab = prime_vocab(files)
+
+    shards = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_file_to_shard, fpath, shard_dir, existing_keys, vocab.path) for fpath in files]
         for future in as_completed(futures):
-            all_rows.extend(future.result())
-    return all_rows
-
-def load_existing_keys(index_path):
-    if not os.path.exists(index_path):
-        return set()
-    df = pd.read_parquet(index_path, columns=["game_pk", "at_bat_number"])
-    return set(zip(df["game_pk"], df["at_bat_number"]))
+            shards.append(future.result())
+    return sorted(shards, key=lambda shard: shard["source"])
+
+def bootstrap_manifest(data_dir, manifest):
+    # Indexes built before the manifest existed: treat every monthly file
+    # that ends on or before the newest indexed game as already indexed
+    index_dates = [
+        pd.read_parquet(path, columns=["game_date"])["game_date"].max()
+        for path in season_paths().values()
+    ]
+    if not index_dates:
+        return manifest
+    last_indexed = pd.to_datetime(max(index_dates))
+    for fname in sorted(f for f in os.listdir(data_dir) if f.endswith(".parquet")):
+        fpath = os.path.join(data_dir, fname)
+        raw = pd.read_parquet(fpath, columns=["game_date", "game_pk", "at_bat_number"])
+        if pd.to_datetime(raw["game_date"]).max() > last_indexed:
+            continue
+        atbats = raw.drop_duplicates(subset=ATBAT_KEY)
+        record_file(manifest, fpath, summarize_output(atbats, raw))
+    save_manifest(manifest)
+    return manifest
+
+def append_changed_files(data_dir, manifest=None):
+    # Reprocess only the monthly files the manifest says are new or changed.
+    # Each file is read once (just the indexed columns) and handed to
+    # process_file in memory.
+    if manifest is None:
+        manifest = load_manifest()
+    with span("append", data_dir=data_dir) as s:
+        to_process = changed_files(manifest, data_dir)
+        num_files = sum(1 for f in os.listdir(data_dir) if f.endswith(".parquet"))
+        s.count("files_skipped", num_files - len(to_process))
+        if not to_process:
+            return manifest, {}
+
+        processed = []
+        for fpath in to_process:
+            s.count("bytes_read", bytes_to_read(fpath))
+            atbats, pitches = process_file(read_statcast(fpath))
+            processed.append((fpath, atbats, pitches))
+        s.count("files_processed", len(processed))
+
+        # Codes must be on disk before any season file references them
+        get_vocab().save()
+
+        appended = {}
+        seasons = sorted({year for _, atbats, _ in processed for year in pd.to_datetime(atbats["game_date"]).dt.year.unique()})
+        for year in seasons:
+            season_atbats, season_pitches = [], []
+            for _, atbats, pitches in processed:
+                season_atbats.append(atbats[pd.to_datetime(atbats["game_date"]).dt.year == year])
+                season_pitches.append(pitches[pd.to_datetime(pitches["game_date"]).dt.year == year])
+            num_atbats = append_to_season(year, pd.concat(season_atbats, ignore_index=True), pd.concat(season_pitches, ignore_index=True))
+            if num_atbats:
+                appended[int(year)] = num_atbats
+
+        for fpath, atbats, pitches in processed:
+            record_file(manifest, fpath, summarize_output(atbats, pitches))
+        save_manifest(manifest)
+        return manifest, appended
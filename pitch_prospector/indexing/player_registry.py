@@ -0,0 +1,107 @@
+# player_registry.py
+
+# Local MLBAM id -> display name registry. The table is filled from
+# pybaseball's Chadwick register at build/refresh time for every pitcher and
+# batter id in the season indexes, so a search only has to map ids against a
+# sorted in-memory array: no network, and no per-query lookup DataFrame.
+
+import os
+from functools import lru_cache
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from indexing.season_files import season_paths
+from indexing.season_segments import season_segments
+
+REGISTRY_PATH = "pitch_prospector/data/player_registry.parquet"
+
+REGISTRY_SCHEMA = pa.schema([
+    ("player_id", pa.int64()),
+    ("full_name", pa.string()),
+])
+
+
+class PlayerRegistry:
+    def __init__(self, table):
+        table = table.sort_by("player_id")
+        self.ids = table.column("player_id").to_numpy()
+        self.names = np.asarray(table.column("full_name").to_pylist(), dtype=object)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, player_id):
+        i = np.searchsorted(self.ids, player_id)
+        return i < len(self.ids) and self.ids[i] == player_id
+
+    def names_for(self, player_ids):
+        # Vectorized id -> name; ids the registry doesn't know fall back to the id itself
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        if not len(self.ids):
+            return player_ids.astype(str).astype(object)
+        idx = np.minimum(np.searchsorted(self.ids, player_ids), len(self.ids) - 1)
+        found = self.ids[idx] == player_ids
+        return np.where(found, self.names[idx], player_ids.astype(str).astype(object))
+
+
+@lru_cache(maxsize=4)
+def _load_registry(path, mtime):
+    # Keyed on mtime so a prewarm that rewrites the file is picked up
+    if mtime is None:
+        return PlayerRegistry(REGISTRY_SCHEMA.empty_table())
+    return PlayerRegistry(pq.read_table(path, schema=REGISTRY_SCHEMA))
+
+
+def load_registry(path=REGISTRY_PATH):
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return _load_registry(path, mtime)
+
+
+def indexed_player_ids(paths=None):
+    if paths is None:
+        paths = [segment.path for p in season_paths().values() for segment in season_segments(p)]
+    ids = [
+        np.unique(pq.read_table(p, columns=[col]).column(0).to_numpy())
+        for p in paths for col in ("pitcher", "batter")
+    ]
+    return np.unique(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+
+def lookup_player_names(player_ids):
+    # The only network-dependent step; pybaseball is imported here so plain
+    # registry reads never load it
+    from pybaseball import playerid_reverse_lookup
+    found = playerid_reverse_lookup([int(i) for i in player_ids], key_type="mlbam")
+    full_names = (found["name_first"].fillna("") + " " + found["name_last"].fillna("")).str.strip()
+    return pa.table({
+        "player_id": pa.array(found["key_mlbam"].astype("int64"), type=pa.int64()),
+        "full_name": pa.array(full_names.tolist(), type=pa.string()),
+    })
+
+
+def prewarm_player_registry(player_ids=None, path=REGISTRY_PATH):
+    # Adds names for any indexed id the registry doesn't have yet; returns
+    # how many were added. Failing to reach the register keeps what's there.
+    player_ids = indexed_player_ids() if player_ids is None else np.asarray(player_ids, dtype=np.int64)
+    registry = load_registry(path)
+    missing = player_ids[~np.isin(player_ids, registry.ids)]
+    if not len(missing):
+        return 0
+
+    try:
+        found = lookup_player_names(missing)
+    except Exception as e:
+        print(f"⚠️ Could not resolve {len(missing):,} player names: {e}")
+        return 0
+
+    existing = pq.read_table(path, schema=REGISTRY_SCHEMA) if os.path.exists(path) else REGISTRY_SCHEMA.empty_table()
+    table = pa.concat_tables([existing, found.cast(REGISTRY_SCHEMA)])
+    table = pa.Table.from_pandas(
+        table.to_pandas().drop_duplicates(subset="player_id", keep="last"),
+        schema=REGISTRY_SCHEMA,
+        preserve_index=False,
+    ).sort_by("player_id")
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return found.num_rows
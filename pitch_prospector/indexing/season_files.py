@@ -0,0 +1,142 @@
+# season_files.py
+
+# Paths and low-level readers shared by the per-season index and its sidecars.
+# Every sidecar lives next to its season file and is named by swapping the
+# "_index_" part of the file name for its own kind, e.g.
+# atbat_pitch_sequence_lookup_2024.parquet.
+#
+# Each sidecar is stamped with the stamp (arrow_cache.py) of the season file
+# it was built from, and only read under that stamp. A reader takes the
+# stamp of the table it will pull rows from and hands it to every sidecar it
+# reads; if the season was replaced in between it gets SeasonChanged and
+# starts over (read_consistent), so row ids are never paired with another
+# version's rows.
+
+import os
+from datetime import date, datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from indexing.arrow_cache import open_stamped, source_stamp
+
+SEASON_INDEX_PATTERN = "pitch_prospector/data/atbat_pitch_sequence_index_{year}.parquet"
+PITCH_INDEX_PATTERN = "pitch_prospector/data/pitch_level_index_{year}.parquet"
+FIRST_SEASON = 2015
+
+# Small row groups keep the bytes read per search proportional to the hits
+SEASON_ROW_GROUP_SIZE = 4096
+PITCH_ROW_GROUP_SIZE = 16384
+
+SEASON_STAMP_KEY = b"pitch_prospector.season_stamp"
+
+# Times a reader starts over when a season changes under it
+READ_ATTEMPTS = 3
+
+
+class SeasonChanged(Exception):
+    # A season file was replaced while a reader was pairing it with its sidecars
+    pass
+
+
+def sidecar_path_for(season_path, kind):
+    return season_path.replace("_index_", f"_{kind}_")
+
+
+def pitch_path_for(season_path):
+    return season_path.replace("atbat_pitch_sequence_index_", "pitch_level_index_")
+
+
+def staging_path_for(path):
+    # Same name with a pid tag before the extension. Every path helper maps a
+    # staged season file onto staged sidecars, so a whole season can be
+    # written under staging names and then renamed into place.
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}.staging{ext}"
+
+
+def read_season_file(season_path, **kwargs):
+    # (table, stamp) of a season file, for building its sidecars
+    source, stamp = open_stamped(season_path)
+    return pq.read_table(source, **kwargs), stamp
+
+
+def write_sidecar(table, path, stamp, **kwargs):
+    # Readers rebuild stale sidecars lazily and without the index lock, so
+    # each one is written under a pid-tagged temp name and renamed into
+    # place; nobody ever opens a half-written file
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SEASON_STAMP_KEY: stamp})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, **kwargs)
+    os.replace(tmp_path, path)
+    return path
+
+
+def sidecar_stamp(sidecar_path):
+    # Stamp of the season file the sidecar was built from; None if there's
+    # no sidecar or it predates stamping
+    if not os.path.exists(sidecar_path):
+        return None
+    if sidecar_path.endswith(".npz"):
+        with np.load(sidecar_path) as index:
+            return index["season_stamp"].item().encode() if "season_stamp" in index else None
+    return (pq.read_schema(sidecar_path).metadata or {}).get(SEASON_STAMP_KEY)
+
+
+def is_sidecar_stale(season_path, sidecar_path, stamp=None):
+    # Stale unless built from the season file as it is now. A reader holding
+    # the stamp of a season that has since been replaced starts over rather
+    # than rebuilding for it.
+    current = source_stamp(season_path)
+    if stamp is not None and stamp != current:
+        raise SeasonChanged(season_path)
+    return sidecar_stamp(sidecar_path) != current
+
+
+def check_stamp(path, found, stamp):
+    if found != stamp:
+        raise SeasonChanged(path)
+
+
+def read_sidecar(sidecar_path, stamp, **kwargs):
+    # The sidecar's rows (pq.read_table arguments), provided it was built from
+    # the season file stamped `stamp`; the stamp and rows come from one open
+    source = pa.memory_map(sidecar_path, "r")
+    check_stamp(sidecar_path, (pq.ParquetFile(source).schema_arrow.metadata or {}).get(SEASON_STAMP_KEY), stamp)
+    return pq.read_table(source, **kwargs)
+
+
+def read_consistent(read, *args, **kwargs):
+    # Runs a reader that pairs a season with its sidecars, again if the
+    # season changed under it
+    for attempt in range(READ_ATTEMPTS):
+        try:
+            return read(*args, **kwargs)
+        except SeasonChanged:
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+
+
+def as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+def season_paths(start_year=FIRST_SEASON, end_year=None):
+    end_year = end_year or datetime.now().year
+    paths = {}
+    for year in range(start_year, end_year + 1):
+        season_path = SEASON_INDEX_PATTERN.format(year=year)
+        if os.path.exists(season_path):
+            paths[year] = season_path
+    return paths
+
+
+def read_rows(table, row_ids, columns=None):
+    # row_ids are positions in the season file; they're taken straight from
+    # its memory-mapped Arrow copy (stamped_table), so nothing is decoded
+    if columns is not None:
+        table = table.select(columns)
+    return table.take(pa.array(np.asarray(row_ids, dtype=np.int64)))
@@ -0,0 +1,183 @@
+# season_segments.py
+
+# A season is stored log-structured: an immutable base (the season file a
+# full build writes) plus delta segments that appends add next to it. Each
+# delta is laid out exactly like a season, with its own pitch table and
+# sidecars, under the base's name with a delta id before the extension
+# (atbat_pitch_sequence_index_2024.d0003.parquet), so an append only ever
+# writes the new at-bats.
+#
+# Readers merge newest-wins on (game_pk, at_bat_number): every segment
+# carries the ids of the at-bats that newer segments replace (its shadow),
+# and rows in the shadow are skipped. Aggregate sidecars can't skip rows, so
+# each delta that replaces at-bats also gets a retraction segment holding
+# the versions it replaced; aggregates are base + deltas - retractions.
+#
+# The segment list is a small JSON file per season, swapped atomically.
+# Files a compaction retires are only deleted on the next swap after that,
+# so a reader still walking the old list never finds them gone.
+
+import os
+import glob
+import json
+from collections import namedtuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from indexing.season_files import sidecar_path_for
+from indexing.arrow_cache import CACHE_DIR, cached_table
+
+SEGMENTS_VERSION = 1
+
+# Deltas are folded into the base once they hold this share of its at-bats,
+# or once there are this many of them
+COMPACT_DELTA_RATIO = 0.25
+COMPACT_MAX_DELTAS = 16
+
+# game_pk * ATBAT_ID_STRIDE + at_bat_number; no game has 4096 plate appearances
+ATBAT_ID_STRIDE = 4096
+
+# path: the segment's season file; shadow: sorted ids of its at-bats that
+# newer segments replace; retraction: season file of the rows this delta
+# replaced (None for the base and for deltas that replaced nothing)
+Segment = namedtuple("Segment", ["path", "shadow", "retraction"])
+
+_views = {}
+
+
+def segments_path_for(season_path):
+    return sidecar_path_for(season_path, "segments").replace(".parquet", ".json")
+
+
+def delta_path_for(season_path, delta_id):
+    root, ext = os.path.splitext(season_path)
+    return f"{root}.{delta_id}{ext}"
+
+
+def retraction_path_for(delta_path):
+    root, ext = os.path.splitext(delta_path)
+    return f"{root}.retract{ext}"
+
+
+def load_segments(season_path):
+    segments_path = segments_path_for(season_path)
+    if not os.path.exists(segments_path):
+        return {"version": SEGMENTS_VERSION, "next_delta": 1, "deltas": [], "retired": []}
+    with open(segments_path) as f:
+        return json.load(f)
+
+
+def _remove_delta_files(season_path, delta_ids):
+    # Every file of a delta (pitch table, sidecars, retraction, Arrow
+    # copies) has "_<year>.<delta id>." in its name
+    data_dir = os.path.dirname(season_path)
+    year = os.path.splitext(os.path.basename(season_path))[0].rsplit("_", 1)[1]
+    for delta_id in delta_ids:
+        for directory in (data_dir, CACHE_DIR):
+            for fpath in glob.glob(os.path.join(directory, f"*_{year}.{delta_id}.*")):
+                os.remove(fpath)
+
+
+def save_segments(season_path, segments):
+    # Publishes the new list, then deletes whatever the previous list retired
+    previous = load_segments(season_path)
+    segments_path = segments_path_for(season_path)
+    tmp_path = segments_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(segments, f, indent=2)
+    os.replace(tmp_path, segments_path)
+    _remove_delta_files(season_path, [d for d in previous.get("retired", []) if d not in segments["retired"]])
+
+
+def next_delta_id(season_path):
+    # Ids are never reused, so a retired delta's files can't be mistaken
+    # for a live one's
+    return f"d{load_segments(season_path)['next_delta']:04d}"
+
+
+def add_delta(season_path, delta_id, num_atbats, num_retracted):
+    segments = load_segments(season_path)
+    segments["deltas"].append({"id": delta_id, "atbats": num_atbats, "retracted": num_retracted})
+    segments["next_delta"] = int(delta_id[1:]) + 1
+    segments["retired"] = []
+    save_segments(season_path, segments)
+
+
+def retire_deltas(season_path):
+    # After a compaction or full build: the base holds everything again
+    segments = load_segments(season_path)
+    retired = [d["id"] for d in segments["deltas"]]
+    if not retired and not segments.get("retired"):
+        return
+    save_segments(season_path, {**segments, "deltas": [], "retired": retired})
+
+
+def needs_compaction(season_path):
+    deltas = load_segments(season_path)["deltas"]
+    if not deltas:
+        return False
+    if len(deltas) >= COMPACT_MAX_DELTAS:
+        return True
+    base_atbats = pq.ParquetFile(season_path).metadata.num_rows
+    return sum(d["atbats"] for d in deltas) >= COMPACT_DELTA_RATIO * base_atbats
+
+
+def atbat_ids(game_pks, at_bat_numbers):
+    return np.asarray(game_pks, dtype=np.int64) * ATBAT_ID_STRIDE + np.asarray(at_bat_numbers, dtype=np.int64)
+
+
+def table_ids(table):
+    return atbat_ids(
+        table.column("game_pk").to_numpy(zero_copy_only=False),
+        table.column("at_bat_number").to_numpy(zero_copy_only=False),
+    )
+
+
+def season_segments(season_path):
+    # Base first, then deltas oldest to newest, each with its shadow
+    segments_path = segments_path_for(season_path)
+    version = os.stat(segments_path).st_mtime_ns if os.path.exists(segments_path) else None
+    hit = _views.get(season_path)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+
+    deltas = load_segments(season_path)["deltas"] if version is not None else []
+    paths = [season_path] + [delta_path_for(season_path, d["id"]) for d in deltas]
+    retractions = [None] + [
+        retraction_path_for(path) if d["retracted"] else None for path, d in zip(paths[1:], deltas)
+    ]
+    delta_ids = [np.unique(table_ids(pq.read_table(p, columns=["game_pk", "at_bat_number"]))) for p in paths[1:]]
+
+    view = []
+    newer = np.empty(0, dtype=np.int64)
+    for i in range(len(paths) - 1, -1, -1):
+        view.append(Segment(paths[i], newer, retractions[i]))
+        if i > 0:
+            newer = np.union1d(newer, delta_ids[i - 1])
+    view.reverse()
+    _views[season_path] = (version, view)
+    return view
+
+
+def visible_row_ids(segment, row_ids, table=None):
+    # The row ids (positions in the segment's season file) not replaced by a newer segment
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    if not len(segment.shadow) or not len(row_ids):
+        return row_ids
+    if table is None:
+        table = cached_table(segment.path)
+    keys = table.select(["game_pk", "at_bat_number"]).take(pa.array(row_ids))
+    return row_ids[~np.isin(table_ids(keys), segment.shadow)]
+
+
+def visible(table, segment):
+    # Rows of an at-bat or pitch table read from `segment` that are still current
+    if not len(segment.shadow) or table.num_rows == 0:
+        return table
+    return table.filter(pa.array(~np.isin(table_ids(table), segment.shadow)))
+
+
+def visible_atbats(season_path):
+    # At-bats a reader sees for the season, replaced versions counted once
+    segments = load_segments(season_path)
+    return pq.ParquetFile(season_path).metadata.num_rows + sum(d["atbats"] - d["retracted"] for d in segments["deltas"])
@@ -0,0 +1,174 @@
+# sequence_codec.py
+
+# Dictionary encoding for pitch sequences. Every (pitch_type, description)
+# token gets a small integer code from a vocabulary persisted as JSON, and an
+# at-bat's sequence is stored as the big-endian uint16 codes packed into a
+# binary key. Keys compare with a plain byte comparison, do not depend on
+# Python's repr of None, and sort so that a sequence's prefixes sort right
+# before it.
+
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+VOCAB_PATH = "pitch_prospector/data/pitch_token_vocab.json"
+
+# Code 0 is never assigned so an all-zero buffer can't pass for a real key
+CODE_DTYPE = np.dtype(">u2")
+
+# What a code this vocabulary doesn't know decodes to
+UNKNOWN_TOKEN = ("?", "?")
+
+
+def _file_stamp(path):
+    # The vocabulary only grows, so size catches saves within one mtime tick
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SequenceVocab:
+    def __init__(self, tokens=None, path=VOCAB_PATH, frozen=False):
+        self.path = path
+        # A frozen vocabulary refuses new tokens, so worker processes can't
+        # hand out codes that disagree with each other
+        self.frozen = frozen
+        self.tokens = [tuple(t) for t in (tokens or [])]
+        self.codes = {token: i + 1 for i, token in enumerate(self.tokens)}
+        # stamp of the file as last loaded or saved; dirty once codes have
+        # been handed out that aren't on disk yet
+        self.stamp = None
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=VOCAB_PATH, frozen=False):
+        if not os.path.exists(path):
+            return cls(path=path, frozen=frozen)
+        stamp = _file_stamp(path)
+        with open(path) as f:
+            vocab = cls(json.load(f)["tokens"], path=path, frozen=frozen)
+        vocab.stamp = stamp
+        return vocab
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"tokens": [list(t) for t in self.tokens]}, f)
+        os.replace(tmp_path, self.path)
+        self.stamp = _file_stamp(self.path)
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def code_for(self, pitch_type, description, add=True):
+        token = (pitch_type, description)
+        code = self.codes.get(token)
+        if code is None and add:
+            with self._lock:
+                code = self.codes.get(token)
+                if code is None:
+                    if self.frozen:
+                        raise KeyError(f"Token {token} is not in the frozen vocabulary")
+                    if len(self.tokens) >= np.iinfo(CODE_DTYPE).max:
+                        raise ValueError("Pitch token vocabulary is full")
+                    self.tokens.append(token)
+                    code = len(self.tokens)
+                    self.codes[token] = code
+                    self.dirty = True
+        return code
+
+    def token_for(self, code):
+        # Codes from a newer vocabulary than this one decode as UNKNOWN_TOKEN
+        if 1 <= code <= len(self.tokens):
+            return self.tokens[code - 1]
+        return UNKNOWN_TOKEN
+
+    def encode(self, sequence, add=True):
+        codes = [self.code_for(p, d, add=add) for p, d in sequence]
+        if any(code is None for code in codes):
+            # A token the index has never seen can't match anything
+            return None
+        return np.asarray(codes, dtype=CODE_DTYPE).tobytes()
+
+    def encode_columns(self, pitch_types, descriptions):
+        # Vectorized code lookup: only the distinct (pitch_type, description)
+        # pairs go through Python, every pitch is then mapped with one gather.
+        # Pairs are visited in order of first appearance, so new codes are
+        # handed out in the same order a pitch-by-pitch encode would use.
+        pt_labels, pt_uniques = pd.factorize(pitch_types, use_na_sentinel=False)
+        desc_labels, desc_uniques = pd.factorize(descriptions, use_na_sentinel=False)
+        pair_labels = pt_labels.astype(np.int64) * max(len(desc_uniques), 1) + desc_labels
+        inverse, pairs = pd.factorize(pair_labels)
+
+        pair_codes = np.empty(len(pairs), dtype=np.uint16)
+        for i, pair in enumerate(pairs):
+            pt, desc = divmod(int(pair), max(len(desc_uniques), 1))
+            pair_codes[i] = self.code_for(_none_if_na(pt_uniques[pt]), _none_if_na(desc_uniques[desc]))
+        return pair_codes[inverse]
+
+    def decode(self, key):
+        return tuple(self.token_for(int(c)) for c in np.frombuffer(key, dtype=CODE_DTYPE))
+
+    def codes_matching(self, pitch_types=None, descriptions=None):
+        return [
+            code for code, (p, d) in enumerate(self.tokens, start=1)
+            if (pitch_types is None or p in pitch_types) and (descriptions is None or d in descriptions)
+        ]
+
+
+def _none_if_na(value):
+    return None if pd.isna(value) else value
+
+
+_shared_vocab = None
+_shared_lock = threading.Lock()
+
+
+def get_vocab(path=VOCAB_PATH):
+    # One instance per process so concurrent process_file calls agree on
+    # codes. Reloaded once another process saves a newer file, unless this
+    # one holds codes it hasn't saved yet.
+    global _shared_vocab
+    with _shared_lock:
+        if (
+            _shared_vocab is None
+            or _shared_vocab.path != path
+            or (not _shared_vocab.dirty and _shared_vocab.stamp != _file_stamp(path))
+        ):
+            _shared_vocab = SequenceVocab.load(path)
+        return _shared_vocab
+
+
+def reload_vocab(path=VOCAB_PATH):
+    # Writers call this right after taking the index lock, so new codes are
+    # handed out after the last ones any process saved. Codes this process
+    # gave out but never saved are dropped; nothing on disk refers to them.
+    global _shared_vocab
+    with _shared_lock:
+        _shared_vocab = SequenceVocab.load(path)
+        return _shared_vocab
+
+
+def unpack_keys(keys):
+    # Flatten a pyarrow BinaryArray of keys into (codes, lengths) without a Python loop
+    _, offsets_buf, data_buf = keys.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int32)[keys.offset:keys.offset + len(keys) + 1]
+    data = np.frombuffer(data_buf, dtype=np.uint8) if data_buf is not None else np.empty(0, np.uint8)
+    codes = data[offsets[0]:offsets[-1]].view(CODE_DTYPE).astype(np.uint16)
+    lengths = np.diff(offsets) // CODE_DTYPE.itemsize
+    return codes, lengths
+
+
+def pack_keys(codes, lengths):
+    # Inverse of unpack_keys: one BinaryArray whose i-th value is the next
+    # lengths[i] codes, built straight from buffers
+    data = np.ascontiguousarray(codes, dtype=CODE_DTYPE).tobytes()
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+    np.cumsum(np.asarray(lengths) * CODE_DTYPE.itemsize, out=offsets[1:])
+    return pa.BinaryArray.from_buffers(pa.binary(), len(lengths), [None, pa.py_buffer(offsets), pa.py_buffer(data)])
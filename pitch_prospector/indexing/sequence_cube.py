@@ -0,0 +1,167 @@
+# sequence_cube.py
+
+# Per-season aggregate sidecar answering "how often does this sequence
+# happen, and how does it end?" without touching at-bat rows. For every
+# pitch_sequence_key it holds at-bat counts broken down by the at-bat's
+# terminal event, once for the whole season and once per pitcher, batter,
+# pitching team and batting team, as grouping sets named by their split
+# column; a dimension's own value may be null, so the null columns can't tell
+# the sets apart. Season-level rows also carry the sequence's frequency rank
+# within the season. The sidecar is sorted by key, so a lookup only reads the
+# row groups whose statistics can hold it.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from indexing.season_files import (
+    FIRST_SEASON, sidecar_path_for, is_sidecar_stale, pitch_path_for, read_season_file, season_paths, write_sidecar,
+)
+from indexing.season_segments import season_segments, visible_atbats
+
+CUBE_ROW_GROUP_SIZE = 16384
+
+CUBE_DIMENSIONS = ["pitcher", "batter", "pitch_team", "bat_team"]
+
+# Grouping set of the season-wide counts
+OVERALL_SPLIT = "all"
+
+CUBE_SCHEMA = pa.schema([
+    ("pitch_sequence_key", pa.binary()),
+    ("split", pa.string()),
+    ("pitcher", pa.int64()),
+    ("batter", pa.int64()),
+    ("pitch_team", pa.string()),
+    ("bat_team", pa.string()),
+    ("events", pa.string()),
+    ("num_atbats", pa.int64()),
+    ("season_rank", pa.int32()),
+])
+
+
+def cube_path_for(season_path):
+    return sidecar_path_for(season_path, "cube")
+
+
+def terminal_pitches(pitch_path):
+    # Last pitch of every at-bat: its events column is how the at-bat ended,
+    # and the half-inning says which team was pitching
+    pitches = pq.read_table(
+        pitch_path,
+        columns=["game_pk", "at_bat_number", "pitch_number", "events", "home_team", "away_team", "inning_topbot"],
+    ).sort_by([("game_pk", "ascending"), ("at_bat_number", "ascending"), ("pitch_number", "ascending")])
+    game_pks = pitches.column("game_pk").to_numpy()
+    ab_nums = pitches.column("at_bat_number").to_numpy()
+    is_last = np.ones(len(game_pks), dtype=bool)
+    is_last[:-1] = (game_pks[1:] != game_pks[:-1]) | (ab_nums[1:] != ab_nums[:-1])
+    last = pitches.filter(pa.array(is_last))
+
+    top = pc.equal(last.column("inning_topbot"), "Top")
+    return pa.table({
+        "game_pk": last.column("game_pk"),
+        "at_bat_number": last.column("at_bat_number"),
+        "events": last.column("events"),
+        "pitch_team": pc.if_else(top, last.column("home_team"), last.column("away_team")),
+        "bat_team": pc.if_else(top, last.column("away_team"), last.column("home_team")),
+    })
+
+
+def build_sequence_cube(season_path, cube_path=None):
+    cube_path = cube_path or cube_path_for(season_path)
+    atbats, stamp = read_season_file(season_path, columns=["game_pk", "at_bat_number", "pitcher", "batter", "pitch_sequence_key"])
+    atbats = atbats.join(terminal_pitches(pitch_path_for(season_path)), keys=["game_pk", "at_bat_number"], join_type="left outer")
+
+    totals = atbats.group_by(["pitch_sequence_key"], use_threads=False).aggregate([("game_pk", "count")])
+    ranks = pc.rank(totals.column("game_pk_count"), sort_keys="descending", tiebreaker="min")
+    ranks = pa.table({"pitch_sequence_key": totals.column("pitch_sequence_key"), "season_rank": pc.cast(ranks, pa.int32())})
+
+    pieces = []
+    for dimension in [None] + CUBE_DIMENSIONS:
+        keys = ["pitch_sequence_key"] + ([dimension] if dimension else []) + ["events"]
+        counts = atbats.group_by(keys, use_threads=False).aggregate([("game_pk", "count")])
+        counts = counts.rename_columns(keys + ["num_atbats"])
+        counts = counts.append_column("split", pa.array([dimension or OVERALL_SPLIT] * counts.num_rows, pa.string()))
+        if dimension is None:
+            counts = counts.join(ranks, keys="pitch_sequence_key")
+        for name in CUBE_SCHEMA.names:
+            if name not in counts.column_names:
+                counts = counts.append_column(name, pa.nulls(counts.num_rows, CUBE_SCHEMA.field(name).type))
+        pieces.append(counts.select(CUBE_SCHEMA.names).cast(CUBE_SCHEMA))
+
+    cube = pa.concat_tables(pieces).sort_by([("pitch_sequence_key", "ascending"), ("num_atbats", "descending")])
+    write_sidecar(cube, cube_path, stamp, row_group_size=CUBE_ROW_GROUP_SIZE)
+    return cube_path
+
+
+def ensure_sequence_cube(season_path, stamp=None):
+    cube_path = cube_path_for(season_path)
+    if is_sidecar_stale(season_path, cube_path, stamp):
+        build_sequence_cube(season_path, cube_path)
+    return cube_path
+
+
+def _dimension_filter(dimension):
+    # Rows of one grouping set, with the requested dimension set to its value
+    unknown = set(dimension) - set(CUBE_DIMENSIONS)
+    if unknown or len(dimension) > 1:
+        raise ValueError(f"Pass at most one of {CUBE_DIMENSIONS}, got {sorted(dimension)}")
+    if not dimension:
+        return pc.field("split") == OVERALL_SPLIT
+    (name, value), = dimension.items()
+    return (pc.field("split") == name) & (pc.field(name) == value)
+
+
+def _read_cube(sequence_key, start_year, end_year, expr):
+    # A season's counts are its base plus each delta minus each delta's
+    # retraction (season_segments.py). Ranks come from the base's cube, so
+    # they only account for deltas once those are compacted into it.
+    key_expr = pc.field("pitch_sequence_key") == pa.scalar(sequence_key, type=pa.binary())
+    group_columns = [name for name in CUBE_SCHEMA.names if name not in ("num_atbats", "season_rank")]
+    pieces = []
+    for year, season_path in season_paths(start_year, end_year).items():
+        segments = season_segments(season_path)
+        parts = []
+        for i, segment in enumerate(segments):
+            rows = pq.read_table(ensure_sequence_cube(segment.path), filters=key_expr & expr).to_pandas()
+            if i > 0:
+                rows["season_rank"] = None
+            parts.append(rows)
+            if segment.retraction is not None:
+                retracted = pq.read_table(ensure_sequence_cube(segment.retraction), filters=key_expr & expr).to_pandas()
+                retracted["num_atbats"] = -retracted["num_atbats"]
+                retracted["season_rank"] = None
+                parts.append(retracted)
+        rows = pd.concat(parts, ignore_index=True)
+        if len(segments) > 1:
+            rows = rows.groupby(group_columns, dropna=False, as_index=False, sort=False).agg(
+                num_atbats=("num_atbats", "sum"), season_rank=("season_rank", "max"),
+            )
+            rows = rows[rows["num_atbats"] > 0].reset_index(drop=True)
+        rows.insert(0, "season", year)
+        rows["season_atbats"] = visible_atbats(season_path)
+        pieces.append(rows)
+    if not pieces:
+        return pd.DataFrame(columns=["season", "season_atbats"] + CUBE_SCHEMA.names)
+    return pd.concat(pieces, ignore_index=True)
+
+
+def sequence_outcomes(sequence_key, start_year=FIRST_SEASON, end_year=None, **dimension):
+    # At-bat counts per season and terminal event, optionally for a single
+    # pitcher / batter / pitch_team / bat_team, e.g. pitcher=543037
+    rows = _read_cube(sequence_key, start_year, end_year, _dimension_filter(dimension))
+    rows = rows[["season", "events", "num_atbats"]]
+    return rows.sort_values(["season", "num_atbats"], ascending=[True, False], ignore_index=True)
+
+
+def sequence_frequency(sequence_key, start_year=FIRST_SEASON, end_year=None):
+    # Per season: how many at-bats followed the sequence, their share of all
+    # at-bats that season, and the sequence's rank among all sequences
+    rows = _read_cube(sequence_key, start_year, end_year, _dimension_filter({}))
+    freq = rows.groupby("season", as_index=False).agg(
+        num_atbats=("num_atbats", "sum"),
+        season_atbats=("season_atbats", "first"),
+        season_rank=("season_rank", "first"),
+    )
+    freq["share"] = freq["num_atbats"] / freq["season_atbats"]
+    return freq[["season", "num_atbats", "share", "season_rank"]]
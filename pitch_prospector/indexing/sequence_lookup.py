@@ -0,0 +1,70 @@
+# sequence_lookup.py
+
+# Sidecar lookup for the per-season at-bat index: maps each pitch_sequence_key
+# to the (row_group, row_offset) it lives at in the season file. The sidecar is
+# sorted by key, so a parquet filter on the key only touches the row groups
+# whose min/max statistics can contain it. Lookups take the stamp of the
+# season table their row ids will be used on (season_files.py).
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from indexing.arrow_cache import open_stamped, source_stamp
+from indexing.season_files import check_stamp, sidecar_path_for, is_sidecar_stale, read_sidecar, write_sidecar
+
+LOOKUP_ROW_GROUP_SIZE = 16384
+
+
+def lookup_path_for(season_path):
+    return sidecar_path_for(season_path, "lookup")
+
+
+def build_sequence_lookup(season_path, lookup_path=None):
+    lookup_path = lookup_path or lookup_path_for(season_path)
+    source, stamp = open_stamped(season_path)
+    pf = pq.ParquetFile(source)
+
+    keys, row_groups, row_offsets = [], [], []
+    for rg in range(pf.num_row_groups):
+        col = pf.read_row_group(rg, columns=["pitch_sequence_key"]).column(0)
+        keys.append(col)
+        row_groups.append(pa.array([rg] * len(col), type=pa.int32()))
+        row_offsets.append(pa.array(range(len(col)), type=pa.int32()))
+
+    table = pa.table({
+        "pitch_sequence_key": pa.chunked_array(keys, type=pa.binary()),
+        "row_group": pa.chunked_array(row_groups, type=pa.int32()),
+        "row_offset": pa.chunked_array(row_offsets, type=pa.int32()),
+    })
+    table = table.sort_by([("pitch_sequence_key", "ascending"), ("row_group", "ascending"), ("row_offset", "ascending")])
+    write_sidecar(table, lookup_path, stamp, row_group_size=LOOKUP_ROW_GROUP_SIZE)
+    return lookup_path
+
+
+def ensure_sequence_lookup(season_path, stamp=None):
+    lookup_path = lookup_path_for(season_path)
+    if is_sidecar_stale(season_path, lookup_path, stamp):
+        # Season files written before the sidecar existed get one built on first use
+        build_sequence_lookup(season_path, lookup_path)
+    return lookup_path
+
+
+def find_sequence_rows(season_path, sequence_key, stamp=None):
+    stamp = stamp or source_stamp(season_path)
+    hits = read_sidecar(
+        ensure_sequence_lookup(season_path, stamp), stamp,
+        columns=["row_group", "row_offset"],
+        filters=[("pitch_sequence_key", "==", sequence_key)],
+    )
+    return hits.column("row_group").to_numpy(), hits.column("row_offset").to_numpy()
+
+
+def find_sequence_row_ids(season_path, sequence_key, stamp=None):
+    # Matches as sorted positions in the season file rather than (row_group, row_offset)
+    stamp = stamp or source_stamp(season_path)
+    row_groups, row_offsets = find_sequence_rows(season_path, sequence_key, stamp)
+    source, found = open_stamped(season_path)
+    check_stamp(season_path, found, stamp)
+    metadata = pq.ParquetFile(source).metadata
+    starts = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+    return np.sort(starts[row_groups] + row_offsets)
@@ -0,0 +1,218 @@
+# similarity_index.py
+
+# Nearest-neighbour "similar at-bat" search over pitch physics. Every pitch
+# is described by FEATURE_COLUMNS, standardized with the season's mean and
+# standard deviation, and an at-bat of length L is the L pitches' features
+# laid end to end. Per season and per length the vectors get an IVF index: a
+# small k-means codebook, with the at-bats stored sorted by their nearest
+# centroid. A query only compares against the cells of its nprobe closest
+# centroids, so it never walks the whole season.
+#
+# The sidecar is a .npz next to the season file; row ids are positions in the
+# season file, the same as the pattern postings use, and it carries the
+# season file's stamp like every other sidecar (season_files.py). A season's delta
+# segments each have their own; their distances are measured in the base's
+# standardized space so hits from every segment rank together.
+
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from indexing.arrow_cache import stamped_table
+from indexing.season_files import (
+    FIRST_SEASON, SeasonChanged, sidecar_path_for, is_sidecar_stale, pitch_path_for, read_consistent, read_season_file,
+    read_rows, season_paths,
+)
+from indexing.season_segments import season_segments, visible_row_ids
+
+FEATURE_COLUMNS = ["release_speed", "plate_x", "plate_z", "release_spin_rate", "release_extension", "zone"]
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000
+DEFAULT_NPROBE = 8
+NEAREST_CHUNK = 65536
+
+
+def similarity_path_for(season_path):
+    return sidecar_path_for(season_path, "similar").replace(".parquet", ".npz")
+
+
+def _nearest(vectors, centroids):
+    # Index of the closest centroid for every row, in chunks so the distance
+    # matrix never holds more than NEAREST_CHUNK rows at once
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    nearest = np.empty(len(vectors), dtype=np.int32)
+    for lo in range(0, len(vectors), NEAREST_CHUNK):
+        chunk = vectors[lo:lo + NEAREST_CHUNK]
+        nearest[lo:lo + NEAREST_CHUNK] = np.argmin(centroid_norms[None, :] - 2 * chunk @ centroids.T, axis=1)
+    return nearest
+
+
+def _kmeans(vectors, num_cells, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), num_cells, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assigned = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assigned, sample)
+        counts = np.bincount(assigned, minlength=num_cells)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _standardize(features, mean, std):
+    # Missing measurements sit at the season mean, so they neither attract nor repel
+    return np.nan_to_num((features - mean) / std).astype(np.float32)
+
+
+def build_similarity_index(season_path, similarity_path=None):
+    similarity_path = similarity_path or similarity_path_for(season_path)
+    # The season file is read ahead of the pitch file, which is published first
+    season, stamp = read_season_file(season_path, columns=["game_pk", "at_bat_number"])
+    pitches = pq.read_table(
+        pitch_path_for(season_path),
+        columns=["game_pk", "at_bat_number", "pitch_number"] + FEATURE_COLUMNS,
+    ).sort_by([("game_pk", "ascending"), ("at_bat_number", "ascending"), ("pitch_number", "ascending")])
+    features = np.column_stack([
+        pc.cast(pitches.column(c), pa.float64()).to_numpy(zero_copy_only=False) for c in FEATURE_COLUMNS
+    ])
+    # A feature a season never measured (older seasons lack spin and
+    # extension) stays at 0 with unit scale instead of averaging nothing
+    measured = ~np.isnan(features).all(axis=0)
+    mean = np.zeros(len(FEATURE_COLUMNS))
+    std = np.ones(len(FEATURE_COLUMNS))
+    mean[measured] = np.nanmean(features[:, measured], axis=0)
+    std[measured] = np.nanstd(features[:, measured], axis=0)
+    std[~(std > 0)] = 1.0
+    features = _standardize(features, mean, std)
+
+    game_pks = pitches.column("game_pk").to_numpy()
+    ab_nums = pitches.column("at_bat_number").to_numpy()
+    is_start = np.ones(len(game_pks), dtype=bool)
+    is_start[1:] = (game_pks[1:] != game_pks[:-1]) | (ab_nums[1:] != ab_nums[:-1])
+    starts = np.flatnonzero(is_start)
+    lengths = np.diff(np.append(starts, len(game_pks)))
+
+    # Line the pitch-table at-bats up with their row ids in the season file
+    season = season.append_column("row_id", pa.array(np.arange(season.num_rows, dtype=np.int64)))
+    starts_table = pa.table({
+        "game_pk": pa.array(game_pks[starts]),
+        "at_bat_number": pa.array(ab_nums[starts]),
+        "start": pa.array(starts),
+        "length": pa.array(lengths),
+    }).join(season, keys=["game_pk", "at_bat_number"], join_type="inner")
+    starts = starts_table.column("start").to_numpy()
+    lengths = starts_table.column("length").to_numpy()
+    row_ids = starts_table.column("row_id").to_numpy()
+
+    arrays = {"season_stamp": np.array(stamp.decode()), "mean": mean, "std": std, "lengths": np.unique(lengths)}
+    for length in arrays["lengths"]:
+        members = lengths == length
+        gather = starts[members][:, None] + np.arange(length)[None, :]
+        vectors = features[gather].reshape(len(gather), -1)
+        num_cells = max(1, int(np.sqrt(len(vectors))))
+        centroids = _kmeans(vectors, num_cells)
+        cells = _nearest(vectors, centroids)
+        order = np.argsort(cells, kind="stable")
+        arrays[f"len{length}_centroids"] = centroids
+        arrays[f"len{length}_offsets"] = np.searchsorted(cells[order], np.arange(num_cells + 1))
+        arrays[f"len{length}_vectors"] = vectors[order]
+        arrays[f"len{length}_row_ids"] = row_ids[members][order]
+
+    tmp_path = f"{similarity_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, similarity_path)
+    return similarity_path
+
+
+def ensure_similarity_index(season_path, stamp=None):
+    similarity_path = similarity_path_for(season_path)
+    if is_sidecar_stale(season_path, similarity_path, stamp):
+        build_similarity_index(season_path, similarity_path)
+    return similarity_path
+
+
+def _search_season(segment, table, stamp, query, k, nprobe, scale=None):
+    # (distances, row_ids) of the segment's k nearest current at-bats, by
+    # row id into `table`, the segment's season file as stamped. scale=(mean,
+    # std) measures distances in another segment's standardized space
+    # instead of this one's.
+    length = len(query)
+    with np.load(ensure_similarity_index(segment.path, stamp)) as index:
+        if index["season_stamp"].item().encode() != stamp:
+            raise SeasonChanged(segment.path)
+        if f"len{length}_centroids" not in index:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        mean, std = index["mean"], index["std"]
+        vector = _standardize(query, mean, std).reshape(1, -1)
+
+        centroids = index[f"len{length}_centroids"]
+        offsets = index[f"len{length}_offsets"]
+        probe = np.argsort(((centroids - vector) ** 2).sum(axis=1))[:nprobe]
+        candidates = np.concatenate([np.arange(offsets[c], offsets[c + 1]) for c in probe])
+        candidate_rows = index[f"len{length}_row_ids"][candidates]
+        current = np.isin(candidate_rows, visible_row_ids(segment, candidate_rows, table))
+        candidates, candidate_rows = candidates[current], candidate_rows[current]
+
+        vectors = index[f"len{length}_vectors"][candidates]
+        if scale is not None:
+            target_mean, target_std = scale
+            vectors = (vectors * np.tile(std, length) + np.tile(mean - target_mean, length)) / np.tile(target_std, length)
+            vector = _standardize(query, target_mean, target_std).reshape(1, -1)
+        distances = np.sqrt(((vectors - vector) ** 2).sum(axis=1))
+        best = np.argsort(distances)[:k]
+        row_ids = candidate_rows[best]
+    order = np.argsort(row_ids)
+    return distances[best][order], row_ids[order]
+
+
+def _season_scale(season_path):
+    with np.load(ensure_similarity_index(season_path)) as index:
+        return index["mean"], index["std"]
+
+
+def similar_atbats(query, k=10, start_year=FIRST_SEASON, end_year=None, columns=None, nprobe=DEFAULT_NPROBE):
+    # query: one row per pitch with FEATURE_COLUMNS (DataFrame, or an array in
+    # that column order; NaN means unknown). Returns the k closest at-bats of
+    # the same length across the seasons, nearest first, with a distance column.
+    if isinstance(query, pd.DataFrame):
+        query = query[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    query = np.asarray(query, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+
+    def read_segment(segment, scale):
+        table, stamp = stamped_table(segment.path)
+        distances, row_ids = _search_season(segment, table, stamp, query, k, nprobe, scale)
+        # Sorted row ids come back from read_rows in the same order
+        rows = read_rows(table, row_ids, columns).to_pandas()
+        rows["distance"] = distances
+        return rows
+
+    hits = []
+    for year, season_path in season_paths(start_year, end_year).items():
+        segments = season_segments(season_path)
+        scale = _season_scale(season_path) if len(segments) > 1 else None
+        for i, segment in enumerate(segments):
+            rows = read_consistent(read_segment, segment, scale if i > 0 else None)
+            if len(rows):
+                hits.append(rows)
+    if not hits:
+        return pd.DataFrame(columns=(columns or []) + ["distance"])
+    return pd.concat(hits, ignore_index=True).sort_values("distance", ignore_index=True).head(k)
+
+
+def atbat_features(game_pk, at_bat_number, year):
+    # The per-pitch feature rows of one indexed at-bat, in pitch order, from
+    # the newest segment that has it
+    for segment in reversed(season_segments(season_paths(year, year)[year])):
+        pitches = pq.read_table(
+            pitch_path_for(segment.path),
+            columns=["game_pk", "at_bat_number", "pitch_number"] + FEATURE_COLUMNS,
+            filters=[("game_pk", "==", game_pk), ("at_bat_number", "==", at_bat_number)],
+        ).to_pandas()
+        if len(pitches):
+            break
+    return pitches.sort_values("pitch_number")[FEATURE_COLUMNS]
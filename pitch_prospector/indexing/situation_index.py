@@ -0,0 +1,157 @@
+# situation_index.py
+
+# Posting lists over the game situation of every at-bat in a season file:
+# who pitched and hit, their handedness, inning and half, outs, the count the
+# at-bat ended in, the teams and the batting team's lead. Each (dimension,
+# value) pair keeps the sorted row ids of its at-bats, delta-encoded on disk,
+# so the dense low-cardinality dimensions pack about as tight as a bitmap;
+# queries filter the sidecar's memory-mapped Arrow copy rather than decode it.
+# A filter such as "LHP vs RHB, two outs, seventh inning or later, batting
+# team behind" unions the values each dimension accepts and intersects
+# across dimensions; callers intersect that with the sequence lookup or the
+# pattern postings, so no at-bat rows are read until the matches are known.
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from indexing.season_files import SEASON_STAMP_KEY, check_stamp, sidecar_path_for, is_sidecar_stale, write_sidecar
+from indexing.arrow_cache import cached_table, open_stamped, source_stamp
+
+SITUATIONS_ROW_GROUP_SIZE = 256
+
+# Dimension -> whether its values are integers or text. score_diff is
+# bat_score - fld_score when the at-bat began.
+SITUATION_DIMENSIONS = {
+    "pitcher": "int",
+    "batter": "int",
+    "p_throws": "text",
+    "stand": "text",
+    "inning": "int",
+    "inning_topbot": "text",
+    "outs_when_up": "int",
+    "balls": "int",
+    "strikes": "int",
+    "home_team": "text",
+    "away_team": "text",
+    "score_diff": "int",
+}
+
+# score_diff values for the batting team being behind, level or ahead
+SCORE_STATES = {"trailing": range(-100, 0), "tied": 0, "leading": range(1, 100)}
+
+SITUATIONS_SCHEMA = pa.schema([
+    ("dimension", pa.string()),
+    ("int_value", pa.int64()),
+    ("text_value", pa.string()),
+    ("row_ids", pa.list_(pa.int32())),
+])
+
+
+def situations_path_for(season_path):
+    return sidecar_path_for(season_path, "situations")
+
+
+def _dimension_values(season, dimension):
+    if dimension == "score_diff":
+        if "bat_score" not in season.column_names or "fld_score" not in season.column_names:
+            return None
+        return pc.subtract(pc.cast(season.column("bat_score"), pa.int64()), pc.cast(season.column("fld_score"), pa.int64()))
+    if dimension not in season.column_names:
+        return None
+    return season.column(dimension)
+
+
+def build_situation_index(season_path, situations_path=None):
+    situations_path = situations_path or situations_path_for(season_path)
+    source, stamp = open_stamped(season_path)
+    names = set(pq.read_schema(source).names)
+    wanted = [c for c in list(SITUATION_DIMENSIONS) + ["bat_score", "fld_score"] if c in names]
+    season = pq.read_table(source, columns=wanted)
+    row_ids = pa.array(np.arange(season.num_rows, dtype=np.int32))
+
+    pieces = []
+    for dimension, kind in SITUATION_DIMENSIONS.items():
+        values = _dimension_values(season, dimension)
+        if values is None:
+            continue
+        value_type = pa.int64() if kind == "int" else pa.string()
+        table = pa.table({"value": pc.cast(values, value_type), "row_id": row_ids})
+        table = table.filter(pc.is_valid(table.column("value")))
+        # row ids are appended in file order, so every posting list comes out sorted
+        grouped = table.group_by("value", use_threads=False).aggregate([("row_id", "list")]).sort_by("value")
+        empty = pa.nulls(grouped.num_rows, value_type)
+        pieces.append(pa.table({
+            "dimension": pa.array([dimension] * grouped.num_rows, type=pa.string()),
+            "int_value": grouped.column("value") if kind == "int" else empty,
+            "text_value": grouped.column("value") if kind == "text" else empty,
+            "row_ids": grouped.column("row_id_list"),
+        }, schema=SITUATIONS_SCHEMA))
+
+    postings = pa.concat_tables(pieces) if pieces else SITUATIONS_SCHEMA.empty_table()
+    write_sidecar(
+        postings, situations_path, stamp,
+        row_group_size=SITUATIONS_ROW_GROUP_SIZE,
+        use_dictionary=["dimension", "text_value"],
+        column_encoding={"int_value": "DELTA_BINARY_PACKED", "row_ids.list.element": "DELTA_BINARY_PACKED"},
+    )
+    return situations_path
+
+
+def ensure_situation_index(season_path, stamp=None):
+    situations_path = situations_path_for(season_path)
+    if is_sidecar_stale(season_path, situations_path, stamp):
+        build_situation_index(season_path, situations_path)
+    return situations_path
+
+
+def active_situation(situation):
+    # Drops the dimensions left unset (None); raises on unknown ones
+    situation = {dimension: values for dimension, values in (situation or {}).items() if values is not None}
+    unknown = set(situation) - set(SITUATION_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown situation dimensions {sorted(unknown)}; use {list(SITUATION_DIMENSIONS)}")
+    return situation
+
+
+def _accepts(dimension, values):
+    # values: one value, any iterable of them, or a range (integer dimensions)
+    field = pc.field("int_value" if SITUATION_DIMENSIONS[dimension] == "int" else "text_value")
+    if isinstance(values, range) and values.step == 1:
+        return (field >= values.start) & (field < values.stop)
+    if isinstance(values, str) or not hasattr(values, "__iter__"):
+        values = [values]
+    return field.isin(list(values))
+
+
+def match_situation_rows(season_path, situation, stamp=None):
+    # Sorted row ids of the season's at-bats matching every dimension in
+    # situation, e.g. {"p_throws": "L", "stand": "R", "outs_when_up": 2,
+    # "inning": range(7, 100), "score_diff": range(-100, 0)}. None when it
+    # doesn't restrict anything. stamp is that of the season table the row
+    # ids are for (season_files.py).
+    situation = active_situation(situation)
+    if not situation:
+        return None
+    stamp = stamp or source_stamp(season_path)
+    expr = None
+    for dimension, values in situation.items():
+        term = (pc.field("dimension") == dimension) & _accepts(dimension, values)
+        expr = term if expr is None else expr | term
+    postings = cached_table(ensure_situation_index(season_path, stamp))
+    check_stamp(season_path, (postings.schema.metadata or {}).get(SEASON_STAMP_KEY), stamp)
+    postings = postings.filter(expr)
+
+    # Values of one dimension never share a row, so unions need no dedupe
+    candidate_sets = [
+        np.sort(pc.list_flatten(postings.filter(pc.equal(postings.column("dimension"), dimension)).column("row_ids")).to_numpy())
+        for dimension in situation
+    ]
+    # Intersect smallest-first so each step shrinks the working set fastest
+    candidate_sets.sort(key=len)
+    rows = candidate_sets[0]
+    for other in candidate_sets[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
@@ -0,0 +1,170 @@
+# statcast_curate.py
+
+# The curated raw layer. pybaseball hands back every Statcast column (~118)
+# as int64/float64/strings in whatever order the search returned, which is
+# what month files used to be written as. Curation keeps just the columns
+# the index uses, casts them to compact types (dictionary-encoded text,
+# int32 ids, int8/int16 counts, float32 physics), sorts by
+# (game_pk, at_bat_number, pitch_number) and writes zstd Parquet in row
+# groups small enough to prune. The footer carries a marker, so builds and
+# appends read only the columns they need and skip their own sort when it's
+# there; uncurated files still work, they're just read and sorted the slow way.
+#
+# Downloads are curated as month files are assembled. Files already on disk
+# are curated in place with python -m indexing.statcast_curate.
+
+import argparse
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_DIR = "pitch_prospector/data/statcast_monthly"
+
+COLUMNS_TO_KEEP = [
+    "game_date", "game_year", "game_pk",
+    "at_bat_number", "pitch_number",
+    "batter", "pitcher",
+    "pitch_type", "pitch_name", "description", "des", "events",
+    "balls", "strikes", "inning", "inning_topbot",
+    "release_speed", "plate_x", "plate_z", "zone",
+    "home_team", "away_team", "stand", "p_throws", "outs_when_up",
+    "release_spin_rate", "release_extension",
+    "hit_distance_sc", "launch_speed", "launch_angle",
+    "home_score", "away_score", "bat_score", "fld_score"
+]
+
+PITCH_KEY = ["game_pk", "at_bat_number", "pitch_number"]
+
+CURATED_KEY = b"pitch_prospector.curated"
+CURATED_VERSION = b"1"
+
+# ~two row groups per month, so game_pk statistics can skip half a file
+CURATED_ROW_GROUP_SIZE = 65536
+
+# float32 keeps ~7 significant digits; Statcast records physics to at most
+# a few decimals, so rounding on the way back out restores the stored value
+PHYSICS_DECIMALS = 4
+
+_TEXT = pa.dictionary(pa.int32(), pa.string())
+
+CURATED_SCHEMA = pa.schema([
+    ("game_date", pa.timestamp("ns")), ("game_year", pa.int16()), ("game_pk", pa.int32()),
+    ("at_bat_number", pa.int16()), ("pitch_number", pa.int16()),
+    ("batter", pa.int32()), ("pitcher", pa.int32()),
+    ("pitch_type", _TEXT), ("pitch_name", _TEXT), ("description", _TEXT),
+    ("des", pa.string()), ("events", _TEXT),
+    ("balls", pa.int8()), ("strikes", pa.int8()), ("inning", pa.int8()), ("inning_topbot", _TEXT),
+    ("release_speed", pa.float32()), ("plate_x", pa.float32()), ("plate_z", pa.float32()), ("zone", pa.int8()),
+    ("home_team", _TEXT), ("away_team", _TEXT), ("stand", _TEXT), ("p_throws", _TEXT),
+    ("outs_when_up", pa.int8()),
+    ("release_spin_rate", pa.int16()), ("release_extension", pa.float32()),
+    ("hit_distance_sc", pa.int16()), ("launch_speed", pa.float32()), ("launch_angle", pa.int16()),
+    ("home_score", pa.int16()), ("away_score", pa.int16()), ("bat_score", pa.int16()), ("fld_score", pa.int16()),
+]).with_metadata({CURATED_KEY: CURATED_VERSION})
+
+
+def is_curated(source):
+    # source: a parquet path, an Arrow table or an Arrow schema
+    if isinstance(source, str):
+        source = pq.read_schema(source)
+    schema = source.schema if isinstance(source, pa.Table) else source
+    return (schema.metadata or {}).get(CURATED_KEY) == CURATED_VERSION
+
+
+def curate_table(df):
+    # A raw pybaseball frame (or Arrow table) as a curated Arrow table
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    columns = []
+    for field in CURATED_SCHEMA:
+        if field.name in table.column_names:
+            column = table.column(field.name)
+            if pa.types.is_dictionary(column.type):
+                column = column.cast(field.type.value_type)
+            columns.append(column.cast(field.type))
+        else:
+            # A month missing a column (older seasons lack a few) keeps it as nulls
+            columns.append(pa.nulls(table.num_rows, field.type))
+    table = pa.Table.from_arrays(columns, schema=CURATED_SCHEMA)
+    return table.sort_by([(col, "ascending") for col in PITCH_KEY])
+
+
+def write_curated(df, fpath):
+    # Written to a temp file and renamed, like every other download write
+    table = df if isinstance(df, pa.Table) and is_curated(df) else curate_table(df)
+    tmp_path = f"{fpath}.{os.getpid()}.tmp"
+    pq.write_table(
+        table, tmp_path,
+        compression="zstd",
+        use_dictionary=True,
+        row_group_size=CURATED_ROW_GROUP_SIZE,
+        sorting_columns=[pq.SortingColumn(CURATED_SCHEMA.get_field_index(col)) for col in PITCH_KEY],
+    )
+    os.replace(tmp_path, fpath)
+    return fpath
+
+
+def read_statcast(fpath, columns=COLUMNS_TO_KEEP):
+    # Reads just `columns` (those the file has) of a curated or raw month file
+    names = set(pq.read_schema(fpath).names)
+    return pq.read_table(fpath, columns=[col for col in columns if col in names])
+
+
+def bytes_to_read(fpath, columns=COLUMNS_TO_KEEP):
+    # Compressed size of the column chunks read_statcast touches
+    metadata = pq.ParquetFile(fpath).metadata
+    wanted = set(columns)
+    return sum(
+        metadata.row_group(i).column(j).total_compressed_size
+        for i in range(metadata.num_row_groups)
+        for j in range(metadata.num_columns)
+        if metadata.row_group(i).column(j).path_in_schema in wanted
+    )
+
+
+def to_frame(table):
+    # pandas view of a month's table: dictionary text comes back as
+    # categoricals, float32 physics as float64 at their recorded precision
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_float32(field.type):
+            df[field.name] = np.round(df[field.name].astype(np.float64), PHYSICS_DECIMALS)
+    return df
+
+
+def curate_file(fpath):
+    # Rewrites one month file in place; False if it was already curated
+    if is_curated(fpath):
+        return False
+    write_curated(read_statcast(fpath), fpath)
+    return True
+
+
+def curate_data_dir(data_dir=DATA_DIR):
+    # Curating rewrites the files without changing what they index to, so
+    # manifest entries that were current are re-recorded and the next append
+    # doesn't reprocess every month
+    from indexing.index_lock import index_lock
+    from indexing.index_manifest import is_file_changed, load_manifest, record_file, save_manifest
+    with index_lock():
+        manifest = load_manifest()
+        curated = []
+        for fname in sorted(f for f in os.listdir(data_dir) if f.endswith(".parquet")):
+            fpath = os.path.join(data_dir, fname)
+            was_current = not is_file_changed(manifest, fpath)
+            before = os.path.getsize(fpath)
+            if not curate_file(fpath):
+                continue
+            if was_current:
+                record_file(manifest, fpath, manifest["files"][fname])
+            curated.append(fpath)
+            print(f"🗜️ Curated {fpath}: {before / 1e6:.1f} MB -> {os.path.getsize(fpath) / 1e6:.1f} MB")
+        save_manifest(manifest)
+        return curated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Curate raw monthly Statcast files in place")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory of monthly parquet files")
+    args = parser.parse_args()
+    curated = curate_data_dir(args.data_dir)
+    print(f"✅ Curated {len(curated)} monthly files")
@@ -0,0 +1,251 @@
+# statcast_download.py
+
+# Concurrent, resumable Statcast downloads. Months are fetched as one-day
+# chunks (start == end, so no day is ever fetched twice) on a bounded thread
+# pool, each chunk is retried with exponential backoff, and every file lands
+# via write-to-temp-then-rename (pid-tagged, so two downloaders never share a
+# temp file) so a crash can never leave a partial parquet behind. A JSON
+# ledger records which days have been fetched, so an interrupted backfill
+# picks up exactly where it stopped; each save merges in whatever another
+# downloader recorded meanwhile. Callers that write the data dir hold the
+# index lock (index_lock.py) all the same. Day chunks are kept
+# as fetched; month files are assembled from them curated (statcast_curate.py).
+#
+# The fetcher is injectable: anything with pybaseball.statcast's
+# fetch(start_dt, end_dt) -> DataFrame signature works, which keeps the
+# downloader testable against a local fake.
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow.parquet as pq
+from indexing.metrics import count, span
+from indexing.statcast_curate import write_curated
+
+DATA_DIR = "pitch_prospector/data/statcast_monthly"
+DAILY_DIR = "pitch_prospector/data/statcast_daily"
+LEDGER_PATH = "pitch_prospector/data/download_ledger.json"
+LEDGER_VERSION = 1
+
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 2.0
+
+
+def pybaseball_fetch(start_dt, end_dt):
+    # Imported lazily so callers that never hit the network don't pay for pybaseball
+    from pybaseball import statcast
+    # The pool here already parallelizes; pybaseball's own pool would nest inside it
+    return statcast(start_dt, end_dt, verbose=False, parallel=False)
+
+
+def month_name(start):
+    return f"{start.year}-{start.month:02d}"
+
+
+def month_days(start, today):
+    # Every day of the month up to and including today
+    end = min((start + timedelta(days=32)).replace(day=1), today + timedelta(days=1))
+    days = []
+    day = start
+    while day < end:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def write_parquet_atomic(df, fpath):
+    tmp_path = f"{fpath}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, fpath)
+
+
+def fetch_with_retry(fetch, day, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, sleep=time.sleep):
+    date_str = day.strftime("%Y-%m-%d")
+    for attempt in range(retries + 1):
+        try:
+            return fetch(date_str, date_str)
+        except Exception:
+            if attempt == retries:
+                raise
+            count("fetch_retries")
+            sleep(backoff * 2 ** attempt)
+
+
+class StatcastDownloader:
+    def __init__(
+        self,
+        data_dir=DATA_DIR,
+        daily_dir=DAILY_DIR,
+        ledger_path=LEDGER_PATH,
+        fetch=None,
+        max_workers=DEFAULT_WORKERS,
+        retries=MAX_RETRIES,
+        backoff=BACKOFF_SECONDS,
+        sleep=time.sleep,
+    ):
+        self.data_dir = data_dir
+        self.daily_dir = daily_dir
+        self.ledger_path = ledger_path
+        self.fetch = fetch or pybaseball_fetch
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.ledger = self._load_ledger()
+        self._lock = threading.Lock()
+
+    def _load_ledger(self):
+        if not os.path.exists(self.ledger_path):
+            return {"version": LEDGER_VERSION, "months": {}}
+        with open(self.ledger_path) as f:
+            return json.load(f)
+
+    def _save_ledger(self):
+        # Months and days another downloader saved since this one loaded the
+        # ledger are kept rather than overwritten
+        merged = self._load_ledger()
+        for name, entry in self.ledger["months"].items():
+            theirs = merged["months"].get(name)
+            if theirs is not None and not entry["complete"]:
+                if theirs["complete"]:
+                    entry = theirs
+                else:
+                    entry["days"] = {**theirs["days"], **entry["days"]}
+            merged["months"][name] = entry
+        self.ledger = merged
+        tmp_path = f"{self.ledger_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.ledger, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.ledger_path)
+
+    def month_path(self, start):
+        return os.path.join(self.data_dir, f"{month_name(start)}.parquet")
+
+    def day_path(self, day):
+        return os.path.join(self.daily_dir, month_name(day), f"{day:%Y-%m-%d}.parquet")
+
+    def _month_entry(self, start):
+        return self.ledger["months"].setdefault(month_name(start), {"complete": False, "days": {}})
+
+    def _adopt_legacy_month(self, start):
+        # Month files downloaded before the ledger existed count as complete
+        # only if their footer reads (so they were fully written) and they
+        # were written after the month was over
+        fpath = self.month_path(start)
+        if not os.path.exists(fpath):
+            return False
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        if datetime.fromtimestamp(os.path.getmtime(fpath)) < next_month:
+            return False
+        try:
+            num_rows = pq.ParquetFile(fpath).metadata.num_rows
+        except Exception:
+            return False
+        self.ledger["months"][month_name(start)] = {"complete": True, "days": {}, "rows": num_rows}
+        return True
+
+    def pending_days(self, months, today):
+        # (month start, day) chunks still to fetch, skipping finished months
+        # and days the ledger already has
+        pending = []
+        for start in months:
+            entry = self.ledger["months"].get(month_name(start))
+            if entry is None and self._adopt_legacy_month(start):
+                continue
+            if entry is not None and entry["complete"]:
+                continue
+            done = entry["days"] if entry is not None else {}
+            pending.extend((start, day) for day in month_days(start, today) if f"{day:%Y-%m-%d}" not in done)
+        return pending
+
+    def _download_day(self, day):
+        with span("download.day", day=f"{day:%Y-%m-%d}") as s:
+            df = fetch_with_retry(self.fetch, day, self.retries, self.backoff, self.sleep)
+            if df is not None and not df.empty:
+                os.makedirs(os.path.dirname(self.day_path(day)), exist_ok=True)
+                write_parquet_atomic(df, self.day_path(day))
+                s.count("rows_downloaded", len(df))
+                s.count("bytes_written", os.path.getsize(self.day_path(day)))
+                return len(df)
+            return 0
+
+    def _month_is_stale(self, start, days):
+        # A run that died after fetching days but before writing the month
+        # leaves chunks with no month file, or newer than the one there is
+        fpath = self.month_path(start)
+        if not os.path.exists(fpath):
+            return True
+        return os.path.getmtime(fpath) < max(os.path.getmtime(self.day_path(d)) for d in days)
+
+    def _finish_month(self, start, today, rewrite):
+        # Rebuild the month file from its day chunks (including today's, which
+        # is refetched next time), and mark the month complete once every one
+        # of its days is over and recorded
+        entry = self._month_entry(start)
+        fpath = None
+        days = [d for d in month_days(start, today) if os.path.exists(self.day_path(d))]
+        if days and (rewrite or self._month_is_stale(start, days)):
+            fpath = self.month_path(start)
+            frames = [pd.read_parquet(self.day_path(d)) for d in days]
+            write_curated(pd.concat(frames, ignore_index=True), fpath)
+
+        # The chunks are only dropped once the month file holding them is in place
+        has_rows = any(entry["days"].values())
+        month_written = not has_rows or os.path.exists(self.month_path(start))
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        if month_written and next_month <= today and len(entry["days"]) == len(month_days(start, today)):
+            entry["complete"] = True
+            entry["rows"] = sum(entry["days"].values())
+            entry["days"] = {}
+            shutil.rmtree(os.path.join(self.daily_dir, month_name(start)), ignore_errors=True)
+        return fpath
+
+    def download_months(self, months, today=None):
+        # Returns the paths of the month files written by this call
+        from tqdm import tqdm
+        today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        os.makedirs(self.data_dir, exist_ok=True)
+        months = [m.replace(day=1, hour=0, minute=0, second=0, microsecond=0) for m in months]
+        with span("download", months=len(months)) as s:
+            pending = self.pending_days(months, today)
+            s.count("days_pending", len(pending))
+
+            fetched = set()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self._download_day, day): (start, day) for start, day in pending}
+                for future in tqdm(as_completed(futures), total=len(futures), desc="⬇️ Downloading days"):
+                    start, day = futures[future]
+                    try:
+                        num_rows = future.result()
+                    except Exception as e:
+                        print(f"❌ Failed to download {day:%Y-%m-%d}: {e}")
+                        s.count("days_failed")
+                        continue
+                    # Day spans run on pool threads; their totals are counted here
+                    s.count("rows_downloaded", num_rows)
+                    with self._lock:
+                        # Today's games may still be in progress, so only days
+                        # that are over are recorded as done
+                        if day < today:
+                            self._month_entry(start)["days"][f"{day:%Y-%m-%d}"] = num_rows
+                        self._save_ledger()
+                    if num_rows:
+                        fetched.add(start)
+
+            written = []
+            for start in months:
+                entry = self.ledger["months"].get(month_name(start))
+                if entry is None or entry["complete"]:
+                    continue
+                fpath = self._finish_month(start, today, rewrite=start in fetched)
+                if fpath:
+                    written.append(fpath)
+            self._save_ledger()
+            s.count("months_written", len(written))
+            return written
@@ -0,0 +1,162 @@
+# transition_index.py
+
+# N-gram transition tables for "what comes next" queries. For every pitch of
+# a season we take the tokens thrown before it in the at-bat (the prefix,
+# packed exactly like pitch_sequence_key) and count which token came next.
+# Counts are kept overall and split by the count (balls/strikes), by
+# handedness (p_throws/stand) and by pitcher, as grouping sets named by the
+# split column; the split values themselves may be null, so they can't tell
+# the sets apart. The sidecar is sorted by prefix, so a lookup is a keyed
+# read that only touches the row groups whose statistics can hold it.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from indexing.arrow_cache import source_stamp
+from indexing.season_files import FIRST_SEASON, sidecar_path_for, is_sidecar_stale, pitch_path_for, season_paths, write_sidecar
+from indexing.season_segments import season_segments
+from indexing.sequence_codec import get_vocab, pack_keys
+
+TRANSITIONS_ROW_GROUP_SIZE = 8192
+
+# Prefixes as long as the longest sequence the app lets you enter
+MAX_PREFIX_LENGTH = 10
+
+# Grouping set of the counts over every pitch
+OVERALL_SPLIT = "all"
+
+TRANSITION_SPLITS = {
+    "count": ["balls", "strikes"],
+    "hand": ["p_throws", "stand"],
+    "pitcher": ["pitcher"],
+}
+
+TRANSITIONS_SCHEMA = pa.schema([
+    ("prefix_key", pa.binary()),
+    ("next_code", pa.uint16()),
+    ("split", pa.string()),
+    ("balls", pa.int8()),
+    ("strikes", pa.int8()),
+    ("p_throws", pa.string()),
+    ("stand", pa.string()),
+    ("pitcher", pa.int64()),
+    ("num_pitches", pa.int64()),
+])
+
+SPLIT_COLUMNS = [c for columns in TRANSITION_SPLITS.values() for c in columns]
+
+
+def transitions_path_for(season_path):
+    return sidecar_path_for(season_path, "transitions")
+
+
+def build_transitions(season_path, transitions_path=None, vocab=None):
+    transitions_path = transitions_path or transitions_path_for(season_path)
+    if vocab is None:
+        vocab = get_vocab()
+    # Stamped before the pitch file is read, which is published first
+    stamp = source_stamp(season_path)
+    pitches = pq.read_table(
+        pitch_path_for(season_path),
+        columns=["game_pk", "at_bat_number", "pitch_number", "pitch_type", "description"] + SPLIT_COLUMNS,
+    ).sort_by([("game_pk", "ascending"), ("at_bat_number", "ascending"), ("pitch_number", "ascending")])
+
+    # Position of each pitch within its at-bat, from the sorted key columns
+    game_pks = pitches.column("game_pk").to_numpy()
+    ab_nums = pitches.column("at_bat_number").to_numpy()
+    is_start = np.ones(len(game_pks), dtype=bool)
+    is_start[1:] = (game_pks[1:] != game_pks[:-1]) | (ab_nums[1:] != ab_nums[:-1])
+    starts = np.flatnonzero(is_start)
+    lengths = np.diff(np.append(starts, len(game_pks)))
+    row_starts = np.repeat(starts, lengths)
+    positions = np.arange(len(game_pks)) - row_starts
+
+    codes = vocab.encode_columns(
+        pitches.column("pitch_type").to_pandas(), pitches.column("description").to_pandas()
+    )
+    keep = positions <= MAX_PREFIX_LENGTH
+    row_starts, positions, next_codes = row_starts[keep], positions[keep], codes[keep]
+
+    # Gather every prefix's codes in one go: row i contributes codes
+    # [row_starts[i], row_starts[i] + positions[i])
+    offsets = np.repeat(np.cumsum(positions) - positions, positions)
+    gather = np.repeat(row_starts, positions) + (np.arange(positions.sum()) - offsets)
+    prefixes = pack_keys(codes[gather], positions)
+
+    table = pa.table({
+        "prefix_key": prefixes,
+        "next_code": pa.array(next_codes, type=pa.uint16()),
+        **{c: pitches.column(c).filter(pa.array(keep)) for c in SPLIT_COLUMNS},
+    })
+
+    pieces = []
+    for split, columns in [(OVERALL_SPLIT, [])] + list(TRANSITION_SPLITS.items()):
+        keys = ["prefix_key"] + columns + ["next_code"]
+        counts = table.group_by(keys, use_threads=False).aggregate([("next_code", "count")])
+        counts = counts.rename_columns(keys + ["num_pitches"])
+        counts = counts.append_column("split", pa.array([split] * counts.num_rows, pa.string()))
+        for name in TRANSITIONS_SCHEMA.names:
+            if name not in counts.column_names:
+                counts = counts.append_column(name, pa.nulls(counts.num_rows, TRANSITIONS_SCHEMA.field(name).type))
+        pieces.append(counts.select(TRANSITIONS_SCHEMA.names).cast(TRANSITIONS_SCHEMA))
+
+    transitions = pa.concat_tables(pieces).sort_by([("prefix_key", "ascending"), ("num_pitches", "descending")])
+    write_sidecar(transitions, transitions_path, stamp, row_group_size=TRANSITIONS_ROW_GROUP_SIZE)
+    return transitions_path
+
+
+def ensure_transitions(season_path, stamp=None):
+    transitions_path = transitions_path_for(season_path)
+    if is_sidecar_stale(season_path, transitions_path, stamp):
+        build_transitions(season_path, transitions_path)
+    return transitions_path
+
+
+def _split_filter(splits):
+    # Picks the grouping set holding the requested splits; a partial split
+    # (e.g. only balls, or only stand) reads its set and sums the rest away
+    unknown = set(splits) - set(SPLIT_COLUMNS)
+    owners = {name for name, columns in TRANSITION_SPLITS.items() if set(splits) & set(columns)}
+    if unknown or len(owners) > 1:
+        raise ValueError(f"Split by one of {list(TRANSITION_SPLITS.values())}, got {sorted(splits)}")
+    expr = pc.field("split") == (owners.pop() if owners else OVERALL_SPLIT)
+    for name, value in splits.items():
+        expr = expr & (pc.field(name) == value)
+    return expr
+
+
+def next_pitch_distribution(prefix_key, start_year=FIRST_SEASON, end_year=None, **splits):
+    # Distribution of the token thrown after prefix_key (b"" for the first
+    # pitch of an at-bat), optionally split by balls/strikes, p_throws/stand
+    # or pitcher, e.g. next_pitch_distribution(key, balls=3, strikes=2)
+    # Counts add up across a season's base and deltas; retractions take
+    # back the counts of the at-bats their delta replaced
+    segments = [segment for p in season_paths(start_year, end_year).values() for segment in season_segments(p)]
+    paths = [ensure_transitions(segment.path) for segment in segments]
+    retractions = [ensure_transitions(segment.retraction) for segment in segments if segment.retraction is not None]
+    columns = ["pitch_type", "description", "num_pitches", "share"]
+    if not paths:
+        return pd.DataFrame(columns=columns)
+
+    expr = (pc.field("prefix_key") == pa.scalar(prefix_key, type=pa.binary())) & _split_filter(splits)
+    rows = ds.dataset(paths, schema=TRANSITIONS_SCHEMA, format="parquet").to_table(
+        columns=["next_code", "num_pitches"], filter=expr
+    )
+    if retractions:
+        retracted = ds.dataset(retractions, schema=TRANSITIONS_SCHEMA, format="parquet").to_table(
+            columns=["next_code", "num_pitches"], filter=expr
+        )
+        retracted = retracted.set_column(1, "num_pitches", pc.negate(retracted.column("num_pitches")))
+        rows = pa.concat_tables([rows, retracted])
+    counts = rows.group_by("next_code").aggregate([("num_pitches", "sum")])
+    counts = counts.filter(pc.field("num_pitches_sum") > 0).sort_by([("num_pitches_sum", "descending")])
+
+    vocab = get_vocab()
+    tokens = [vocab.token_for(code) for code in counts.column("next_code").to_pylist()]
+    dist = pd.DataFrame(tokens, columns=["pitch_type", "description"])
+    dist["num_pitches"] = counts.column("num_pitches_sum").to_numpy()
+    dist["share"] = dist["num_pitches"] / max(dist["num_pitches"].sum(), 1)
+    return dist[columns]
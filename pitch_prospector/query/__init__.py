@@ -0,0 +1,16 @@
+# Headless query API: the same search the Streamlit app runs, for notebooks,
+# jobs and the `python -m query` CLI.
+
+from query.api import (
+    BATCH_COLUMNS,
+    batch_schema,
+    batch_search,
+    exact_tokens,
+    parse_sequence,
+    search,
+    sequence_key,
+    sequence_text,
+    with_display_columns,
+    with_player_names,
+    write_results,
+)
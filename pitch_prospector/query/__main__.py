@@ -0,0 +1,67 @@
+# __main__.py
+
+# Batch sequence lookups from the command line, e.g.
+#   PYTHONPATH=pitch_prospector python -m query \
+#       --sequence "FF/called_strike SL/ball" --sequence "FF/*,breaking/whiff" \
+#       --start 2023-04-01 --end 2023-10-01 --output matches.parquet
+# A sequences file holds one sequence per line in the same format. Situation
+# flags narrow the at-bats, e.g. --p-throws L --stand R --outs 2
+# --min-inning 7 --score trailing.
+
+import argparse
+from indexing.situation_index import SCORE_STATES
+from query.api import batch_schema, batch_search, write_results
+
+
+def read_sequences(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="query", description="Batch pitch sequence lookups against the season indexes")
+    parser.add_argument("--sequence", action="append", default=[], help='sequence such as "FF/called_strike SL/ball" (repeatable)')
+    parser.add_argument("--sequences", help="file with one sequence per line")
+    parser.add_argument("--start", help="first game date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last game date (YYYY-MM-DD)")
+    parser.add_argument("--pitcher", type=int, action="append", help="MLBAM pitcher id (repeatable)")
+    parser.add_argument("--batter", type=int, action="append", help="MLBAM batter id (repeatable)")
+    parser.add_argument("--inning", type=int, action="append", help="inning (repeatable)")
+    parser.add_argument("--min-inning", type=int, help="this inning or later")
+    parser.add_argument("--p-throws", choices=["L", "R"], help="pitcher's throwing hand")
+    parser.add_argument("--stand", choices=["L", "R"], help="batter's side")
+    parser.add_argument("--outs", type=int, choices=[0, 1, 2], action="append", help="outs when the at-bat began (repeatable)")
+    parser.add_argument("--score", choices=list(SCORE_STATES), help="batting team's score state when the at-bat began")
+    parser.add_argument("--prefix", action="store_true", help="also match at-bats that continue past the sequence")
+    parser.add_argument("--names", action="store_true", help="add pitcher and batter names")
+    parser.add_argument("--output", default="-", help="output path, or - for stdout (default)")
+    parser.add_argument("--format", choices=["parquet", "csv", "jsonl"], help="output format (default: from extension, else jsonl)")
+    args = parser.parse_args(argv)
+
+    sequences = list(args.sequence)
+    if args.sequences:
+        sequences += read_sequences(args.sequences)
+    if not sequences:
+        parser.error("give at least one --sequence or a --sequences file")
+
+    if args.inning and args.min_inning is not None:
+        parser.error("give either --inning or --min-inning")
+    situation = {
+        "inning": range(args.min_inning, 100) if args.min_inning is not None else None,
+        "p_throws": args.p_throws,
+        "stand": args.stand,
+        "outs_when_up": args.outs,
+        "score_diff": SCORE_STATES.get(args.score),
+    }
+    results = batch_search(
+        sequences, args.start, args.end,
+        prefix=args.prefix, pitchers=args.pitcher, batters=args.batter, innings=args.inning, names=args.names,
+        situation=situation,
+    )
+    num_rows = write_results(results, args.output, args.format, schema=batch_schema(names=args.names))
+    if args.output != "-":
+        print(f"✅ Wrote {num_rows:,} matching at-bats for {len(sequences):,} sequences to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# api.py
+
+# Headless search API shared by the Streamlit app, notebooks and the CLI.
+# A sequence is a list of tokens as parse_token understands them
+# ("FF/called_strike", "breaking/in_play", "null/hit_into_play", "*", ...),
+# and sequence_text writes keys back in the same form. Exact sequences are
+# answered from the season files by key; anything with wildcards, families
+# or prefix matching goes through the pattern index. batch_search resolves a
+# whole list of exact sequences with a single hash join per season instead of
+# one lookup per sequence.
+
+import os
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from indexing.arrow_cache import stamped_table
+from indexing.index_query import SEARCH_COLUMNS, date_filter, query_atbats
+from indexing.metrics import span
+from indexing.pattern_index import NULL_TOKEN, parse_pattern, parse_token, query_pattern
+from indexing.pitch_index import ATBAT_SCHEMA
+from indexing.player_registry import load_registry
+from indexing.season_files import FIRST_SEASON, as_datetime, read_consistent, season_paths
+from indexing.season_segments import season_segments, visible
+from indexing.situation_index import active_situation, match_situation_rows
+from indexing.sequence_codec import get_vocab
+
+# What batch results carry by default; the binary key is replaced by readable text
+BATCH_COLUMNS = ["game_date", "game_pk", "at_bat_number", "batter", "pitcher", "inning"]
+
+FILTER_COLUMNS = ["game_date"]
+
+HEADSHOT_URL = "https://securea.mlb.com/mlb/images/players/head_shot/"
+STATCAST_SEARCH_URL = "https://baseballsavant.mlb.com/statcast_search?player_type=pitcher&"
+
+
+def parse_sequence(sequence):
+    # Text ("FF/called_strike SL/ball"), (pitch_type, description) pairs or
+    # already-parsed tokens. A None in a pair is Statcast's empty value, not
+    # a wildcard.
+    if isinstance(sequence, str):
+        return parse_pattern(sequence)
+    tokens = []
+    for token in sequence:
+        if isinstance(token, str):
+            tokens.append(parse_token(token))
+        elif token is None or all(part is None or isinstance(part, (set, frozenset)) for part in token):
+            tokens.append(token)
+        else:
+            tokens.append(parse_token("/".join(NULL_TOKEN if part is None else part for part in token)))
+    return tokens
+
+
+def exact_tokens(tokens):
+    # The (pitch_type, description) pairs if every token names exactly one
+    # of each, otherwise None
+    pairs = []
+    for token in tokens:
+        if token is None or token[0] is None or token[1] is None or len(token[0]) != 1 or len(token[1]) != 1:
+            return None
+        pairs.append((next(iter(token[0])), next(iter(token[1]))))
+    return pairs
+
+
+def sequence_key(tokens, vocab=None):
+    # Packed key of an exact sequence; None if it isn't exact or uses a token
+    # the index has never seen
+    pairs = exact_tokens(tokens)
+    if pairs is None:
+        return None
+    return (vocab or get_vocab()).encode(pairs, add=False)
+
+
+def _read_columns(columns):
+    return list(dict.fromkeys(columns + FILTER_COLUMNS))
+
+
+def situation_for(situation=None, pitchers=None, batters=None, innings=None):
+    # pitchers / batters / innings are shorthands for those situation dimensions
+    shorthands = {"pitcher": pitchers, "batter": batters, "inning": innings}
+    return active_situation({**(situation or {}), **{k: v for k, v in shorthands.items() if v is not None}})
+
+
+def search(sequence, start_date=None, end_date=None, prefix=False, pitchers=None, batters=None, innings=None, columns=None, situation=None):
+    # Matching at-bats for one sequence as an Arrow table. situation narrows
+    # them by game situation (see SITUATION_DIMENSIONS), e.g.
+    # {"p_throws": "L", "stand": "R", "outs_when_up": 2, "inning": range(7, 100)}
+    tokens = parse_sequence(sequence)
+    situation = situation_for(situation, pitchers, batters, innings)
+    columns = columns or SEARCH_COLUMNS
+    read_columns = _read_columns(columns)
+    pairs = exact_tokens(tokens)
+    mode = "key" if pairs is not None and not prefix else "pattern"
+    with span("search", mode=mode, length=len(tokens), prefix=prefix) as s:
+        if mode == "key":
+            key = get_vocab().encode(pairs, add=False)
+            if key is None:
+                return pa.table({c: [] for c in columns})
+            table = query_atbats(start_date, end_date, key, read_columns, situation)
+        else:
+            table = query_pattern(tokens, start_date, end_date, prefix=prefix, columns=read_columns, situation=situation)
+        if table is None:
+            return pa.table({c: [] for c in columns})
+        s.count("rows_returned", table.num_rows)
+        return table.select(columns)
+
+
+def sequence_text(keys, vocab=None):
+    # Vectorized key -> "FF/called_strike SL/ball"; only distinct keys are decoded
+    vocab = vocab or get_vocab()
+    if isinstance(keys, pa.ChunkedArray):
+        keys = keys.combine_chunks()
+    encoded = pc.dictionary_encode(keys)
+    texts = pa.array([
+        " ".join("/".join(NULL_TOKEN if part is None else part for part in token) for token in vocab.decode(key))
+        for key in encoded.dictionary.to_pylist()
+    ], type=pa.string())
+    return pa.DictionaryArray.from_arrays(encoded.indices, texts).cast(pa.string())
+
+
+def with_player_names(table):
+    registry = load_registry()
+    table = table.append_column("pitcher_name", pa.array(registry.names_for(table.column("pitcher").to_numpy()), type=pa.string()))
+    return table.append_column("batter_name", pa.array(registry.names_for(table.column("batter").to_numpy()), type=pa.string()))
+
+
+def batch_schema(columns=None, names=False):
+    # What every batch_search table looks like, so writers can be opened
+    # before the first match arrives (or when none does)
+    columns = columns or BATCH_COLUMNS
+    fields = [pa.field("query_id", pa.int32())] + [ATBAT_SCHEMA.field(c) for c in columns] + [pa.field("sequence", pa.string())]
+    if names:
+        fields += [pa.field("pitcher_name", pa.string()), pa.field("batter_name", pa.string())]
+    return pa.schema(fields)
+
+
+def batch_search(sequences, start_date=None, end_date=None, prefix=False, pitchers=None, batters=None, innings=None, columns=None, names=False, situation=None):
+    # Yields one Arrow table per season (plus one per non-exact sequence),
+    # each led by query_id, the sequence's position in `sequences`, and
+    # holding the matched at-bat's sequence as text
+    columns = columns or BATCH_COLUMNS
+    situation = situation_for(situation, pitchers, batters, innings)
+    vocab = get_vocab()
+    keyed, patterned = [], []
+    for query_id, sequence in enumerate(sequences):
+        tokens = parse_sequence(sequence)
+        if exact_tokens(tokens) is not None and not prefix:
+            key = sequence_key(tokens, vocab)
+            # Unseen tokens can't match; they simply produce no rows
+            if key is not None:
+                keyed.append((query_id, key))
+        else:
+            patterned.append((query_id, tokens))
+
+    def finish(table):
+        table = table.append_column("sequence", sequence_text(table.column("pitch_sequence_key"), vocab))
+        table = table.select(["query_id"] + columns + ["sequence"])
+        return with_player_names(table) if names else table
+
+    read_columns = list(dict.fromkeys(_read_columns(columns) + ["game_pk", "at_bat_number", "pitch_sequence_key"]))
+    expr = date_filter(start_date, end_date)
+
+    def read_segment(segment):
+        atbats, stamp = stamped_table(segment.path)
+        if situation:
+            # Only the at-bats the situation postings list are joined
+            atbats = atbats.take(pa.array(match_situation_rows(segment.path, situation, stamp)))
+        return atbats.select(read_columns)
+
+    if keyed:
+        queries = pa.table({
+            "query_id": pa.array([q for q, _ in keyed], type=pa.int32()),
+            "pitch_sequence_key": pa.array([k for _, k in keyed], type=pa.binary()),
+        })
+        start_year = as_datetime(start_date).year if start_date is not None else FIRST_SEASON
+        end_year = as_datetime(end_date).year if end_date is not None else None
+        for year, season_path in season_paths(start_year, end_year).items():
+            with span("batch_search.season", year=year, sequences=len(keyed)) as s:
+                pieces = []
+                for segment in season_segments(season_path):
+                    atbats = read_consistent(read_segment, segment)
+                    if expr is not None:
+                        atbats = atbats.filter(expr)
+                    pieces.append(visible(atbats.join(queries, keys="pitch_sequence_key", join_type="inner"), segment))
+                matched = pa.concat_tables(pieces)
+                s.count("rows_returned", matched.num_rows)
+            if matched.num_rows:
+                matched = matched.sort_by([("query_id", "ascending"), ("game_pk", "ascending"), ("at_bat_number", "ascending")])
+                yield finish(matched)
+
+    for query_id, tokens in patterned:
+        with span("batch_search.pattern", length=len(tokens), prefix=prefix) as s:
+            matched = query_pattern(tokens, start_date, end_date, prefix=prefix, columns=read_columns, situation=situation)
+            s.count("rows_returned", 0 if matched is None else matched.num_rows)
+        if matched is None:
+            continue
+        if matched.num_rows:
+            matched = matched.add_column(0, "query_id", pa.array([query_id] * matched.num_rows, type=pa.int32()))
+            yield finish(matched)
+
+
+def write_results(tables, path, fmt=None, schema=None):
+    # Streams result tables to parquet, csv or jsonl (from the extension when
+    # fmt isn't given; "-" writes csv/jsonl to stdout). Returns the row count.
+    # With a schema (batch_schema) the output is a valid, empty file even
+    # when nothing matched; otherwise it's taken from the first table.
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".") or "jsonl"
+    if fmt not in ("parquet", "csv", "jsonl"):
+        raise ValueError(f"Unsupported output format {fmt!r}; use parquet, csv or jsonl")
+    if fmt == "parquet" and path == "-":
+        raise ValueError("Parquet output needs a file path")
+
+    sink = sys.stdout.buffer if path == "-" else open(path, "wb")
+
+    def open_writer(schema):
+        if fmt == "parquet":
+            return pq.ParquetWriter(sink, schema)
+        if fmt == "csv":
+            return pa_csv.CSVWriter(sink, schema)
+        return None
+
+    writer, num_rows = None, 0
+    try:
+        if schema is not None:
+            writer = open_writer(schema)
+        for table in tables:
+            if schema is None:
+                schema = table.schema
+                writer = open_writer(schema)
+            table = table.cast(schema)
+            if fmt == "jsonl":
+                sink.write(table.to_pandas().to_json(orient="records", lines=True, date_format="iso").encode())
+            else:
+                writer.write_table(table)
+            num_rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+        if path != "-":
+            sink.close()
+    return num_rows
+
+
+def with_display_columns(page):
+    # Names, headshots and Statcast links for a DataFrame of at-bats, built column-wise
+    page = page.copy()
+    registry = load_registry()
+    page["pitcher_name"] = registry.names_for(page["pitcher"].to_numpy())
+    page["batter_name"] = registry.names_for(page["batter"].to_numpy())
+
+    pitcher_ids = page["pitcher"].astype(str)
+    batter_ids = page["batter"].astype(str)
+    page["pitcher_img"] = HEADSHOT_URL + pitcher_ids + ".jpg"
+    page["batter_img"] = HEADSHOT_URL + batter_ids + ".jpg"
+
+    game_dates = pd.to_datetime(page["game_date"])
+    date_str = game_dates.dt.strftime("%Y-%m-%d")
+    page["statcast_url"] = (
+        STATCAST_SEARCH_URL
+        + "game_date_gt=" + date_str + "&"
+        + "game_date_lt=" + date_str + "&"
+        + "pitchers_lookup%5B%5D=" + pitcher_ids + "&"
+        + "batters_lookup%5B%5D=" + batter_ids + "&"
+        + "hfInn=" + page["inning"].astype(str) + "%7C&"
+        + "hfSea=" + game_dates.dt.year.astype(str) + "%7C"
+    )
+    return page
@@ -0,0 +1,70 @@
+import os
+import sys
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+
+# The code imports as `indexing.*`, with pitch_prospector/ on the path (as the app and `python -m` runs have it)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pitch_prospector"))
+
+from indexing.arrow_cache import clear_cache
+from indexing.pitch_index import SEASON_INDEX_PATTERN, append_to_season, process_file
+from indexing.sequence_codec import get_vocab, reload_vocab
+
+PITCHES = [("FF", "ball"), ("FF", "called_strike"), ("SL", "swinging_strike"), ("CH", "foul"),
+           ("CU", "ball"), (None, "hit_into_play"), ("SI", None), ("FF", "hit_into_play")]
+EVENTS = ["single", "strikeout", "walk", "field_out", None]
+
+
+def statcast_month(seed=0, num_games=6, first_game=1, day="2024-05-01"):
+    # A small Statcast-shaped month with the gaps the real feed has: null
+    # pitch types and descriptions, missing counts and handedness, a game
+    # with no half-inning and pitches with no pitcher id
+    rng = np.random.default_rng(seed)
+    rows = []
+    for game_pk in range(first_game, first_game + num_games):
+        for at_bat_number in range(1, rng.integers(4, 9)):
+            topbot = "Top" if at_bat_number % 2 else "Bot"
+            pitcher = int(rng.integers(500, 504))
+            for pitch_number in range(1, rng.integers(2, 7)):
+                pitch_type, description = PITCHES[rng.integers(len(PITCHES))]
+                rows.append({
+                    "game_date": pd.Timestamp(day) + pd.Timedelta(days=game_pk % 20), "game_year": 2024,
+                    "game_pk": game_pk, "at_bat_number": at_bat_number, "pitch_number": pitch_number,
+                    "batter": int(rng.integers(600, 606)), "pitcher": pitcher,
+                    "pitch_type": pitch_type, "description": description, "events": None,
+                    "balls": min(pitch_number - 1, 3), "strikes": int(rng.integers(0, 3)), "inning": (at_bat_number + 1) // 2,
+                    "inning_topbot": topbot, "outs_when_up": int(rng.integers(0, 3)),
+                    "stand": "LR"[int(rng.integers(2))], "p_throws": "LR"[int(rng.integers(2))],
+                    "home_team": "BOS", "away_team": "NYY",
+                    "bat_score": int(rng.integers(0, 4)), "fld_score": int(rng.integers(0, 4)),
+                    "release_speed": float(rng.normal(90, 4)), "plate_x": float(rng.normal(0, 0.8)), "plate_z": float(rng.normal(2.3, 0.8)),
+                })
+            rows[-1]["events"] = EVENTS[rng.integers(len(EVENTS))]
+    df = pd.DataFrame(rows)
+    df.loc[df["game_pk"] == first_game, "inning_topbot"] = None
+    df.loc[rng.random(len(df)) < 0.15, ["balls", "strikes"]] = np.nan
+    df.loc[rng.random(len(df)) < 0.1, "pitcher"] = np.nan
+    df.loc[df["game_pk"] == first_game + 1, ["p_throws", "stand"]] = None
+    return df
+
+
+def index_month(df, year=2024):
+    atbats, pitches = process_file(df)
+    get_vocab().save()
+    append_to_season(year, atbats, pitches)
+    return atbats, pitches
+
+
+@pytest.fixture
+def season(tmp_path, monkeypatch):
+    # A one-season index built in a scratch working directory, with the
+    # at-bat and pitch frames it was built from
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pitch_prospector" / "data").mkdir(parents=True)
+    reload_vocab()
+    clear_cache()
+    atbats, pitches = index_month(statcast_month())
+    yield SimpleNamespace(path=SEASON_INDEX_PATTERN.format(year=2024), atbats=atbats, pitches=pitches)
+    clear_cache()
@@ -0,0 +1,53 @@
+import pandas as pd
+from indexing.arrow_cache import clear_cache
+from indexing.pitch_index import ATBAT_KEY, SEASON_INDEX_PATTERN, append_to_season, process_file, read_season
+import indexing.season_segments as season_segments
+from indexing.season_segments import load_segments
+from indexing.sequence_codec import get_vocab, reload_vocab
+
+
+def month(num_games, day="2024-05-01"):
+    # Three at-bats per game, two pitches each
+    rows = []
+    for game_pk in range(1, num_games + 1):
+        for at_bat_number in range(1, 4):
+            for pitch_number, (pitch_type, description) in enumerate([("FF", "ball"), ("SL", "called_strike")], 1):
+                rows.append({
+                    "game_date": pd.Timestamp(day) + pd.Timedelta(days=game_pk), "game_year": 2024,
+                    "game_pk": game_pk, "at_bat_number": at_bat_number, "pitch_number": pitch_number,
+                    "batter": 100 + at_bat_number, "pitcher": 200, "pitch_type": pitch_type,
+                    "description": description, "balls": pitch_number - 1, "strikes": 0, "inning": 1,
+                    "inning_topbot": "Top", "outs_when_up": at_bat_number - 1, "stand": "R", "p_throws": "R",
+                    "home_team": "BOS", "away_team": "NYY", "bat_score": 0, "fld_score": 0,
+                })
+    return pd.DataFrame(rows)
+
+
+def test_reread_month_only_appends_new_and_changed_atbats(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pitch_prospector" / "data").mkdir(parents=True)
+    monkeypatch.setattr(season_segments, "COMPACT_DELTA_RATIO", 10.0)
+    reload_vocab()
+    clear_cache()
+    season_path = SEASON_INDEX_PATTERN.format(year=2024)
+
+    atbats, pitches = process_file(month(2))
+    get_vocab().save()
+    assert append_to_season(2024, atbats, pitches) == 6
+
+    # The month comes back with a game more and one pitch corrected
+    df = month(3)
+    df.loc[(df["game_pk"] == 1) & (df["at_bat_number"] == 2) & (df["pitch_number"] == 2), "description"] = "foul"
+    atbats, pitches = process_file(df)
+    get_vocab().save()
+    assert append_to_season(2024, atbats, pitches) == 4
+    assert load_segments(season_path)["deltas"][0] | {"id": None} == {"id": None, "atbats": 4, "retracted": 1}
+
+    # Nothing changed, so nothing is written
+    assert append_to_season(2024, atbats, pitches) == 0
+    assert len(load_segments(season_path)["deltas"]) == 1
+
+    season_atbats, _ = read_season(season_path)
+    expected = atbats.sort_values(by=ATBAT_KEY, ignore_index=True)
+    assert season_atbats["pitch_sequence_key"].tolist() == expected["pitch_sequence_key"].tolist()
+    clear_cache()
@@ -0,0 +1,37 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import indexing.arrow_cache as arrow_cache
+from indexing.arrow_cache import cache_path_for, cached_table, clear_cache
+
+
+def write_season(path, values, mtime_ns):
+    pq.write_table(pa.table({"row": values}), path)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_copy_swapped_in_from_an_older_file_is_not_served(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    season = str(tmp_path / "season.parquet")
+    old = str(tmp_path / "old.parquet")
+    write_season(old, [1, 2], 1_000_000_000)
+    write_season(season, [1, 2, 3], 2_000_000_000)
+    clear_cache()
+
+    convert = arrow_cache.convert_to_ipc
+    raced = []
+
+    def slower_process_wins(parquet_path, cache_path):
+        # This process converts the current file, then a slower one renames
+        # its copy of the older file over it before the open
+        stamp = convert(parquet_path, cache_path)
+        if not raced:
+            raced.append(True)
+            convert(old, cache_path)
+        return stamp
+
+    monkeypatch.setattr(arrow_cache, "convert_to_ipc", slower_process_wins)
+    table = cached_table(season, cache_dir)
+    assert table.column("row").to_pylist() == [1, 2, 3]
+    assert os.path.exists(cache_path_for(season, cache_dir))
+    clear_cache()
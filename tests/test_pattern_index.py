@@ -0,0 +1,64 @@
+import pyarrow.parquet as pq
+import pytest
+from indexing.pattern_index import match_pattern_rows, parse_pattern, parse_token, query_pattern
+
+
+def atbat_tokens(pitches):
+    # (game_pk, at_bat_number) -> the at-bat's (pitch_type, description) tokens in pitch order
+    pitches = pitches.sort_values(["game_pk", "at_bat_number", "pitch_number"])
+    return {
+        key: list(zip(atbat["pitch_type"], atbat["description"]))
+        for key, atbat in pitches.groupby(["game_pk", "at_bat_number"])
+    }
+
+
+def brute_force_match(pitches, pattern, prefix=True, min_length=None, max_length=None):
+    matches = set()
+    for key, tokens in atbat_tokens(pitches).items():
+        if len(tokens) < len(pattern) or (not prefix and len(tokens) != len(pattern)):
+            continue
+        if (min_length is not None and len(tokens) < min_length) or (max_length is not None and len(tokens) > max_length):
+            continue
+        if all(
+            accepted is None or ((accepted[0] is None or pitch_type in accepted[0]) and (accepted[1] is None or description in accepted[1]))
+            for accepted, (pitch_type, description) in zip(pattern, tokens)
+        ):
+            matches.add(key)
+    return matches
+
+
+PATTERNS = [
+    "FF", "FF FF", "* CH", "*/ball", "fastball/any_ball", "breaking/*", "fastball offspeed", "*/any_ball fastball",
+    "null/hit_into_play", "*/null", "null", "* * */in_play", "FF/called_strike *", "CU/whiff",
+]
+
+
+@pytest.mark.parametrize("text", PATTERNS)
+@pytest.mark.parametrize("prefix", [True, False])
+def test_pattern_matches_a_brute_force_scan(season, text, prefix):
+    pattern = parse_pattern(text)
+    table = query_pattern(pattern, prefix=prefix, columns=["game_pk", "at_bat_number"])
+    found = list(zip(table.column("game_pk").to_pylist(), table.column("at_bat_number").to_pylist()))
+    assert len(found) == len(set(found))
+    assert set(found) == brute_force_match(season.pitches, pattern, prefix)
+
+
+@pytest.mark.parametrize("min_length, max_length", [(2, None), (None, 2), (2, 3), (4, 2)])
+def test_length_ranges_match_a_brute_force_scan(season, min_length, max_length):
+    keys = pq.read_table(season.path, columns=["game_pk", "at_bat_number"]).to_pandas()
+    keys = list(zip(keys["game_pk"], keys["at_bat_number"]))
+    for text in ["*", "FF"]:
+        pattern = parse_pattern(text)
+        rows = match_pattern_rows(season.path, pattern, min_length=min_length, max_length=max_length)
+        assert list(rows) == sorted(rows)
+        assert {keys[row] for row in rows} == brute_force_match(season.pitches, pattern, True, min_length, max_length)
+
+
+def test_tokens_parse_to_the_sets_they_accept():
+    assert parse_token("*") is None
+    assert parse_token("*/*") is None
+    assert parse_token("ff") == ({"FF"}, None)
+    assert parse_token("*/foul") == (None, {"foul"})
+    assert parse_token("null/null") == ({None}, {None})
+    assert parse_token("fastball/in_play") == ({"FF", "FA", "SI", "FC"}, {"hit_into_play", "hit_into_play_score", "hit_into_play_no_out"})
+    assert parse_pattern("FF, SL  *") == [({"FF"}, None), ({"SL"}, None), None]
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+from tests.conftest import index_month, statcast_month
+from indexing.index_query import query_atbats
+from indexing.pattern_index import query_pattern
+from indexing.pitch_index import ATBAT_KEY, PITCH_KEY, compact_season, read_season
+import indexing.season_segments as season_segments
+from indexing.season_segments import load_segments
+from indexing.sequence_cube import sequence_frequency, sequence_outcomes
+from indexing.transition_index import next_pitch_distribution
+
+
+def newest_wins(batches):
+    # What the season should hold after indexing the batches in order: an
+    # at-bat and its pitches come from the last batch that has it
+    atbats = pd.concat(atbats for atbats, _ in batches).drop_duplicates(ATBAT_KEY, keep="last")
+    source = pd.concat(pitches.assign(batch=i) for i, (_, pitches) in enumerate(batches))
+    latest = source.groupby(ATBAT_KEY)["batch"].transform("max")
+    pitches = source[source["batch"] == latest].drop(columns="batch")
+    return atbats.sort_values(ATBAT_KEY, ignore_index=True), pitches.sort_values(PITCH_KEY, ignore_index=True)
+
+
+def outcome_counts(atbats, pitches, sequence_key):
+    last = pitches.groupby(ATBAT_KEY).tail(1)[ATBAT_KEY + ["events"]]
+    hits = atbats[atbats["pitch_sequence_key"] == sequence_key].merge(last, on=ATBAT_KEY)
+    return {None if pd.isna(event) else event: n for event, n in hits["events"].value_counts(dropna=False).items()}
+
+
+@pytest.fixture
+def segmented(season, monkeypatch):
+    # The fixture season plus two overlapping months, kept as delta segments
+    monkeypatch.setattr(season_segments, "COMPACT_DELTA_RATIO", 10.0)
+    batches = [(season.atbats, season.pitches)]
+    batches.append(index_month(statcast_month(seed=1, first_game=4)))
+    batches.append(index_month(statcast_month(seed=2, first_game=8)))
+    deltas = load_segments(season.path)["deltas"]
+    assert len(deltas) == 2 and all(delta["retracted"] for delta in deltas)
+    return newest_wins(batches)
+
+
+def check_readers(season_path, atbats, pitches):
+    merged, merged_pitches = read_season(season_path)
+    assert merged[ATBAT_KEY + ["pitch_sequence_key"]].equals(atbats[ATBAT_KEY + ["pitch_sequence_key"]])
+    assert merged_pitches.sort_values(PITCH_KEY, ignore_index=True)[PITCH_KEY + ["pitch_type"]].equals(pitches[PITCH_KEY + ["pitch_type"]])
+
+    found = query_pattern("*", columns=ATBAT_KEY).to_pandas().sort_values(ATBAT_KEY, ignore_index=True)
+    assert found.equals(atbats[ATBAT_KEY])
+    assert sum(next_pitch_distribution(b"", 2024, 2024)["num_pitches"]) == len(atbats)
+
+    for sequence_key in atbats["pitch_sequence_key"].drop_duplicates().head(8):
+        expected = atbats[atbats["pitch_sequence_key"] == sequence_key][ATBAT_KEY]
+        hits = query_atbats(sequence_key=sequence_key, columns=ATBAT_KEY).to_pandas()
+        assert hits.sort_values(ATBAT_KEY, ignore_index=True).equals(expected.reset_index(drop=True))
+
+        outcomes = sequence_outcomes(sequence_key, 2024, 2024)
+        assert dict(zip(outcomes["events"], outcomes["num_atbats"])) == outcome_counts(atbats, pitches, sequence_key)
+        assert sequence_frequency(sequence_key, 2024, 2024)["num_atbats"].tolist() == [len(expected)]
+
+
+def test_readers_merge_deltas_newest_wins(season, segmented):
+    check_readers(season.path, *segmented)
+
+
+def test_compaction_keeps_what_readers_see(season, segmented):
+    compact_season(2024)
+    assert load_segments(season.path)["deltas"] == []
+    check_readers(season.path, *segmented)
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from indexing.arrow_cache import clear_cache
+from indexing.pitch_index import ATBAT_KEY, PITCH_KEY, migrate_season_indexes, read_season
+from indexing.sequence_codec import UNKNOWN_TOKEN, VOCAB_PATH, SequenceVocab, get_vocab, pack_keys, reload_vocab, unpack_keys
+
+
+def seed_vocab(path, tokens):
+    vocab = SequenceVocab(path=path)
+    for token in tokens:
+        vocab.code_for(*token)
+    vocab.save()
+    return vocab
+
+
+def test_writer_reloads_codes_another_process_saved(tmp_path):
+    path = str(tmp_path / "vocab.json")
+    seed_vocab(path, [("FF", "ball"), ("SL", "called_strike")])
+
+    # This process loads the vocab, then another process appends and saves new codes
+    stale = get_vocab(path)
+    other = SequenceVocab.load(path)
+    other.code_for("CH", "swinging_strike")
+    other.code_for("CU", "foul")
+    other.save()
+
+    # Taking the index lock reloads, so new codes follow the other process's
+    vocab = reload_vocab(path)
+    assert vocab.code_for("KC", "ball") == 5
+    assert vocab.token_for(3) == ("CH", "swinging_strike")
+    vocab.save()
+    assert SequenceVocab.load(path).tokens == vocab.tokens
+    assert stale is not vocab
+
+
+def test_readers_pick_up_a_newer_vocab(tmp_path):
+    path = str(tmp_path / "vocab.json")
+    seed_vocab(path, [("FF", "ball")])
+    assert len(get_vocab(path)) == 1
+
+    seed_vocab(path, [("FF", "ball"), ("SL", "ball")])
+    assert len(get_vocab(path)) == 2
+
+
+def test_unsaved_codes_are_not_reloaded_away(tmp_path):
+    path = str(tmp_path / "vocab.json")
+    seed_vocab(path, [("FF", "ball")])
+    vocab = reload_vocab(path)
+    vocab.code_for("SL", "ball")
+
+    seed_vocab(path, [("FF", "ball"), ("CH", "foul"), ("CU", "foul")])
+    assert get_vocab(path) is vocab
+
+
+def test_unknown_codes_decode_without_crashing(tmp_path):
+    vocab = seed_vocab(str(tmp_path / "vocab.json"), [("FF", "ball")])
+    key = bytes([0, 1, 0, 7])
+    assert vocab.decode(key) == (("FF", "ball"), UNKNOWN_TOKEN)
+
+
+def test_packed_keys_round_trip_through_the_vocab(tmp_path):
+    vocab = SequenceVocab(path=str(tmp_path / "vocab.json"))
+    sequences = [[("FF", "ball"), ("SL", None)], [], [(None, "hit_into_play")], [("FF", "ball")] * 5, [("CH", "foul")]]
+    keys = pa.array([vocab.encode(sequence) for sequence in sequences], pa.binary())
+
+    codes, lengths = unpack_keys(keys)
+    assert list(lengths) == [len(sequence) for sequence in sequences]
+    assert list(codes) == [vocab.code_for(*token) for sequence in sequences for token in sequence]
+    assert pack_keys(codes, lengths).equals(keys)
+    assert [vocab.decode(key) for key in pack_keys(codes, lengths).to_pylist()] == [tuple(s) for s in sequences]
+
+    # A slice only unpacks its own keys
+    codes, lengths = unpack_keys(keys.slice(2, 2))
+    assert list(lengths) == [1, 5]
+    assert pack_keys(codes, lengths).equals(keys.slice(2, 2))
+    assert len(unpack_keys(pa.array([], pa.binary()))[0]) == 0
+
+
+def test_column_encoding_matches_token_by_token(tmp_path):
+    pitch_types = pd.Series(["FF", None, "SL", "FF", np.nan, "SL"])
+    descriptions = pd.Series(["ball", "foul", None, "ball", "foul", None])
+    vocab = SequenceVocab(path=str(tmp_path / "vocab.json"))
+    codes = vocab.encode_columns(pitch_types, descriptions)
+    one_by_one = SequenceVocab(path=str(tmp_path / "other.json"))
+    expected = [one_by_one.code_for(None if pd.isna(p) else p, d) for p, d in zip(pitch_types, descriptions)]
+    assert list(codes) == expected
+    assert vocab.tokens == one_by_one.tokens
+
+
+def test_prefixes_sort_right_before_their_sequence(tmp_path):
+    vocab = SequenceVocab(path=str(tmp_path / "vocab.json"))
+    ff, sl = ("FF", "ball"), ("SL", "foul")
+    keys = [vocab.encode(s) for s in [[ff, sl, ff], [sl], [ff], [ff, sl], [ff, ff]]]
+    assert [vocab.decode(key) for key in sorted(keys)] == [(ff,), (ff, ff), (ff, sl), (ff, sl, ff), (sl,)]
+
+
+def test_hashed_season_migrates_to_packed_keys(season):
+    # A season from before the vocab: tuple sequences with a SHA1 of their
+    # repr, and the pitches nested in the at-bat rows
+    pitches = season.pitches.sort_values(PITCH_KEY, ignore_index=True)
+    tokens = {
+        key: [[p, d] for p, d in zip(atbat["pitch_type"], atbat["description"])]
+        for key, atbat in pitches.groupby(ATBAT_KEY)
+    }
+    nested = {key: atbat.to_dict("records") for key, atbat in pitches.groupby(ATBAT_KEY)}
+    legacy = season.atbats.drop(columns=["pitch_sequence_key"])
+    keys = list(zip(legacy["game_pk"], legacy["at_bat_number"]))
+    legacy["pitch_sequence"] = [tokens[key] for key in keys]
+    legacy["pitch_sequence_hash"] = [hashlib.sha1(repr(tokens[key]).encode()).hexdigest() for key in keys]
+    legacy["pitch_level_data"] = [nested[key] for key in keys]
+    legacy.to_parquet(season.path, index=False)
+    os.remove(VOCAB_PATH)
+    clear_cache()
+
+    migrate_season_indexes(reload_vocab())
+    atbats, migrated_pitches = read_season(season.path)
+    vocab = get_vocab()
+    assert "pitch_sequence_hash" not in atbats.columns
+    assert [list(map(list, vocab.decode(key))) for key in atbats["pitch_sequence_key"]] == [
+        tokens[key] for key in zip(atbats["game_pk"], atbats["at_bat_number"])
+    ]
+    assert len(migrated_pitches) == len(pitches)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indexing.pitch_index import PITCH_KEY
+from indexing.sequence_cube import sequence_frequency, sequence_outcomes
+
+
+def brute_force_atbats(season):
+    # Every at-bat with how it ended and which team pitched, from its last pitch
+    last = season.pitches.sort_values(PITCH_KEY).groupby(["game_pk", "at_bat_number"], as_index=False).last()
+    top = last["inning_topbot"].eq("Top")
+    last["pitch_team"] = np.where(top, last["home_team"], last["away_team"])
+    last["bat_team"] = np.where(top, last["away_team"], last["home_team"])
+    last.loc[last["inning_topbot"].isna(), ["pitch_team", "bat_team"]] = None
+    columns = ["game_pk", "at_bat_number", "events", "pitch_team", "bat_team"]
+    return season.atbats.drop(columns=["events"], errors="ignore").merge(last[columns], on=["game_pk", "at_bat_number"])
+
+
+def outcome_counts(rows):
+    counts = {}
+    for event, num_atbats in zip(rows["events"], rows["num_atbats"]):
+        event = None if pd.isna(event) else event
+        counts[event] = counts.get(event, 0) + int(num_atbats)
+    return counts
+
+
+def test_frequency_counts_every_atbat_once(season):
+    atbats = brute_force_atbats(season)
+    expected = atbats["pitch_sequence_key"].value_counts()
+    for key, num_atbats in expected.items():
+        freq = sequence_frequency(key, 2024, 2024)
+        assert freq["num_atbats"].tolist() == [num_atbats]
+        assert freq["share"].tolist() == [pytest.approx(num_atbats / len(atbats))]
+        assert freq["season_rank"].tolist() == [int((expected > num_atbats).sum()) + 1]
+
+
+@pytest.mark.parametrize("dimension", ["pitcher", "batter", "pitch_team", "bat_team"])
+def test_outcomes_by_dimension_match_a_brute_force_count(season, dimension):
+    atbats = brute_force_atbats(season)
+    for key in atbats["pitch_sequence_key"].unique():
+        rows = atbats[atbats["pitch_sequence_key"] == key]
+        overall = rows.groupby("events", dropna=False).size()
+        assert outcome_counts(sequence_outcomes(key, 2024, 2024)) == outcome_counts(overall.rename("num_atbats").reset_index())
+        for value in rows[dimension].dropna().unique():
+            split = rows[rows[dimension] == value].groupby("events", dropna=False).size().rename("num_atbats").reset_index()
+            assert outcome_counts(sequence_outcomes(key, 2024, 2024, **{dimension: value})) == outcome_counts(split)
@@ -0,0 +1,28 @@
+import pyarrow as pa
+from query.api import batch_search, parse_sequence, search, sequence_text
+
+
+def test_sequence_text_round_trips_through_search(season):
+    keys = season.atbats["pitch_sequence_key"]
+    texts = sequence_text(pa.array(keys.unique(), pa.binary())).to_pylist()
+    assert any(text.startswith("null/") for text in texts) and any(text.endswith("/null") for text in texts)
+
+    for key, text in zip(keys.unique(), texts):
+        matches = search(text, columns=["game_pk", "at_bat_number"])
+        assert matches.num_rows == int((keys == key).sum())
+
+    results = pa.concat_tables(batch_search(texts))
+    assert results.num_rows == len(season.atbats)
+    assert sorted(results.column("sequence").to_pylist()) == sorted(sequence_text(pa.array(keys, pa.binary())).to_pylist())
+
+
+def test_null_is_a_token_and_star_a_wildcard(season):
+    assert parse_sequence([(None, "hit_into_play")]) == parse_sequence("null/hit_into_play") == [({None}, {"hit_into_play"})]
+    assert parse_sequence("*/hit_into_play") == [(None, {"hit_into_play"})]
+
+    null_in_play = search("null/hit_into_play", prefix=True, columns=["game_pk"]).num_rows
+    any_in_play = search("*/hit_into_play", prefix=True, columns=["game_pk"]).num_rows
+    firsts = season.pitches[season.pitches["pitch_number"] == 1]
+    assert null_in_play == int((firsts["pitch_type"].isna() & firsts["description"].eq("hit_into_play")).sum())
+    assert any_in_play == int(firsts["description"].eq("hit_into_play").sum())
+    assert null_in_play < any_in_play
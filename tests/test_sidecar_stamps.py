@@ -0,0 +1,65 @@
+import shutil
+from tests.conftest import statcast_month
+import indexing.pattern_index as pattern_index
+from indexing.pattern_index import postings_path_for, query_pattern
+from indexing.pitch_index import process_file, write_season_index
+from indexing.sequence_codec import get_vocab
+
+
+def first_pitch_atbats(pitches, pitch_type):
+    # (game_pk, at_bat_number) of the at-bats that open with pitch_type
+    first = pitches.sort_values(["game_pk", "at_bat_number", "pitch_number"]).groupby(["game_pk", "at_bat_number"]).head(1)
+    first = first[first["pitch_type"] == pitch_type]
+    return set(zip(first["game_pk"], first["at_bat_number"]))
+
+
+def found_atbats(table):
+    return set(zip(table.column("game_pk").to_pylist(), table.column("at_bat_number").to_pylist()))
+
+
+def rewrite_season(seed):
+    atbats, pitches = process_file(statcast_month(seed=seed, first_game=100))
+    get_vocab().save()
+    write_season_index(atbats, 2024, pitches)
+    return pitches
+
+
+def test_season_replaced_before_its_postings_are_read_is_read_again(season, monkeypatch):
+    match_pattern_rows = pattern_index.match_pattern_rows
+    replaced = []
+
+    def replace_then_match(*args, **kwargs):
+        # The season is rewritten after the reader took its table's stamp
+        if not replaced:
+            replaced.append(rewrite_season(seed=1))
+        return match_pattern_rows(*args, **kwargs)
+
+    monkeypatch.setattr(pattern_index, "match_pattern_rows", replace_then_match)
+    table = query_pattern("FF", columns=["game_pk", "at_bat_number"])
+    assert found_atbats(table) == first_pitch_atbats(replaced[0], "FF")
+
+
+def test_season_replaced_after_its_postings_are_read_keeps_their_rows(season, monkeypatch):
+    match_pattern_rows = pattern_index.match_pattern_rows
+
+    def match_then_replace(*args, **kwargs):
+        rows = match_pattern_rows(*args, **kwargs)
+        rewrite_season(seed=1)
+        return rows
+
+    monkeypatch.setattr(pattern_index, "match_pattern_rows", match_then_replace)
+    table = query_pattern("FF", columns=["game_pk", "at_bat_number"])
+    assert found_atbats(table) == first_pitch_atbats(season.pitches, "FF")
+
+
+def test_sidecar_of_an_older_season_is_rebuilt(season):
+    # A postings file of the old season copied back in has a newer mtime
+    # than the new season file, but not its stamp
+    old_postings = f"{season.path}.old"
+    shutil.copy(postings_path_for(season.path), old_postings)
+    pitches = rewrite_season(seed=2)
+    shutil.copy(old_postings, postings_path_for(season.path))
+
+    table = query_pattern("FF", columns=["game_pk", "at_bat_number"])
+    assert found_atbats(table) == first_pitch_atbats(pitches, "FF")
+    assert table.num_rows == len(first_pitch_atbats(pitches, "FF"))
@@ -0,0 +1,14 @@
+import warnings
+from indexing.similarity_index import FEATURE_COLUMNS, atbat_features, build_similarity_index, similar_atbats
+
+
+def test_unmeasured_features_build_without_warnings(season):
+    # The fixture has no spin, extension or zone, like the older seasons
+    assert season.pitches.reindex(columns=FEATURE_COLUMNS).isna().all().any()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        build_similarity_index(season.path)
+        query = atbat_features(3, 2, 2024)
+        hits = similar_atbats(query, k=3, columns=["game_pk", "at_bat_number"])
+    assert (hits.iloc[0]["game_pk"], hits.iloc[0]["at_bat_number"], hits.iloc[0]["distance"]) == (3, 2, 0)
+    assert hits["distance"].is_monotonic_increasing
@@ -0,0 +1,64 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from indexing.arrow_cache import clear_cache
+from indexing.pitch_index import ATBAT_COLUMNS, ATBAT_KEY, FINAL_COUNT_COLUMNS, SITUATION_COLUMNS, migrate_season_indexes, read_season
+from indexing.situation_index import SCORE_STATES, match_situation_rows
+
+
+def accepts(values, value):
+    # What a situation dimension accepts, spelled out: one value, several, or a range
+    if pd.isna(value):
+        return False
+    if isinstance(values, range):
+        return values.start <= value < values.stop
+    if isinstance(values, (list, set, tuple)):
+        return value in values
+    return value == values
+
+
+def brute_force_rows(season_path, situation):
+    season = pq.read_table(season_path).to_pandas()
+    season["score_diff"] = season["bat_score"] - season["fld_score"]
+    return [
+        row for row, atbat in season.iterrows()
+        if all(accepts(values, atbat[dimension]) for dimension, values in situation.items())
+    ]
+
+
+SITUATIONS = [
+    {"p_throws": "L"},
+    {"p_throws": "L", "stand": "R"},
+    {"outs_when_up": 2, "inning": range(2, 100)},
+    {"score_diff": SCORE_STATES["trailing"]},
+    {"score_diff": SCORE_STATES["tied"]},
+    {"balls": [0, 1], "strikes": 2},
+    {"pitcher": 501, "inning_topbot": "Top"},
+    {"batter": range(600, 603), "home_team": "BOS", "away_team": "NYY"},
+    {"stand": ["L", "R"]},
+]
+
+
+@pytest.mark.parametrize("situation", SITUATIONS)
+def test_situation_rows_match_a_brute_force_filter(season, situation):
+    assert list(match_situation_rows(season.path, situation)) == brute_force_rows(season.path, situation)
+
+
+def test_unset_dimensions_do_not_restrict(season):
+    assert match_situation_rows(season.path, {}) is None
+    assert match_situation_rows(season.path, {"stand": None}) is None
+    with pytest.raises(ValueError):
+        match_situation_rows(season.path, {"weather": "rain"})
+
+
+def test_migration_fills_in_the_situation_of_older_seasons(season):
+    # A season indexed before the at-bat rows carried their situation
+    old = pq.read_table(season.path)
+    pq.write_table(old.drop(SITUATION_COLUMNS + FINAL_COUNT_COLUMNS), season.path)
+    clear_cache()
+
+    migrate_season_indexes()
+    atbats, _ = read_season(season.path)
+    expected = season.atbats.sort_values(ATBAT_KEY, ignore_index=True)
+    pd.testing.assert_frame_equal(atbats[ATBAT_COLUMNS], expected[ATBAT_COLUMNS], check_dtype=False)
+    assert list(match_situation_rows(season.path, SITUATIONS[2])) == brute_force_rows(season.path, SITUATIONS[2])
@@ -0,0 +1,93 @@
+import os
+from datetime import datetime
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import indexing.statcast_download as statcast_download
+from indexing.statcast_download import StatcastDownloader
+
+JUNE = datetime(2024, 6, 1)
+# June is over, so a finished download marks it complete
+TODAY = datetime(2024, 7, 2)
+PITCHES_PER_DAY = 3
+
+
+class FakeFetch:
+    # Stands in for pybaseball.statcast: a few pitches of one game per day
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start_dt, end_dt):
+        self.calls.append(start_dt)
+        day = pd.Timestamp(start_dt)
+        return pd.DataFrame({
+            "game_date": [day] * PITCHES_PER_DAY,
+            "game_pk": [700000 + day.dayofyear] * PITCHES_PER_DAY,
+            "at_bat_number": [1] * PITCHES_PER_DAY,
+            "pitch_number": list(range(PITCHES_PER_DAY, 0, -1)),
+            "pitch_type": ["FF", "SL", "FF"],
+            "description": ["ball", "called_strike", "hit_into_play"],
+        })
+
+
+def make_downloader(tmp_path, fetch):
+    return StatcastDownloader(
+        data_dir=str(tmp_path / "monthly"),
+        daily_dir=str(tmp_path / "daily"),
+        ledger_path=str(tmp_path / "ledger.json"),
+        fetch=fetch,
+        max_workers=2,
+        sleep=lambda seconds: None,
+    )
+
+
+def test_download_writes_month_and_skips_finished_days(tmp_path):
+    fetch = FakeFetch()
+    written = make_downloader(tmp_path, fetch).download_months([JUNE], today=TODAY)
+
+    assert written == [str(tmp_path / "monthly" / "2024-06.parquet")]
+    assert pq.ParquetFile(written[0]).metadata.num_rows == 30 * PITCHES_PER_DAY
+    assert len(fetch.calls) == 30
+    assert not os.path.exists(tmp_path / "daily" / "2024-06")
+
+    # A finished month is never fetched again
+    again = FakeFetch()
+    assert make_downloader(tmp_path, again).download_months([JUNE], today=TODAY) == []
+    assert again.calls == []
+
+
+def test_resume_after_crash_before_month_is_written(tmp_path, monkeypatch):
+    def crash(df, fpath):
+        raise RuntimeError("killed before the month file was written")
+
+    # Every day is fetched and recorded, then the process dies assembling the month
+    monkeypatch.setattr(statcast_download, "write_curated", crash)
+    with pytest.raises(RuntimeError):
+        make_downloader(tmp_path, FakeFetch()).download_months([JUNE], today=TODAY)
+    month_path = tmp_path / "monthly" / "2024-06.parquet"
+    assert not month_path.exists()
+    assert len(os.listdir(tmp_path / "daily" / "2024-06")) == 30
+
+    # The restart has nothing left to fetch, but must still build the month from its chunks
+    monkeypatch.undo()
+    fetch = FakeFetch()
+    downloader = make_downloader(tmp_path, fetch)
+    written = downloader.download_months([JUNE], today=TODAY)
+
+    assert fetch.calls == []
+    assert written == [str(month_path)]
+    assert pq.ParquetFile(str(month_path)).metadata.num_rows == 30 * PITCHES_PER_DAY
+    assert downloader.ledger["months"]["2024-06"] == {"complete": True, "days": {}, "rows": 30 * PITCHES_PER_DAY}
+    assert not os.path.exists(tmp_path / "daily" / "2024-06")
+
+
+def test_ledger_keeps_days_another_downloader_saved(tmp_path):
+    # Both load the empty ledger; the later save must not drop the earlier one's days
+    backfill = make_downloader(tmp_path, FakeFetch())
+    refresh = make_downloader(tmp_path, FakeFetch())
+    refresh.download_months([JUNE], today=datetime(2024, 6, 11))
+    backfill.download_months([datetime(2024, 5, 1)], today=TODAY)
+
+    ledger = StatcastDownloader(ledger_path=str(tmp_path / "ledger.json")).ledger
+    assert ledger["months"]["2024-05"]["complete"]
+    assert sorted(ledger["months"]["2024-06"]["days"]) == [f"2024-06-{d:02d}" for d in range(1, 11)]
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from indexing.pitch_index import PITCH_KEY
+from indexing.sequence_codec import get_vocab
+from indexing.transition_index import MAX_PREFIX_LENGTH, next_pitch_distribution
+
+
+def brute_force_next(pitches, prefix, **splits):
+    # Every pitch thrown after `prefix` in its at-bat, counted by token
+    pitches = pitches.sort_values(PITCH_KEY, ignore_index=True)
+    pitches["token"] = list(zip(pitches["pitch_type"], pitches["description"]))
+    counts = {}
+    for _, atbat in pitches.groupby(["game_pk", "at_bat_number"]):
+        tokens = list(atbat["token"])
+        n = len(prefix)
+        if n > MAX_PREFIX_LENGTH or len(tokens) <= n or tuple(tokens[:n]) != prefix:
+            continue
+        pitch = atbat.iloc[n]
+        if all(pitch[name] == value for name, value in splits.items()):
+            counts[tokens[n]] = counts.get(tokens[n], 0) + 1
+    return counts
+
+
+def index_next(prefix, **splits):
+    key = get_vocab().encode(prefix, add=False)
+    dist = next_pitch_distribution(key, 2024, 2024, **splits)
+    return {(p, d): n for p, d, n in zip(dist["pitch_type"], dist["description"], dist["num_pitches"])}
+
+
+@pytest.mark.parametrize("splits", [
+    {}, {"balls": 0, "strikes": 1}, {"balls": 1}, {"p_throws": "R", "stand": "L"}, {"stand": "R"}, {"pitcher": 501},
+])
+def test_next_pitch_counts_match_a_brute_force_count(season, splits):
+    tokens = sorted(set(zip(season.pitches["pitch_type"], season.pitches["description"])), key=str)
+    prefixes = [()] + [(token,) for token in tokens[:3]] + [(tokens[0], tokens[1])]
+    for prefix in prefixes:
+        assert index_next(prefix, **splits) == brute_force_next(season.pitches, prefix, **splits)
+
+
+def test_first_pitches_add_up_to_the_atbats(season):
+    # Pitches with a null count, hand or pitcher still belong to the overall set once
+    assert sum(index_next(()).values()) == len(season.atbats)
+    assert sum(index_next((), p_throws="R").values()) + sum(index_next((), p_throws="L").values()) < len(season.atbats)
+
+
+def test_splits_from_two_sets_are_rejected(season):
+    with pytest.raises(ValueError):
+        next_pitch_distribution(b"", balls=0, pitcher=501)
@@ -0,0 +1,28 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from query.api import BATCH_COLUMNS, batch_schema, write_results
+
+
+def test_empty_results_are_valid_files(tmp_path):
+    schema = batch_schema(names=True)
+
+    parquet_path = str(tmp_path / "none.parquet")
+    assert write_results(iter([]), parquet_path, schema=schema) == 0
+    table = pq.read_table(parquet_path)
+    assert table.num_rows == 0
+    assert table.schema.names == schema.names
+
+    csv_path = tmp_path / "none.csv"
+    assert write_results(iter([]), str(csv_path), schema=schema) == 0
+    assert csv_path.read_text().strip() == ",".join(f'"{name}"' for name in schema.names)
+
+
+def test_results_are_cast_to_the_given_schema(tmp_path):
+    schema = batch_schema()
+    row = {"query_id": [0], **{c: [1] for c in BATCH_COLUMNS}, "sequence": ["FF/ball"]}
+    row["game_date"] = [pa.scalar(0, type=pa.timestamp("ns")).as_py()]
+    table = pa.table(row).cast(pa.schema([f.with_type(pa.int32()) if pa.types.is_integer(f.type) else f for f in schema]))
+
+    path = str(tmp_path / "one.parquet")
+    assert write_results(iter([table]), path, schema=schema) == 1
+    assert pq.read_table(path).schema == schema